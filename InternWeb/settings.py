@@ -36,6 +36,9 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
+# Email (đặt lại mật khẩu, thông báo) được đưa vào outbox và gửi bởi `manage.py run_outbox_worker`
+# theo lô trên một kết nối SMTP (clothes/emails.py). False: gửi đồng bộ trong request.
+EMAIL_USE_QUEUE = config('EMAIL_USE_QUEUE', default=True, cast=bool)
 
 
 # Application definition
@@ -47,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'clothes',
     'rest_framework',
     'rest_framework_simplejwt',  # JWT authentication
@@ -57,6 +61,11 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Số lần tra cứu /clothes/track/<mã vận đơn>/ mỗi IP (clothes/throttles.py). Sau proxy cần
+    # đặt NUM_PROXIES để DRF lấy IP thật từ X-Forwarded-For.
+    'DEFAULT_THROTTLE_RATES': {
+        'order_tracking': '60/minute',
+    },
 }
 
 
@@ -121,6 +130,13 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'internweb',
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -161,3 +177,95 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Catalog
+
+# Phân trang keyset cho danh sách sản phẩm. Khi CATALOG_PAGINATE_BY_DEFAULT = False,
+# /clothes/product/ chỉ phân trang nếu client gửi `cursor`, `page_size` hoặc `paginate=true`;
+# khi True, client cũ vẫn lấy được toàn bộ danh sách với `paginate=false`.
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 200
+CATALOG_PAGINATE_BY_DEFAULT = False
+# Ranh giới các khoảng giá (đồng) dùng cho facet: [0, 100k), [100k, 200k), ..., [1tr, ∞).
+# Sau khi đổi giá trị cần chạy `manage.py rebuild_facet_counts`.
+CATALOG_PRICE_BUCKETS = [100000, 200000, 500000, 1000000]
+# Thời gian lưu response của các API đọc danh mục (giây, 0 để tắt). Response được đánh
+# phiên bản và hết hiệu lực ngay khi Clothes/Category thay đổi; với nhiều worker cần
+# backend cache dùng chung (file, redis, memcached) thay cho locmem.
+CATALOG_CACHE_TIMEOUT = 300
+
+# Dựng JSON cho danh sách sản phẩm, giỏ hàng và đơn hàng trực tiếp từ .values()
+# (clothes/fast_serializers.py) thay vì qua ModelSerializer; kết quả giống hệt nhau.
+CATALOG_FAST_SERIALIZATION = False
+
+# Số dòng đọc mỗi lần từ server-side cursor khi xuất toàn bộ danh mục (/clothes/product/export/).
+CATALOG_EXPORT_CHUNK_SIZE = 2000
+
+# Số phần tử tối đa trong một lần gọi /clothes/product/bulk-update/.
+CATALOG_BULK_UPDATE_MAX_ITEMS = 5000
+
+# Phân trang keyset cho lịch sử đơn hàng (/clothes/user_orders/), cùng quy ước với
+# CATALOG_PAGINATE_BY_DEFAULT: khi False chỉ phân trang nếu client gửi `cursor`, `page_size`
+# hoặc `paginate=true`.
+ORDER_PAGE_SIZE = 20
+ORDER_MAX_PAGE_SIZE = 100
+ORDER_PAGINATE_BY_DEFAULT = False
+
+# Cách trừ tồn kho khi đặt hàng (clothes/stock.py):
+# - 'locking': SELECT ... FOR UPDATE mọi sản phẩm của đơn (theo thứ tự id) rồi ghi
+# - 'optimistic': UPDATE có điều kiện quantity_in_stock >= q cho từng sản phẩm, không khóa trước;
+#   phù hợp khi nhiều người mua cùng một sản phẩm (flash sale)
+CHECKOUT_STOCK_STRATEGY = 'locking'
+
+# Số StockShard của một sản phẩm bật "Chia kho" (hot_sku) trong admin. Đơn hàng trừ vào một
+# shard ngẫu nhiên; quantity_in_stock/status được tính lại bởi `manage.py rollup_stock_shards`
+# (chạy định kỳ, ví dụ mỗi phút bằng cron).
+STOCK_SHARD_COUNT = 8
+
+# Thời gian (giây) giữ response của một Idempotency-Key cho create_order; khóa cũ hơn được
+# `manage.py purge_idempotency_keys` xóa (chạy định kỳ).
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Sinh mã vận đơn (Order.tracking_number): hoán vị Feistel của một sequence, 10 chữ số, không
+# trùng. ORDER_TRACKING_NUMBER_KEY không được đổi sau khi đã có đơn hàng.
+ORDER_TRACKING_NUMBER_GENERATOR = 'clothes.tracking.FeistelTrackingNumberGenerator'
+ORDER_TRACKING_NUMBER_KEY = config('ORDER_TRACKING_NUMBER_KEY', default='internweb-order-tracking')
+# Thời gian lưu kết quả tra cứu /clothes/track/<mã vận đơn>/ (giây, 0 để tắt). Bị xóa khi đơn
+# hàng được lưu (đổi trạng thái); thay đổi bằng QuerySet.update() chỉ hiện ra sau thời gian này.
+ORDER_TRACKING_CACHE_TIMEOUT = 60
+
+# Transactional outbox (clothes/outbox.py): sự kiện đơn hàng được ghi cùng transaction với Order
+# và chuyển cho các handler dưới đây bởi `manage.py run_outbox_worker` (chạy thường trực).
+# Handler nhận một danh sách OutboxEvent cùng topic, phải idempotent, và có thể trả về
+# {event_id: lỗi} cho các sự kiện thất bại.
+OUTBOX_HANDLERS = {
+    'order.created': ['clothes.outbox.log_order_events'],
+    'order.status_changed': ['clothes.outbox.log_order_events'],
+    'email.send': ['clothes.emails.send_queued_emails'],
+}
+OUTBOX_BATCH_SIZE = 100
+# Sự kiện đã được worker lấy nhưng chưa xong sau chừng này giây sẽ được worker khác lấy lại.
+OUTBOX_LEASE_SECONDS = 300
+# Thử lại sau 5s, 10s, 20s, ... (tối đa 1 giờ); sau OUTBOX_MAX_ATTEMPTS lần chuyển sang 'failed'.
+OUTBOX_RETRY_BACKOFF = 5
+OUTBOX_RETRY_BACKOFF_MAX = 60 * 60
+OUTBOX_MAX_ATTEMPTS = 8
+# Sự kiện đã xử lý được giữ lại chừng này giây rồi bị `run_outbox_worker --purge` xóa.
+OUTBOX_RETENTION = 7 * 24 * 60 * 60
+# Sự kiện failed của các topic này cũng bị xóa sau OUTBOX_RETENTION: payload chứa link đặt lại
+# mật khẩu còn hiệu lực, không được giữ mãi trong database.
+OUTBOX_PURGE_FAILED_TOPICS = ['email.send']
+
+# Số thao tác tối đa trong một lần gọi /clothes/cart/batch/.
+CART_BATCH_MAX_OPERATIONS = 200
+
+# Backend tìm kiếm cho /clothes/search/:
+# - clothes.search.backends.DatabaseSearchBackend: name__icontains trên database
+# - clothes.search.backends.InvertedIndexSearchBackend: chỉ mục đảo ngược trong bộ nhớ của từng
+#   worker; thay đổi sản phẩm được báo cho các worker khác qua CACHES, nên khi chạy nhiều worker
+#   (gunicorn -w N) cần backend cache dùng chung (redis, memcached, file) thay cho locmem
+# - clothes.search.postgres.PostgresSearchBackend: full-text + pg_trgm (icontains trên SQLite)
+CLOTHES_SEARCH_BACKEND = 'clothes.search.backends.DatabaseSearchBackend'
+# Snapshot của chỉ mục trong bộ nhớ, ghi bởi `manage.py rebuild_search_index` (None để tắt).
+CLOTHES_SEARCH_INDEX_PATH = BASE_DIR / 'search_index.pickle'
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from clothes.models import *
+from clothes.shards import disable_sharding, enable_sharding
 from typing import Any
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib import admin
@@ -67,17 +68,44 @@ class UserAdmin(BaseUserAdmin):
 admin.site.register(UserAccount, UserAdmin)
 
 
+class StockShardInLine(admin.TabularInline):
+    model = StockShard
+    fields = ['shard', 'quantity']
+    readonly_fields = ['shard', 'quantity']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 class ClothesAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', '_price', 'quantity_in_stock', 'status_view']
-    list_filter = ['status', 'category']
+    list_display = ['id', 'name', '_price', 'quantity_in_stock', 'status_view', 'hot_sku']
+    list_filter = ['status', 'category', 'hot_sku']
     search_fields = ('name', 'status')
+    inlines = [StockShardInLine]
     def not_allow_edit(modeladmin, request, queryset):
         settings.ALLOW_EDIT_BY_ADMIN_ONLY = True
     def allow_edit(modeladmin, request, queryset):
         settings.ALLOW_EDIT_BY_ADMIN_ONLY = False
+    def enable_hot_sku(modeladmin, request, queryset):
+        count = enable_sharding(queryset.values_list('id', flat=True))
+        modeladmin.message_user(request, f'Đã chia kho cho {count} sản phẩm.')
+    def disable_hot_sku(modeladmin, request, queryset):
+        count = disable_sharding(queryset.values_list('id', flat=True))
+        modeladmin.message_user(request, f'Đã gộp kho cho {count} sản phẩm.')
     not_allow_edit.short_description = "Not Allow Edit"
     allow_edit.short_description = 'Allow Edit'
-    actions = [not_allow_edit, allow_edit]
+    enable_hot_sku.short_description = 'Bật chia kho (flash sale)'
+    disable_hot_sku.short_description = 'Tắt chia kho'
+    actions = [not_allow_edit, allow_edit, enable_hot_sku, disable_hot_sku]
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = list(super().get_readonly_fields(request, obj))
+        # Bật/tắt bằng action; khi đang chia kho, tồn kho là số tổng hợp từ các shard.
+        readonly_fields.append('hot_sku')
+        if obj is not None and obj.hot_sku:
+            readonly_fields.append('quantity_in_stock')
+        return readonly_fields
     def get_action(self, action):
         return super().get_action(action)
     def get_list_editable(self, request):
@@ -192,7 +220,8 @@ class OrderItemInLine(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['tracking_number', 'user', '_tongtien', 'status_view']
     list_filter = ['status']
-    # search_fields = ['tracking_number', 'customer']
+    # Mã vận đơn đủ 10 chữ số được tra bằng so khớp chính xác (get_search_results).
+    search_fields = ['user__username', 'hovaten', 'sdt']
     autocomplete_fields=('products',)
     inlines = [OrderItemInLine]
     fieldsets= (
@@ -203,6 +232,14 @@ class OrderAdmin(admin.ModelAdmin):
     )
     def get_action(self, action):
         return super().get_action(action)
+
+    def get_search_results(self, request, queryset, search_term):
+        # tracking_number = '...' dùng unique index; icontains/iexact thì không.
+        term = search_term.strip()
+        if len(term) == 10 and term.isascii() and term.isdigit():
+            return queryset.filter(tracking_number=term), False
+        return super().get_search_results(request, queryset, search_term)
+
     def get_list_editable(self, request):
         if settings.ALLOW_EDIT_BY_ADMIN_ONLY and not request.user.is_superuser:
             return None
@@ -0,0 +1,190 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+CATALOG_VERSION_KEY = 'clothes:version:catalog'
+CATEGORY_VERSION_KEY = 'clothes:version:category'
+PRODUCT_VERSION_KEY = 'clothes:version:product:{}'
+STATS_KEY = 'clothes:cache_stats:{}:{}'
+ORDER_TRACKING_KEY = 'clothes:track:{}'
+STORED_HEADERS = ('Content-Type', 'Vary', 'Allow')
+
+
+def _initial_version():
+    # Nếu khóa phiên bản bị cache loại bỏ, giá trị mới (theo thời gian) vẫn lớn hơn giá trị cũ,
+    # nên các response lưu với phiên bản cũ không bao giờ được dùng lại.
+    return int(time.time() * 1000)
+
+
+def get_versions(*keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _now_and_on_commit(bump):
+    # Tăng ngay và lần nữa sau commit: một GET chạy song song trước commit có thể đọc dữ liệu cũ
+    # rồi lưu dưới phiên bản vừa tăng; lần tăng sau commit làm response đó hết hiệu lực.
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def bump_version(key):
+    _now_and_on_commit(lambda: _incr_version(key))
+
+
+def bump_catalog_version():
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def bump_product_version(product_id):
+    bump_catalog_version()
+    bump_version(PRODUCT_VERSION_KEY.format(product_id))
+
+
+def bump_category_version():
+    bump_catalog_version()
+    bump_version(CATEGORY_VERSION_KEY)
+
+
+def bump_products_version(product_ids):
+    """
+    Tăng phiên bản của nhiều sản phẩm bằng một get_many và một set_many thay vì một lệnh
+    incr cho mỗi sản phẩm. Giá trị mới luôn lớn hơn giá trị đã đọc.
+    """
+    bump_catalog_version()
+    keys = [PRODUCT_VERSION_KEY.format(product_id) for product_id in product_ids]
+    if keys:
+        _now_and_on_commit(lambda: _bump_many(keys))
+
+
+def _bump_many(keys):
+    current = cache.get_many(keys)
+    now = _initial_version()
+    cache.set_many({key: max(now, current.get(key, 0) + 1) for key in keys}, timeout=None)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def record(scope, outcome):
+    _incr(STATS_KEY.format(scope, outcome))
+
+
+def cache_stats(scopes):
+    keys = {STATS_KEY.format(scope, outcome): (scope, outcome)
+            for scope in scopes for outcome in ('hits', 'misses')}
+    values = cache.get_many(keys)
+    stats = {scope: {'hits': 0, 'misses': 0} for scope in scopes}
+    for key, (scope, outcome) in keys.items():
+        stats[scope][outcome] = values.get(key, 0)
+    return stats
+
+
+def _version_keys(kwargs):
+    if 'pk' in kwargs:
+        return (PRODUCT_VERSION_KEY.format(kwargs['pk']), CATEGORY_VERSION_KEY)
+    return (CATALOG_VERSION_KEY,)
+
+
+def _response_key(scope, request, kwargs):
+    versions = get_versions(*_version_keys(kwargs))
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.GET.lists()))
+    raw = f"{request.path}?{query}|{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"clothes:response:{scope}:{'.'.join(map(str, versions))}:{digest}"
+
+
+CACHED_SCOPES = []
+
+
+def cache_catalog_response(scope):
+    """
+    Lưu nguyên byte của response GET (JSON, status 200) theo phiên bản danh mục sản phẩm.
+
+    Dùng bên ngoài @api_view. Khóa gồm phiên bản catalog (hoặc phiên bản của riêng sản phẩm
+    và danh mục cho view chi tiết có `pk`), nên mọi thay đổi Clothes/Category qua signal
+    làm các response cũ tự hết hiệu lực mà không cần xóa từng khóa.
+    """
+    CACHED_SCOPES.append(scope)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method != 'GET' or not settings.CATALOG_CACHE_TIMEOUT:
+                return view(request, *args, **kwargs)
+
+            key = _response_key(scope, request, kwargs)
+            entry = cache.get(key)
+            if entry is not None:
+                record(scope, 'hits')
+                content, status_code, headers = entry
+                response = HttpResponse(content, status=status_code)
+                for name, value in headers.items():
+                    response[name] = value
+                response['X-Cache'] = 'HIT'
+                return response
+
+            record(scope, 'misses')
+            response = view(request, *args, **kwargs)
+            renderer = getattr(response, 'accepted_renderer', None)
+            if response.status_code == 200 and renderer is not None and renderer.format == 'json':
+                response.render()
+                headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+                cache.set(key, (response.content, response.status_code, headers),
+                          timeout=settings.CATALOG_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapped
+    return decorator
+
+
+# Giá trị lưu cho mã vận đơn không tồn tại, để tra cứu lặp lại mã sai không xuống database.
+ORDER_TRACKING_MISSING = 'missing'
+CACHED_SCOPES.append('order_tracking')
+
+
+def get_order_tracking(tracking_number, load):
+    """
+    Trạng thái đơn hàng theo mã vận đơn từ cache; khi chưa có gọi `load()` (dict hoặc None nếu
+    không tồn tại) và lưu kết quả ORDER_TRACKING_CACHE_TIMEOUT giây. Trả về (data | None, hit).
+    """
+    key = ORDER_TRACKING_KEY.format(tracking_number)
+    timeout = settings.ORDER_TRACKING_CACHE_TIMEOUT
+    entry = cache.get(key) if timeout else None
+    if entry is not None:
+        record('order_tracking', 'hits')
+        return (None if entry == ORDER_TRACKING_MISSING else entry), True
+    record('order_tracking', 'misses')
+    data = load()
+    if timeout:
+        cache.set(key, ORDER_TRACKING_MISSING if data is None else data, timeout=timeout)
+    return data, False
+
+
+def invalidate_order_tracking(tracking_number):
+    """Xóa trạng thái đã lưu ngay và lần nữa sau commit: một lượt đọc xen giữa lúc ghi và lúc
+    commit có thể đã lưu lại giá trị cũ."""
+    key = ORDER_TRACKING_KEY.format(tracking_number)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
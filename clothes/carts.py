@@ -0,0 +1,162 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def adjust_cart_totals(cart_id, quantity=0, value=0):
+    """
+    Cộng số gia vào `Cart.quantity` (số loại sản phẩm) và `Cart.total_value` bằng một UPDATE
+    với F(); gọi trong cùng transaction với thay đổi CartItem (CartItem.save, post_delete).
+    """
+    from .models import Cart
+
+    if quantity or value:
+        Cart.objects.filter(pk=cart_id).update(quantity=F('quantity') + quantity,
+                                               total_value=F('total_value') + value)
+
+
+def _cart_total_subqueries():
+    from .models import CartItem
+
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    quantity = Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), Value(0))
+    total = Coalesce(Subquery(items.annotate(total=Sum('price')).values('total')), Value(0))
+    return quantity, total
+
+
+def refresh_cart_totals(cart_ids):
+    """Tính lại tổng của các giỏ hàng từ CartItem bằng một câu UPDATE (subquery)."""
+    from .models import Cart
+
+    quantity, total = _cart_total_subqueries()
+    return Cart.objects.filter(pk__in=cart_ids).update(quantity=quantity, total_value=total)
+
+
+def reconcile_carts(cart_ids=None, fix=True):
+    """
+    So sánh tổng lưu trong Cart với tổng tính từ CartItem; trả về danh sách
+    (cart_id, (quantity, total_value) đang lưu, (quantity, total_value) đúng) của các giỏ lệch
+    và sửa chúng khi `fix=True`.
+    """
+    from .models import Cart
+
+    quantity, total = _cart_total_subqueries()
+    carts = Cart.objects.all() if cart_ids is None else Cart.objects.filter(pk__in=cart_ids)
+    rows = (carts.annotate(expected_quantity=quantity, expected_total=total)
+            .exclude(quantity=F('expected_quantity'), total_value=F('expected_total'))
+            .order_by('id')
+            .values_list('id', 'quantity', 'total_value', 'expected_quantity', 'expected_total'))
+    mismatches = [(row[0], (row[1], row[2]), (row[3], row[4])) for row in rows]
+    if fix and mismatches:
+        refresh_cart_totals([cart_id for cart_id, _, _ in mismatches])
+    return mismatches
+
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+
+
+def _clean_operation(operation):
+    """Trả về (op, clothes_id, quantity, lỗi) cho một thao tác {op, clothes_id, quantity?}."""
+    if not isinstance(operation, dict):
+        return None, None, None, 'Mỗi thao tác phải là một object.'
+    op, clothes_id = operation.get('op'), operation.get('clothes_id')
+    if op not in CART_OPERATIONS:
+        return op, clothes_id, None, f'op phải là một trong {", ".join(CART_OPERATIONS)}.'
+    if isinstance(clothes_id, bool) or not isinstance(clothes_id, int) or clothes_id < 1:
+        return op, clothes_id, None, 'clothes_id phải là số nguyên dương.'
+    if op == 'remove':
+        return op, clothes_id, None, None
+    quantity = operation.get('quantity', 1 if op == 'add' else None)
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+        return op, clothes_id, None, 'quantity phải là số nguyên dương.'
+    return op, clothes_id, quantity, None
+
+
+def apply_cart_operations(cart, operations, atomic=False):
+    """
+    Áp dụng lần lượt các thao tác add/set/remove lên giỏ hàng trong một transaction.
+
+    Sản phẩm được đọc bằng một truy vấn IN, các CartItem liên quan bằng một SELECT ... FOR UPDATE;
+    thao tác được mô phỏng trong bộ nhớ rồi ghi bằng bulk_create/bulk_update/một lệnh DELETE và
+    một UPDATE số gia cho tổng của giỏ. Thao tác lỗi bị bỏ qua; với `atomic=True` chỉ cần một lỗi
+    là không ghi gì.
+
+    Trả về (results, applied): results theo thứ tự đầu vào {'index', 'op', 'clothes_id',
+    'result': 'ok' | 'error', 'error'?}.
+    """
+    from .models import CartItem, Clothes
+
+    cleaned = [_clean_operation(operation) for operation in operations]
+    product_ids = {clothes_id for _, clothes_id, _, error in cleaned if error is None}
+    results = []
+    with transaction.atomic():
+        products = Clothes.objects.only('id', 'price', 'quantity_in_stock').in_bulk(product_ids)
+        items = {}
+        for item in (CartItem.objects.select_for_update()
+                     .filter(cart=cart, product_id__in=products).order_by('id')):
+            items.setdefault(item.product_id, item)
+
+        quantities = {product_id: item.quantity for product_id, item in items.items()}
+        touched = set()
+        for index, (op, clothes_id, quantity, error) in enumerate(cleaned):
+            product = products.get(clothes_id)
+            current = quantities.get(clothes_id)
+            if error is None and product is None:
+                error = 'Sản phẩm không tồn tại'
+            elif error is None and op == 'remove':
+                if current is None:
+                    error = 'Không có sản phẩm nào trong giỏ hàng'
+                else:
+                    quantities[clothes_id] = None
+                    touched.add(clothes_id)
+            elif error is None:
+                new_quantity = (current or 0) + quantity if op == 'add' else quantity
+                if op == 'set' and current is None:
+                    error = 'Không có sản phẩm nào trong giỏ hàng'
+                elif product.quantity_in_stock < new_quantity:
+                    error = 'Sản phẩm trong kho không đủ'
+                else:
+                    quantities[clothes_id] = new_quantity
+                    touched.add(clothes_id)
+            result = {'index': index, 'op': op, 'clothes_id': clothes_id, 'result': 'ok'}
+            if error is not None:
+                result.update(result='error', error=error)
+            results.append(result)
+
+        if atomic and any(result['result'] == 'error' for result in results):
+            return results, False
+        _write_cart_items(cart, products, items,
+                          {product_id: quantities[product_id] for product_id in touched})
+    return results, True
+
+
+def _write_cart_items(cart, products, items, quantities):
+    from .models import CartItem
+
+    created, changed, removed = [], [], []
+    value_delta = 0
+    for product_id, quantity in quantities.items():
+        item = items.get(product_id)
+        if quantity is None:
+            if item is not None:
+                removed.append(item)
+            continue
+        price = products[product_id].price * quantity
+        if item is None:
+            created.append(CartItem(cart=cart, product_id=product_id, quantity=quantity, price=price))
+            value_delta += price
+        elif item.quantity != quantity or item.price != price:
+            value_delta += price - item.price
+            item.quantity, item.price = quantity, price
+            changed.append(item)
+
+    # bulk_create/bulk_update bỏ qua CartItem.save nên tự cộng số gia; DELETE vẫn qua post_delete.
+    if created:
+        CartItem.objects.bulk_create(created)
+        cart.products.add(*[item.product_id for item in created])
+    if changed:
+        CartItem.objects.bulk_update(changed, ['quantity', 'price'])
+    adjust_cart_totals(cart.pk, len(created), value_delta)
+    if removed:
+        CartItem.objects.filter(id__in=[item.id for item in removed]).delete()
+        cart.products.remove(*[item.product_id for item in removed])
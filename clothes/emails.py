@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
+
+from .outbox import publish_event
+
+EMAIL_TOPIC = 'email.send'
+
+_templates = {}
+
+
+def _get_template(name):
+    # Template đã biên dịch được giữ lại suốt đời tiến trình worker.
+    if name not in _templates:
+        _templates[name] = get_template(name)
+    return _templates[name]
+
+
+def queue_email(to, subject, body, html_template=None, context=None):
+    """
+    Đưa email vào hàng đợi (sự kiện outbox `email.send`) rồi trả về ngay; `run_outbox_worker`
+    dựng phần HTML từ `html_template` + `context` (phải serialize được thành JSON) và gửi.
+    Với EMAIL_USE_QUEUE = False thì gửi luôn trong request.
+    """
+    payload = {'to': list(to), 'subject': subject, 'body': body, 'from_email': settings.DEFAULT_FROM_EMAIL,
+               'html_template': html_template, 'context': context or {}}
+    if not settings.EMAIL_USE_QUEUE:
+        build_message(payload).send(fail_silently=False)
+        return None
+    return publish_event(EMAIL_TOPIC, payload)
+
+
+def build_message(payload):
+    message = EmailMultiAlternatives(payload['subject'], payload['body'], payload['from_email'], payload['to'])
+    if payload.get('html_template'):
+        message.attach_alternative(_get_template(payload['html_template']).render(payload['context']),
+                                   'text/html')
+    return message
+
+
+def send_queued_emails(events):
+    """
+    Handler outbox cho `email.send`: gửi cả lô qua một kết nối (get_connection() mở một lần,
+    send_messages() cho từng email trên kết nối đó) để biết email nào lỗi. Trả về
+    {event_id: lỗi}; các email lỗi được outbox thử lại với backoff.
+    """
+    failures, messages = {}, []
+    for event in events:
+        try:
+            messages.append((event, build_message(event.payload)))
+        except Exception as exc:
+            failures[event.id] = repr(exc)
+    if not messages:
+        return failures
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        failures.update({event.id: repr(exc) for event, _ in messages})
+        return failures
+    try:
+        for event, message in messages:
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                failures[event.id] = repr(exc)
+    finally:
+        connection.close()
+    return failures
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+import zlib
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+EXPORT_FIELDS = ['id', 'name', 'price', 'image', 'description', 'status',
+                 'quantity_in_stock', 'rating', 'category', 'updated_at']
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def parse_updated_since(value):
+    """Nhận ngày (2026-01-31) hoặc thời điểm ISO 8601; giờ không kèm múi giờ được hiểu theo TIME_ZONE."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = timezone.datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _format_datetime(value):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    text = value.isoformat()
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def _rows(queryset, chunk_size):
+    # values_list + iterator: không tạo model instance, không giữ cache kết quả của queryset;
+    # trên PostgreSQL Django dùng server-side cursor và đọc từng `chunk_size` dòng.
+    updated_at = EXPORT_FIELDS.index('updated_at')
+    for row in queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        row = list(row)
+        row[updated_at] = _format_datetime(row[updated_at])
+        yield row
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_ndjson(queryset, chunk_size=None):
+    chunk_size = chunk_size or settings.CATALOG_EXPORT_CHUNK_SIZE
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for batch in _batched(_rows(queryset, chunk_size), chunk_size):
+        yield ''.join(dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in batch).encode()
+
+
+def iter_csv(queryset, chunk_size=None):
+    chunk_size = chunk_size or settings.CATALOG_EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in _batched(_rows(queryset, chunk_size), chunk_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_stream(chunks, level=6):
+    """Nén gzip từng phần khi đang stream, không cần giữ toàn bộ nội dung trong bộ nhớ."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(request):
+    encodings = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for encoding in encodings.split(','):
+        name, _, params = encoding.strip().partition(';')
+        if name.strip().lower() == 'gzip':
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
@@ -0,0 +1,153 @@
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def price_bucket(price):
+    return bisect_right(settings.CATALOG_PRICE_BUCKETS, price or 0)
+
+
+def bucket_range(bucket):
+    bounds = settings.CATALOG_PRICE_BUCKETS
+    return (bounds[bucket - 1] if bucket > 0 else 0,
+            bounds[bucket] if bucket < len(bounds) else None)
+
+
+def facet_key(category_id, status, price):
+    return (category_id or 0, status, price_bucket(price))
+
+
+def apply_facet_deltas(deltas, facet_model=None):
+    """
+    Cộng dồn `deltas` ({(category_id, status, price_bucket): số gia}) vào bảng facet
+    bằng UPDATE ... SET count = count + n; tạo dòng mới nếu tổ hợp chưa có.
+    """
+    if facet_model is None:
+        from .models import CatalogFacetCount as facet_model
+    for (category_id, status, bucket), delta in deltas.items():
+        if not delta:
+            continue
+        rows = facet_model.objects.filter(category_id=category_id, status=status, price_bucket=bucket)
+        if rows.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                facet_model.objects.create(category_id=category_id, status=status,
+                                           price_bucket=bucket, count=delta)
+        except IntegrityError:
+            rows.update(count=F('count') + delta)
+
+
+def rebuild_facet_counts(clothes_model=None, facet_model=None):
+    """Tính lại toàn bộ bảng facet bằng một truy vấn GROUP BY (dùng để sửa sai lệch)."""
+    if clothes_model is None:
+        from .models import Clothes as clothes_model
+    if facet_model is None:
+        from .models import CatalogFacetCount as facet_model
+    bounds = settings.CATALOG_PRICE_BUCKETS
+    bucket = Case(
+        *[When(price__lt=bound, then=Value(i)) for i, bound in enumerate(bounds)],
+        default=Value(len(bounds)), output_field=IntegerField(),
+    )
+    rows = (
+        clothes_model.objects
+        .annotate(bucket=bucket, category_key=Coalesce('category_id', Value(0)))
+        .values('category_key', 'status', 'bucket')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        facet_model.objects.all().delete()
+        facet_model.objects.bulk_create([
+            facet_model(category_id=row['category_key'], status=row['status'],
+                        price_bucket=row['bucket'], count=row['total'])
+            for row in rows
+        ])
+
+
+def parse_catalog_filters(params):
+    """Đọc các bộ lọc category, min_price, max_price, status, min_rating từ query string."""
+    filters = {}
+    try:
+        if params.get('category'):
+            filters['category'] = int(params['category'])
+        if params.get('min_price'):
+            filters['min_price'] = int(params['min_price'])
+        if params.get('max_price'):
+            filters['max_price'] = int(params['max_price'])
+        if params.get('min_rating'):
+            filters['min_rating'] = float(params['min_rating'])
+    except ValueError:
+        raise InvalidFilter()
+    if params.get('status'):
+        from .models import Clothes
+        if params['status'] not in dict(Clothes.STATUS_CHOICES):
+            raise InvalidFilter()
+        filters['status'] = params['status']
+    return filters
+
+
+def filter_clothes(queryset, filters):
+    lookups = {
+        'category': 'category_id',
+        'min_price': 'price__gte',
+        'max_price': 'price__lte',
+        'status': 'status',
+        'min_rating': 'rating__gte',
+    }
+    return queryset.filter(**{lookups[name]: value for name, value in filters.items()})
+
+
+def _bucket_overlaps(bucket, filters):
+    low, high = bucket_range(bucket)
+    if 'min_price' in filters and high is not None and high <= filters['min_price']:
+        return False
+    if 'max_price' in filters and low > filters['max_price']:
+        return False
+    return True
+
+
+def get_facets(filters):
+    """
+    Số lượng theo danh mục, trạng thái và khoảng giá, đọc từ bảng CatalogFacetCount.
+
+    Mỗi nhóm facet áp dụng các bộ lọc của những chiều còn lại (kiểu "drill-down"). Khoảng
+    giá được làm tròn theo CATALOG_PRICE_BUCKETS và `min_rating` không ảnh hưởng tới facet.
+    """
+    from .models import CatalogFacetCount, Category
+
+    rows = list(CatalogFacetCount.objects.filter(count__gt=0)
+                .values_list('category_id', 'status', 'price_bucket', 'count'))
+    category_counts, status_counts, price_counts = {}, {}, {}
+    for category_id, status, bucket, count in rows:
+        category_ok = filters.get('category') in (None, category_id)
+        status_ok = filters.get('status') in (None, status)
+        price_ok = _bucket_overlaps(bucket, filters)
+        if status_ok and price_ok:
+            category_counts[category_id] = category_counts.get(category_id, 0) + count
+        if category_ok and price_ok:
+            status_counts[status] = status_counts.get(status, 0) + count
+        if category_ok and status_ok:
+            price_counts[bucket] = price_counts.get(bucket, 0) + count
+
+    names = dict(Category.objects.filter(id__in=category_counts).values_list('id', 'name'))
+    return {
+        'category': [
+            {'id': category_id or None, 'name': names.get(category_id), 'count': count}
+            for category_id, count in sorted(category_counts.items())
+        ],
+        'status': [
+            {'value': status, 'count': count} for status, count in sorted(status_counts.items())
+        ],
+        'price': [
+            {'min': bucket_range(bucket)[0], 'max': bucket_range(bucket)[1], 'count': count}
+            for bucket, count in sorted(price_counts.items())
+        ],
+    }
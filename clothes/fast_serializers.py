@@ -0,0 +1,120 @@
+from rest_framework import serializers
+
+# Các field mà to_representation trả lại nguyên giá trị đọc từ database (str, int, float, id).
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+SIMPLE, NESTED, CHILDREN = range(3)
+
+
+class _Plan:
+    """
+    Bản biên dịch một ModelSerializer: danh sách cột cho .values() và các bước dựng dict
+    theo đúng thứ tự field của serializer.
+    """
+
+    def __init__(self, serializer, prefix=''):
+        self.model = serializer.Meta.model
+        self.pk_column = f'{prefix}{self.model._meta.pk.name}'
+        self.columns = [self.pk_column]
+        self.steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if isinstance(field, serializers.ListSerializer):
+                if prefix:
+                    raise ValueError('Chỉ hỗ trợ quan hệ nhiều ở cấp ngoài cùng')
+                self.steps.append((CHILDREN, name, _ChildPlan(self.model, source, field.child)))
+            elif isinstance(field, serializers.ModelSerializer):
+                nested = _Plan(field, prefix=f'{prefix}{source}__')
+                self.columns.extend(nested.columns)
+                self.steps.append((NESTED, name, nested))
+            else:
+                column = f'{prefix}{source}'
+                self.columns.append(column)
+                convert = None if isinstance(field, IDENTITY_FIELDS) else field.to_representation
+                self.steps.append((SIMPLE, name, (column, convert)))
+        self.columns = list(dict.fromkeys(self.columns))
+
+    def build(self, row, children):
+        data = {}
+        for kind, name, payload in self.steps:
+            if kind == SIMPLE:
+                column, convert = payload
+                value = row[column]
+                data[name] = value if convert is None or value is None else convert(value)
+            elif kind == NESTED:
+                data[name] = None if row[payload.pk_column] is None else payload.build(row, None)
+            else:
+                data[name] = children[name].get(row[self.pk_column], [])
+        return data
+
+
+class _ChildPlan:
+    def __init__(self, parent_model, accessor, child_serializer):
+        relation = next(rel for rel in parent_model._meta.related_objects
+                        if rel.get_accessor_name() == accessor)
+        self.model = relation.related_model
+        self.parent_column = relation.field.name
+        self.plan = _Plan(child_serializer)
+
+    def fetch(self, parent_ids):
+        rows = (self.model.objects
+                .filter(**{f'{self.parent_column}__in': parent_ids})
+                .order_by(self.plan.pk_column)
+                .values(self.parent_column, *self.plan.columns))
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[self.parent_column], []).append(self.plan.build(row, None))
+        return grouped
+
+
+_compiled = {}
+MAX_COMPILED = 256
+
+
+class FastSerializer:
+    """
+    Dựng cùng cấu trúc JSON với `serializer_class(many=True)` từ các dòng `.values()`,
+    không tạo model instance hay serializer cho từng đối tượng.
+
+    Kế hoạch (cột cần đọc, cách chuyển từng field) được biên dịch một lần từ chính các
+    field của serializer, nên vẫn khớp khi serializer thay đổi. Quan hệ nhiều (ví dụ
+    `cartitem_set`) được đọc bằng một truy vấn IN cho cả trang, sắp xếp theo id.
+    """
+
+    def __init__(self, serializer_class, context=None):
+        self.plan = _Plan(serializer_class(context=context or {}))
+
+    @classmethod
+    def for_context(cls, serializer_class, context):
+        """Dùng lại bản biên dịch cho cùng serializer và cùng fields/expand."""
+        fields = context.get('fields')
+        key = (serializer_class, fields if fields is None else frozenset(fields),
+               frozenset(context.get('expand', ())))
+        fast = _compiled.get(key)
+        if fast is None:
+            fast = cls(serializer_class, context)
+            if len(_compiled) < MAX_COMPILED:
+                _compiled[key] = fast
+        return fast
+
+    def prepare(self, queryset, extra_columns=()):
+        return queryset.values(*dict.fromkeys([*self.plan.columns, *extra_columns]))
+
+    def serialize_rows(self, rows):
+        children = {}
+        child_steps = [(name, child) for kind, name, child in self.plan.steps if kind == CHILDREN]
+        if child_steps and rows:
+            parent_ids = [row[self.plan.pk_column] for row in rows]
+            children = {name: child.fetch(parent_ids) for name, child in child_steps}
+        return [self.plan.build(row, children) for row in rows]
+
+    def serialize(self, queryset):
+        return self.serialize_rows(list(self.prepare(queryset)))
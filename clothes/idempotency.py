@@ -0,0 +1,85 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _request_hash(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(f'{request.method} {request.path}\n{payload}'.encode()).hexdigest()
+
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return Response({'error': 'Idempotency-Key đã được dùng cho một yêu cầu khác.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = Response(record.response_body, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """
+    Cho phép client gửi lại yêu cầu an toàn với header `Idempotency-Key`.
+
+    Dùng bên trong @api_view/@permission_classes (cần request.user). Khóa được INSERT trước khi
+    chạy view, trong cùng transaction với view: yêu cầu trùng khóa chạy đồng thời bị chặn ở
+    unique index cho tới khi yêu cầu đầu commit, rồi nhận lại response đã lưu mà không chạy view
+    (không khóa Clothes). Response lỗi 5xx không được lưu: transaction rollback cả khóa để client
+    thử lại. Khóa hết hạn sau IDEMPOTENCY_KEY_TTL giây.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return view(request, *args, **kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return Response({'error': 'Idempotency-Key không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            request_hash = _request_hash(request)
+            lookup = {'user': request.user, 'scope': scope, 'key': key}
+            expired_before = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+            IdempotencyKey.objects.filter(created_at__lt=expired_before, **lookup).delete()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(request_hash=request_hash, **lookup)
+                    response = view(request, *args, **kwargs)
+                    if response.status_code >= 500:
+                        transaction.set_rollback(True)
+                        return response
+                    record.status_code = response.status_code
+                    record.response_body = response.data
+                    record.save(update_fields=['status_code', 'response_body'])
+                    return response
+            except IntegrityError:
+                record = IdempotencyKey.objects.filter(**lookup).first()
+                if record is None or record.status_code is None:
+                    return Response({'error': 'Yêu cầu với Idempotency-Key này đang được xử lý.'},
+                                    status=status.HTTP_409_CONFLICT)
+                return _replay(record, request_hash)
+        return wrapped
+    return decorator
+
+
+def purge_expired_keys(batch_size=1000, now=None):
+    """Xóa các khóa quá IDEMPOTENCY_KEY_TTL theo từng lô `batch_size` dòng; trả về số dòng đã xóa."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(created_at__lt=cutoff)
+                   .order_by('created_at').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,237 @@
+import csv
+import io
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.core.validators import URLValidator
+from django.db import connection, transaction
+
+from .models import Category, Clothes
+from .shards import redistribute_shards
+from .signals import products_bulk_changed
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Mỗi dòng là trạng thái đầy đủ của sản phẩm: các trường này đều được ghi đè khi trùng id.
+# `rating` không nằm trong file nhập và được giữ nguyên.
+UPSERT_FIELDS = ['name', 'price', 'image', 'description', 'status',
+                 'quantity_in_stock', 'category', 'updated_at']
+
+
+class ImportResult:
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.seconds = 0.0
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else None
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': self.rows_per_second,
+        }
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt):
+    """Trả về (số dòng trong file, dict dữ liệu hoặc None nếu dòng không đọc được)."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _integer(value, minimum):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    number = int(value)
+    if number < minimum:
+        raise ValueError(value)
+    return number
+
+
+class ProductImporter:
+    """
+    Nhập sản phẩm từ CSV/JSONL theo lô bằng
+    `bulk_create(update_conflicts=True, unique_fields=['id'])`: dòng có `id` đã tồn tại được
+    ghi đè, dòng không có `id` (hoặc id chưa có) được tạo mới.
+
+    Cột: id, name, price, image, description, quantity_in_stock, category (tên danh mục).
+    `status` được suy ra từ `quantity_in_stock` như Clothes.save. Không gọi Clothes.save cho
+    từng dòng; facet, chỉ mục tìm kiếm và cache được cập nhật một lần cho mỗi lô qua
+    signal `products_bulk_changed`.
+    """
+    validate_url = URLValidator()
+
+    def __init__(self, batch_size=2000, create_categories=False, max_errors=100):
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.result = ImportResult(max_errors)
+        self.categories = {name.strip().lower(): pk
+                           for pk, name in Category.objects.values_list('id', 'name')}
+
+    def _category_id(self, name):
+        key = name.strip().lower()
+        if key not in self.categories:
+            if not self.create_categories:
+                raise ValueError(name)
+            self.categories[key] = Category.objects.create(name=name.strip()).pk
+        return self.categories[key]
+
+    def clean(self, row):
+        """Trả về (Clothes chưa lưu, None) hoặc (None, {trường: lỗi})."""
+        errors = {}
+        values = {}
+        if not _blank(row.get('id')):
+            try:
+                values['id'] = _integer(row['id'], 1)
+            except (TypeError, ValueError):
+                errors['id'] = 'id phải là số nguyên dương.'
+
+        name = row.get('name')
+        if _blank(name):
+            errors['name'] = 'Tên sản phẩm không được để trống.'
+        elif len(str(name).strip()) > 255:
+            errors['name'] = 'Tên sản phẩm tối đa 255 ký tự.'
+        else:
+            values['name'] = str(name).strip()
+
+        try:
+            values['price'] = _integer(row.get('price'), 0)
+        except (TypeError, ValueError):
+            errors['price'] = 'Giá phải là số nguyên không âm.'
+
+        image = row.get('image')
+        try:
+            self.validate_url(str(image or '').strip())
+            values['image'] = str(image).strip()
+        except ValidationError:
+            errors['image'] = 'Đường dẫn ảnh không hợp lệ.'
+
+        description = row.get('description')
+        values['description'] = None if _blank(description) else str(description)
+
+        quantity = row.get('quantity_in_stock')
+        if _blank(quantity):
+            values['quantity_in_stock'] = Clothes._meta.get_field('quantity_in_stock').default
+        else:
+            try:
+                values['quantity_in_stock'] = _integer(quantity, 0)
+            except (TypeError, ValueError):
+                errors['quantity_in_stock'] = 'Số lượng trong kho phải là số nguyên không âm.'
+
+        category = row.get('category')
+        values['category_id'] = None
+        if not _blank(category):
+            try:
+                values['category_id'] = self._category_id(str(category))
+            except ValueError:
+                errors['category'] = f'Danh mục "{category}" không tồn tại.'
+
+        if errors:
+            return None, errors
+        values['status'] = Clothes.stock_status(values['quantity_in_stock'])
+        return Clothes(**values), None
+
+    def flush(self, batch):
+        # Trong cùng một lô, dòng sau ghi đè dòng trước có cùng id
+        # (PostgreSQL không cho ON CONFLICT cập nhật một dòng hai lần).
+        with_id = {product.id: product for product in batch if product.id is not None}
+        without_id = [product for product in batch if product.id is None]
+        with transaction.atomic():
+            rows = list(Clothes.objects.filter(id__in=with_id)
+                        .values_list('id', 'category_id', 'status', 'price', 'hot_sku'))
+            previous = {pk: {'category_id': category_id, 'status': status, 'price': price}
+                        for pk, category_id, status, price, _ in rows}
+            if with_id:
+                Clothes.objects.bulk_create(list(with_id.values()), update_conflicts=True,
+                                            unique_fields=['id'], update_fields=UPSERT_FIELDS)
+            if len(previous) < len(with_id):
+                self.reset_sequence()
+            # Dòng không có id luôn là sản phẩm mới: INSERT thường, không ON CONFLICT, để id do
+            # sequence cấp không bao giờ ghi đè một dòng vừa nhập.
+            Clothes.objects.bulk_create(without_id)
+            # Tồn kho của sản phẩm hot_sku nằm ở StockShard; rollup_stock sẽ ghi đè quantity_in_stock.
+            redistribute_shards({pk: with_id[pk].quantity_in_stock for pk, *_, hot_sku in rows if hot_sku})
+            products_bulk_changed.send(sender=Clothes, products=[*with_id.values(), *without_id],
+                                       previous=previous, fields=UPSERT_FIELDS)
+        self.result.updated += len(previous)
+        self.result.created += len(with_id) + len(without_id) - len(previous)
+
+    def reset_sequence(self):
+        # Dòng mới mang id tự chọn: đưa sequence của khóa chính vượt qua id lớn nhất.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Clothes]):
+                cursor.execute(sql)
+
+    def run(self, stream, fmt):
+        started = time.perf_counter()
+        batch = []
+        for line, row in read_rows(stream, fmt):
+            self.result.rows += 1
+            if row is None:
+                self.result.add_error(line, {'row': 'Dòng không đọc được.'})
+                continue
+            product, errors = self.clean(row)
+            if errors:
+                self.result.add_error(line, errors)
+                continue
+            batch.append(product)
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        self.result.seconds = time.perf_counter() - started
+        return self.result
+
+
+def import_products(file, fmt, **options):
+    """`file` là file nhị phân (upload hoặc open(..., 'rb')) mã hóa UTF-8."""
+    stream = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        return ProductImporter(**options).run(stream, fmt)
+    finally:
+        stream.detach()
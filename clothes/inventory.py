@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Clothes
+from .shards import redistribute_shards
+from .signals import products_bulk_changed
+
+INVENTORY_FIELDS = ('price', 'quantity_in_stock')
+
+
+def _clean_entry(entry):
+    """Trả về (id, {trường: giá trị mới}, lỗi) cho một phần tử {id, price?, quantity_in_stock?}."""
+    if not isinstance(entry, dict):
+        return None, None, {'entry': 'Mỗi phần tử phải là một object.'}
+    product_id = entry.get('id')
+    if isinstance(product_id, bool) or not isinstance(product_id, int) or product_id < 1:
+        return product_id, None, {'id': 'id phải là số nguyên dương.'}
+    changes, errors = {}, {}
+    for name in INVENTORY_FIELDS:
+        if name not in entry:
+            continue
+        value = entry[name]
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            errors[name] = 'Giá trị phải là số nguyên không âm.'
+        else:
+            changes[name] = value
+    if not changes and not errors:
+        errors['entry'] = 'Cần ít nhất một trong price, quantity_in_stock.'
+    return product_id, changes, errors
+
+
+def apply_inventory_updates(entries):
+    """
+    Cập nhật giá/tồn kho cho một lô sản phẩm trong một transaction:
+    một SELECT ... FOR UPDATE, một bulk_update cho price/quantity_in_stock/updated_at, một
+    UPDATE tính lại `status` cho cả lô, rồi một lần `products_bulk_changed` (facet, cache).
+    Tồn kho mới của sản phẩm hot_sku được chia lại vào các StockShard.
+
+    Trả về kết quả theo thứ tự đầu vào: {'id', 'result': 'updated' | 'not_found' | 'invalid',
+    'errors'?}. Nhiều phần tử cùng id được gộp, phần tử sau ghi đè phần tử trước.
+    """
+    results = []
+    pending = {}
+    previous = {}
+    for entry in entries:
+        product_id, changes, errors = _clean_entry(entry)
+        if errors:
+            results.append({'id': product_id, 'result': 'invalid', 'errors': errors})
+            continue
+        results.append({'id': product_id, 'result': None})
+        pending.setdefault(product_id, {}).update(changes)
+
+    if pending:
+        with transaction.atomic():
+            products = list(
+                Clothes.objects.select_for_update()
+                .filter(id__in=pending).order_by('id')
+                .only('id', 'category_id', 'status', 'updated_at', 'hot_sku', *INVENTORY_FIELDS)
+            )
+            previous = {product.pk: {'category_id': product.category_id, 'status': product.status,
+                                     'price': product.price} for product in products}
+            now = timezone.now()
+            for product in products:
+                for name, value in pending[product.pk].items():
+                    setattr(product, name, value)
+                product.status = Clothes.stock_status(product.quantity_in_stock)
+                product.updated_at = now
+            Clothes.objects.bulk_update(products, [*INVENTORY_FIELDS, 'updated_at'])
+            Clothes.objects.filter(id__in=previous).update(status=Clothes.stock_status_expression())
+            redistribute_shards({product.pk: product.quantity_in_stock for product in products
+                                 if product.hot_sku and 'quantity_in_stock' in pending[product.pk]})
+            products_bulk_changed.send(sender=Clothes, products=products, previous=previous,
+                                       fields=[*INVENTORY_FIELDS, 'status'])
+
+    for result in results:
+        if result['result'] is None:
+            result['result'] = 'updated' if result['id'] in previous else 'not_found'
+    return results
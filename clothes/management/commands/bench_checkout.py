@@ -0,0 +1,87 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from clothes.models import Clothes, Order, PaymentMethod, UserAccount
+from clothes.shards import enable_sharding, rollup_stock
+from clothes.stock import STOCK_STRATEGIES
+from clothes.views import create_order
+
+
+class Command(BaseCommand):
+    help = ('So sánh số đơn/giây của create_order giữa các CHECKOUT_STOCK_STRATEGY khi nhiều người '
+            'cùng mua một sản phẩm. Ghi vào database thật (mỗi luồng một kết nối) và xóa dữ liệu '
+            'seed khi kết thúc; chạy trên PostgreSQL để có số liệu có ý nghĩa.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, nargs='+', default=[1, 8, 64])
+        parser.add_argument('--orders-per-buyer', type=int, default=20)
+        parser.add_argument('--strategies', nargs='+', choices=STOCK_STRATEGIES, default=list(STOCK_STRATEGIES))
+        parser.add_argument('--shards', type=int, nargs='*', default=[],
+                            help='Chạy thêm chế độ chia kho (hot_sku) với các số shard này.')
+
+    def handle(self, *args, **options):
+        payment = PaymentMethod.objects.get_or_create(methodname='COD')[0]
+        per_buyer = options['orders_per_buyer']
+        self.stdout.write(f'{"strategy":12} {"buyers":>6} {"ok":>6} {"lỗi":>6} {"đơn/s":>10}')
+        modes = [(strategy, None) for strategy in options['strategies']]
+        modes += [('optimistic', shards) for shards in options['shards']]
+        for buyers in options['buyers']:
+            for strategy, shards in modes:
+                label = strategy if shards is None else f'shards={shards}'
+                ok, failed, elapsed = self.run(strategy, shards, buyers, per_buyer, payment)
+                self.stdout.write(f'{label:12} {buyers:6} {ok:6} {failed:6} {ok / elapsed:10,.1f}')
+
+    def run(self, strategy, shards, buyers, per_buyer, payment):
+        product = Clothes.objects.create(name='bench-checkout', price=1000, image='http://img.example.com/b.jpg',
+                                         quantity_in_stock=buyers * per_buyer)
+        if shards:
+            enable_sharding([product.id], shards=shards)
+        users = [UserAccount.objects.create_user(username=f'bench-checkout-{i}',
+                                                 email=f'bench-checkout-{i}@example.com',
+                                                 password='bench', role='user')
+                 for i in range(buyers)]
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(buyers + 1)
+        statuses = []
+
+        def buyer(user):
+            try:
+                barrier.wait()
+                for _ in range(per_buyer):
+                    request = factory.post('/clothes/create_order/', {
+                        'source': 'detail',
+                        'payment_method': payment.id,
+                        'products': [{'id': product.id, 'quantity': 1}],
+                    }, format='json')
+                    force_authenticate(request, user=user)
+                    statuses.append(create_order(request).status_code)
+            finally:
+                connection.close()
+
+        try:
+            with override_settings(CHECKOUT_STOCK_STRATEGY=strategy, STOCK_SHARD_COUNT=shards or 1):
+                threads = [threading.Thread(target=buyer, args=(user,)) for user in users]
+                for thread in threads:
+                    thread.start()
+                barrier.wait()
+                started = time.perf_counter()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+
+            if shards:
+                rollup_stock([product.id])
+            product.refresh_from_db()
+            ok = statuses.count(201)
+            if product.quantity_in_stock != buyers * per_buyer - ok:
+                self.stderr.write(f'Tồn kho sai: còn {product.quantity_in_stock}, đã bán {ok}')
+            return ok, len(statuses) - ok, elapsed
+        finally:
+            Order.objects.filter(user__in=users).delete()
+            UserAccount.objects.filter(pk__in=[user.pk for user in users]).delete()
+            product.delete()
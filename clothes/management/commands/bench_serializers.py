@@ -0,0 +1,80 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from clothes.fast_serializers import FastSerializer
+from clothes.models import Category, Clothes, Order, OrderItem, PaymentMethod, UserAccount
+from clothes.serializers import ClothesSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    help = ('So sánh tốc độ (dòng/giây) giữa ModelSerializer và FastSerializer cho danh sách '
+            'sản phẩm và đơn hàng. Dữ liệu seed bị rollback khi kết thúc.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--orders', type=int, default=2_000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def seed(self, rows, orders):
+        rng = random.Random(42)
+        categories = Category.objects.bulk_create([Category(name=f'Loại {i}') for i in range(10)])
+        Clothes.objects.bulk_create([
+            Clothes(name=f'Sản phẩm {i}', price=rng.randrange(50_000, 2_000_000, 1000),
+                    image=f'http://img.example.com/{i}.jpg', description='Mô tả ' * 10,
+                    category=rng.choice(categories), rating=rng.choice([None, 3.5, 4.0, 5.0]))
+            for i in range(rows)
+        ], batch_size=5000)
+        user = UserAccount.objects.create_user(username='bench', email='bench@example.com',
+                                               password='bench', role='user')
+        payment = PaymentMethod.objects.create(methodname='COD')
+        product_ids = list(Clothes.objects.values_list('id', flat=True)[:1000])
+        new_orders = Order.objects.bulk_create([
+            Order(user=user, payment_method=payment, tongtien=0, tracking_number=f'B{i:09d}')
+            for i in range(orders)
+        ], batch_size=5000)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=rng.choice(product_ids), quantity=1, total_value=100000)
+            for order in new_orders for _ in range(3)
+        ], batch_size=5000)
+        return user
+
+    def measure(self, label, count, func, repeat):
+        best = min(self._timed(func) for _ in range(repeat))
+        self.stdout.write(f'  {label:16} {best * 1000:9.1f} ms  {count / best:12,.0f} dòng/s')
+        return best
+
+    def _timed(self, func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        context = {'fields': None, 'expand': {'category'}}
+        with transaction.atomic():
+            user = self.seed(options['rows'], options['orders'])
+
+            clothes = Clothes.objects.select_related('category')
+            count = clothes.count()
+            self.stdout.write(f'\nClothes ({count} dòng, expand=category)')
+            slow = self.measure('ModelSerializer', count, lambda: ClothesSerializer(
+                clothes.all(), many=True, context=context).data, repeat)
+            fast = self.measure('FastSerializer', count, lambda: FastSerializer(
+                ClothesSerializer, context).serialize(clothes.all()), repeat)
+            self.stdout.write(f'  nhanh hơn {slow / fast:.1f} lần')
+
+            items = OrderItem.objects.select_related('product__category').order_by('id')
+            orders = Order.objects.filter(user=user).order_by('-created_at')
+            count = orders.count()
+            self.stdout.write(f'\nOrder ({count} đơn, 3 sản phẩm mỗi đơn)')
+            slow = self.measure('ModelSerializer', count, lambda: OrderSerializer(
+                orders.prefetch_related(Prefetch('orderitem_set', queryset=items)),
+                many=True, context=context).data, repeat)
+            fast = self.measure('FastSerializer', count, lambda: FastSerializer(
+                OrderSerializer, context).serialize(orders.all()), repeat)
+            self.stdout.write(f'  nhanh hơn {slow / fast:.1f} lần')
+            transaction.set_rollback(True)
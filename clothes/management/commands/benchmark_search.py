@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from clothes.models import Clothes
+
+BACKENDS = {
+    'icontains': 'clothes.search.backends.DatabaseSearchBackend',
+    'postgres': 'clothes.search.postgres.PostgresSearchBackend',
+    'inverted': 'clothes.search.backends.InvertedIndexSearchBackend',
+}
+
+WORDS = [
+    'Áo', 'thun', 'Quần', 'jeans', 'sơ', 'mi', 'Váy', 'đầm', 'khoác', 'len', 'cotton', 'nam',
+    'nữ', 'trẻ', 'em', 'đỏ', 'xanh', 'đen', 'trắng', 'hoodie', 'polo', 'kaki', 'lụa', 'dài',
+    'ngắn', 'tay', 'cổ', 'tròn', 'bò', 'thể', 'thao', 'công', 'sở', 'mùa', 'đông', 'hè',
+]
+
+QUERIES = ['áo thun', 'ao thun', 'quan jeans', 'hoodie den', 'vay lua', 'kho']
+
+
+class Command(BaseCommand):
+    help = ('So sánh độ trễ các backend tìm kiếm trên bảng Clothes được seed tạm thời. '
+            'Dữ liệu seed nằm trong một transaction và bị rollback khi kết thúc.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--backends', default='icontains,postgres',
+                            help='Danh sách backend, chọn trong: ' + ', '.join(BACKENDS))
+
+    def seed(self, rows):
+        rng = random.Random(42)
+        batch = []
+        for i in range(rows):
+            name = ' '.join(rng.choices(WORDS, k=4))
+            batch.append(Clothes(
+                name=name, price=rng.randrange(50_000, 2_000_000, 1000),
+                image=f'http://img.example.com/{i}.jpg',
+                description=' '.join(rng.choices(WORDS, k=12)),
+            ))
+            if len(batch) == 5000:
+                Clothes.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Clothes.objects.bulk_create(batch)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE clothes_clothes')
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['backends'].split(',') if name.strip()]
+        with transaction.atomic(), override_settings(CLOTHES_SEARCH_INDEX_PATH=None):
+            started = time.perf_counter()
+            self.seed(options['rows'])
+            self.stdout.write(f"Seed {options['rows']} dòng trong {time.perf_counter() - started:.1f}s "
+                              f"({connection.vendor})")
+
+            for name in names:
+                backend = import_string(BACKENDS[name])()
+                started = time.perf_counter()
+                backend.rebuild()
+                self.stdout.write(f'\n[{name}] chuẩn bị {time.perf_counter() - started:.2f}s')
+                for query in QUERIES:
+                    timings = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        ids, total = backend.search(query, offset=0, limit=20)
+                        timings.append((time.perf_counter() - started) * 1000)
+                        # Bỏ qua bộ nhớ đệm kết quả để đo chi phí truy vấn thật.
+                        getattr(backend, '_results', {}).clear()
+                    timings.sort()
+                    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                    self.stdout.write(f'  {query!r:16} {total:>8} kết quả  '
+                                      f'median {statistics.median(timings):8.2f} ms  p95 {p95:8.2f} ms')
+            transaction.set_rollback(True)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clothes.importer import IMPORT_FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = ('Nhập sản phẩm từ file CSV/JSONL theo lô (upsert theo id). '
+            'Cột: id, name, price, image, description, quantity_in_stock, category.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='input_format', choices=IMPORT_FORMATS,
+                            help='Mặc định đoán theo đuôi file (.csv, .jsonl, .ndjson).')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--create-categories', action='store_true',
+                            help='Tạo danh mục chưa có thay vì báo lỗi cho dòng đó.')
+        parser.add_argument('--max-errors', type=int, default=100,
+                            help='Số lỗi tối đa được in ra (vẫn đếm tất cả).')
+
+    def handle(self, *args, **options):
+        fmt = options['input_format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Không đoán được định dạng file, hãy dùng --format.')
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_products(file, fmt, batch_size=options['batch_size'],
+                                         create_categories=options['create_categories'],
+                                         max_errors=options['max_errors'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except UnicodeDecodeError:
+            raise CommandError('File phải được mã hóa UTF-8.')
+
+        for error in result.errors:
+            self.stderr.write(f"Dòng {error['line']}: "
+                              + '; '.join(f'{name}: {message}' for name, message in error['errors'].items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã đọc {result.rows} dòng trong {result.seconds:.1f}s ({result.rows_per_second or 0} dòng/s): '
+            f'{result.created} tạo mới, {result.updated} cập nhật, {result.error_count} lỗi'
+        ))
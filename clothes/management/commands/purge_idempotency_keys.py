@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from clothes.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Xóa các Idempotency-Key đã quá IDEMPOTENCY_KEY_TTL, theo từng lô.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã xóa {deleted} Idempotency-Key hết hạn'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from clothes.facets import rebuild_facet_counts
+from clothes.models import CatalogFacetCount
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng đếm facet của danh mục sản phẩm từ bảng Clothes.'
+
+    def handle(self, *args, **options):
+        rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã tính lại {CatalogFacetCount.objects.count()} dòng facet'
+        ))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from clothes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại toàn bộ chỉ mục tìm kiếm sản phẩm của backend đang cấu hình.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        backend.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã dựng lại chỉ mục ({backend.__class__.__name__}) trong {elapsed:.2f}s'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from clothes.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Tính lại rating_sum, rating_count và rating của sản phẩm từ OrderItem.'
+
+    def handle(self, *args, **options):
+        rated = recompute_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Đã tính lại đánh giá, {rated} sản phẩm có đánh giá'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from clothes.carts import reconcile_carts
+
+
+class Command(BaseCommand):
+    help = 'Kiểm tra Cart.quantity/total_value so với CartItem và sửa các giỏ hàng bị lệch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ liệt kê, không sửa.')
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_carts(fix=not options['dry_run'])
+        for cart_id, stored, expected in mismatches:
+            self.stdout.write(f'Giỏ hàng {cart_id}: đang lưu {stored}, đúng là {expected}')
+        action = 'Tìm thấy' if options['dry_run'] else 'Đã sửa'
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(mismatches)} giỏ hàng bị lệch'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from clothes.shards import rollup_stock
+
+
+class Command(BaseCommand):
+    help = 'Tính lại quantity_in_stock và status của các sản phẩm chia kho (hot_sku) từ StockShard.'
+
+    def handle(self, *args, **options):
+        updated = rollup_stock()
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật tồn kho của {updated} sản phẩm'))
@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from clothes.outbox import drain, outbox_stats, percentile, purge_processed_events
+
+
+class Command(BaseCommand):
+    help = ('Xử lý các sự kiện outbox (OutboxEvent) theo lô bằng SELECT ... FOR UPDATE SKIP LOCKED; '
+            'có thể chạy nhiều tiến trình cùng lúc. In số sự kiện/giây và độ trễ từ lúc ghi sự kiện.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Số sự kiện mỗi lô (mặc định OUTBOX_BATCH_SIZE).')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Số luồng chạy handler song song (theo topic); 1 để chạy tuần tự.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Số giây chờ khi không có sự kiện đến hạn.')
+        parser.add_argument('--report-interval', type=float, default=60.0)
+        parser.add_argument('--once', action='store_true', help='Xử lý hết sự kiện đến hạn rồi dừng.')
+        parser.add_argument('--stats', action='store_true', help='Chỉ in trạng thái outbox rồi dừng.')
+        parser.add_argument('--purge', action='store_true',
+                            help='Chỉ xóa sự kiện đã xử lý (và sự kiện failed của OUTBOX_PURGE_FAILED_TOPICS) '
+                                 'cũ hơn OUTBOX_RETENTION rồi dừng.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = outbox_stats()
+            self.stdout.write(' '.join(f'{key}={value:g}' if isinstance(value, float) else f'{key}={value}'
+                                       for key, value in stats.items()))
+            return
+        if options['purge']:
+            deleted = purge_processed_events()
+            self.stdout.write(self.style.SUCCESS(f'Đã xóa {deleted} sự kiện outbox đã xử lý'))
+            return
+
+        batch_size = options['batch_size'] or settings.OUTBOX_BATCH_SIZE
+        executor = ThreadPoolExecutor(max_workers=options['workers']) if options['workers'] > 1 else None
+        totals, window = self._empty(), self._empty()
+        started = reported = time.perf_counter()
+        try:
+            while True:
+                stats = drain(batch_size, executor)
+                self._add(totals, stats)
+                self._add(window, stats)
+                if options['once']:
+                    break
+                if not stats['batches']:
+                    time.sleep(options['poll_interval'])
+                if time.perf_counter() - reported >= options['report_interval']:
+                    self._report(window, time.perf_counter() - reported)
+                    window, reported = self._empty(), time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self._report(totals, time.perf_counter() - started, style=self.style.SUCCESS)
+
+    def _empty(self):
+        return {'batches': 0, 'done': 0, 'retried': 0, 'failed': 0, 'lags': []}
+
+    def _add(self, totals, stats):
+        for key in ('batches', 'done', 'retried', 'failed'):
+            totals[key] += stats[key]
+        totals['lags'] += stats['lags']
+
+    def _report(self, stats, elapsed, style=None):
+        lags = stats['lags']
+        line = (f"Đã xử lý {stats['done']} sự kiện ({stats['done'] / max(elapsed, 1e-9):,.1f}/s, "
+                f"{stats['batches']} lô), thử lại {stats['retried']}, lỗi {stats['failed']}; "
+                f"độ trễ p50={percentile(lags, 0.5):.3f}s p99={percentile(lags, 0.99):.3f}s "
+                f"max={max(lags, default=0):.3f}s")
+        self.stdout.write(style(line) if style else line)
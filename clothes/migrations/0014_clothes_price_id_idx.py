@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0013_clothes_rating_alter_cart_products_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clothes',
+            index=models.Index(fields=['price', 'id'], name='clothes_price_id_idx'),
+        ),
+    ]
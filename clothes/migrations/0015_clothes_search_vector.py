@@ -0,0 +1,71 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:46
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+# unaccent() chỉ là STABLE nên không dùng được trong biểu thức index; bọc lại thành IMMUTABLE.
+FORWARD_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION clothes_immutable_unaccent(text) RETURNS text AS $$
+        SELECT public.unaccent('public.unaccent', $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION clothes_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', clothes_immutable_unaccent(lower(coalesce(NEW.name, '')))), 'A') ||
+            setweight(to_tsvector('simple', clothes_immutable_unaccent(lower(coalesce(NEW.description, '')))), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER clothes_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, description ON clothes_clothes
+        FOR EACH ROW EXECUTE FUNCTION clothes_search_vector_update()
+    """,
+    "UPDATE clothes_clothes SET name = name",
+    "CREATE INDEX clothes_search_vector_gin ON clothes_clothes USING gin (search_vector)",
+    """
+    CREATE INDEX clothes_name_trgm_gin ON clothes_clothes
+        USING gin (clothes_immutable_unaccent(lower(name)) gin_trgm_ops)
+    """,
+]
+
+BACKWARD_SQL = [
+    "DROP INDEX IF EXISTS clothes_name_trgm_gin",
+    "DROP INDEX IF EXISTS clothes_search_vector_gin",
+    "DROP TRIGGER IF EXISTS clothes_search_vector_trigger ON clothes_clothes",
+    "DROP FUNCTION IF EXISTS clothes_search_vector_update()",
+    "DROP FUNCTION IF EXISTS clothes_immutable_unaccent(text)",
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        # Chỉ PostgreSQL; trên SQLite cột search_vector tồn tại nhưng luôn NULL.
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0014_clothes_price_id_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='clothes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(BACKWARD_SQL)),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+def populate_facet_counts(apps, schema_editor):
+    from clothes.facets import rebuild_facet_counts
+    rebuild_facet_counts(apps.get_model('clothes', 'Clothes'),
+                         apps.get_model('clothes', 'CatalogFacetCount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0015_clothes_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_id', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('còn hàng', 'còn hàng'), ('hết hàng', 'hết hàng')], max_length=10)),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='clothes',
+            index=models.Index(fields=['category', 'status', 'price'], name='clothes_cat_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothes',
+            index=models.Index(fields=['category', 'price'], name='clothes_cat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothes',
+            index=models.Index(fields=['status', 'price'], name='clothes_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothes',
+            index=models.Index(fields=['rating'], name='clothes_rating_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='catalogfacetcount',
+            constraint=models.UniqueConstraint(fields=('category_id', 'status', 'price_bucket'), name='unique_catalog_facet'),
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
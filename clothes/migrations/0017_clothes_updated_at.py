@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0016_catalog_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothes',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Cập nhật lúc'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:02
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Clothes = apps.get_model('clothes', 'Clothes')
+    OrderItem = apps.get_model('clothes', 'OrderItem')
+    totals = (OrderItem.objects.filter(rating__isnull=False)
+              .values('product_id').annotate(total=Sum('rating'), count=Count('id')).order_by())
+    Clothes.objects.bulk_update([
+        Clothes(id=row['product_id'], rating_sum=row['total'], rating_count=row['count'],
+                rating=row['total'] / row['count'])
+        for row in totals
+    ], ['rating_sum', 'rating_count', 'rating'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0017_clothes_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothes',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='clothes',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
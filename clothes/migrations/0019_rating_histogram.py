@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_rating_histograms(apps, schema_editor):
+    from clothes.ratings import recompute_ratings
+    recompute_ratings(apps.get_model('clothes', 'Clothes'), apps.get_model('clothes', 'OrderItem'),
+                      apps.get_model('clothes', 'RatingHistogram'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0018_clothes_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingHistogram',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_histogram', serialize=False, to='clothes.clothes')),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_rating_histograms, migrations.RunPython.noop),
+    ]
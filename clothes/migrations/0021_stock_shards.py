@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0020_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothes',
+            name='hot_sku',
+            field=models.BooleanField(default=False, verbose_name='Chia kho (flash sale)'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='clothes.clothes')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'shard'), name='stock_shard_product_shard_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+# Số thứ tự cho mã vận đơn (clothes/tracking.py); MAXVALUE giữ mã trong 10 chữ số.
+FORWARD_SQL = [
+    "CREATE SEQUENCE IF NOT EXISTS clothes_order_tracking_seq AS bigint MINVALUE 1 MAXVALUE 9999999999 NO CYCLE",
+]
+
+BACKWARD_SQL = [
+    "DROP SEQUENCE IF EXISTS clothes_order_tracking_seq",
+]
+
+
+def create_counter(apps, schema_editor):
+    # Database khác PostgreSQL: tạo sẵn dòng bộ đếm để đơn đầu tiên không phải INSERT.
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    SequenceCounter = apps.get_model('clothes', 'SequenceCounter')
+    SequenceCounter.objects.using(schema_editor.connection.alias).get_or_create(name='order_tracking')
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        # Chỉ PostgreSQL; database khác dùng bảng SequenceCounter.
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0022_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(BACKWARD_SQL)),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_stock_shard_count(apps, schema_editor):
+    Clothes = apps.get_model('clothes', 'Clothes')
+    StockShard = apps.get_model('clothes', 'StockShard')
+    counts = (StockShard.objects.filter(product__hot_sku=True).values('product_id')
+              .annotate(count=Count('id')).order_by().values_list('product_id', 'count'))
+    for product_id, count in counts:
+        Clothes.objects.filter(pk=product_id).update(stock_shard_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0024_outbox_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothes',
+            name='stock_shard_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_stock_shard_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+class DirtyFieldsMixin:
+    """
+    Ghi nhớ giá trị các cột lúc nạp từ database (hoặc sau lần lưu gần nhất) để `save()` chỉ
+    UPDATE các cột đã thay đổi.
+
+    - `save()` không truyền `update_fields` trên bản ghi đã có: chỉ ghi các trường đổi giá trị
+      (kèm các trường auto_now nếu có thay đổi); không có gì thay đổi thì không chạy truy vấn.
+    - `protected_fields`: không bao giờ được ghi tự động, chỉ ghi khi liệt kê rõ trong
+      `update_fields` (ví dụ các cột tổng hợp được cập nhật bằng F()).
+    - `get_loaded_value(attname)`: giá trị đã lưu trong database, dùng trong signal pre/post_save.
+
+    Đặt mixin trước lớp model trong danh sách kế thừa.
+    """
+    protected_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        deferred = self.get_deferred_fields()
+        self._snapshot(field.attname for field in self._meta.concrete_fields
+                       if field.attname not in deferred
+                       and (fields is None or field.name in fields or field.attname in fields))
+
+    def _snapshot(self, attnames):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for attname in attnames:
+            if attname in self.__dict__:
+                loaded[attname] = self.__dict__[attname]
+
+    def get_loaded_value(self, attname, default=None):
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def has_loaded_values(self, *attnames):
+        loaded = getattr(self, '_loaded_values', {})
+        return all(attname in loaded for attname in attnames)
+
+    def get_dirty_fields(self):
+        """Tên các trường (field.name) có giá trị khác với giá trị đã lưu."""
+        loaded = getattr(self, '_loaded_values', None)
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if loaded is None or field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname]:
+                dirty.append(field.name)
+        return dirty
+
+    def is_dirty(self, *names):
+        """True nếu là bản ghi mới hoặc một trong các trường `names` đã thay đổi."""
+        if self._state.adding:
+            return True
+        dirty = self.get_dirty_fields()
+        return any(name in dirty for name in names)
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert') and not args):
+            update_fields = [name for name in self.get_dirty_fields() if name not in self.protected_fields]
+            if update_fields:
+                update_fields += [field.name for field in self._meta.concrete_fields
+                                  if getattr(field, 'auto_now', False) and field.name not in update_fields]
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._snapshot(field.attname for field in self._meta.concrete_fields)
+        else:
+            self._snapshot(self._meta.get_field(name).attname for name in update_fields)
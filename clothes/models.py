@@ -1,10 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from django.utils.html import format_html
-import random
-import string
+from .carts import adjust_cart_totals
+from .mixins import DirtyFieldsMixin
+from .outbox import publish_event
+from .tracking import get_tracking_number_generator
 
 # Create your models here.
 class UserAccountManager(BaseUserManager):
@@ -37,7 +42,7 @@ class UserAccountManager(BaseUserManager):
             return user
         return None
 
-class UserAccount(AbstractBaseUser, PermissionsMixin):
+class UserAccount(DirtyFieldsMixin, AbstractBaseUser, PermissionsMixin):
     ROLE_CHOICES = [
         ('user', 'user'),
         ('admin', 'admin'),
@@ -63,14 +68,16 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
         return self.username
     
     def save(self, *args, **kwargs):
-        if self.role == 'admin':
-            self.is_staff = True
-        else:
-            self.is_staff = False
+        role_changed = self.is_dirty('role')
+        self.is_staff = self.role == 'admin'
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is not None and 'is_staff' not in update_fields
+                and self.is_dirty('is_staff')):
+            kwargs['update_fields'] = [*update_fields, 'is_staff']
 
         super(UserAccount, self).save(*args, **kwargs)
 
-        if not self.is_staff:
+        if role_changed and not self.is_staff:
             Cart.objects.get_or_create(user=self)
         
             
@@ -80,7 +87,7 @@ class Category(models.Model):
     def __str__(self):
         return self.name
     
-class Clothes(models.Model):
+class Clothes(DirtyFieldsMixin, models.Model):
     name = models.CharField(max_length=255, verbose_name="Tên")
     price = models.IntegerField(verbose_name="Giá")
     image = models.URLField(verbose_name="Ảnh")
@@ -93,6 +100,26 @@ class Clothes(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Loại")
     quantity_in_stock = models.IntegerField(null=True, default=10, blank=True, verbose_name="SL trong kho")
     rating = models.FloatField(null=True, blank=True)
+    # Tổng và số lượt đánh giá; chỉ thay đổi qua clothes.ratings (UPDATE với F()).
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Cập nhật lúc")
+    # Tồn kho chia thành nhiều StockShard; quantity_in_stock/status khi đó là số tổng hợp
+    # (clothes/shards.py), được tính lại định kỳ.
+    hot_sku = models.BooleanField(default=False, verbose_name="Chia kho (flash sale)")
+    # Số dòng StockShard hiện có của sản phẩm (0 khi tắt hot_sku); không đổi khi sửa STOCK_SHARD_COUNT.
+    stock_shard_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Do trigger trên PostgreSQL duy trì (xem migration 0015), không ghi từ Python.
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['price', 'id'], name='clothes_price_id_idx'),
+            models.Index(fields=['category', 'status', 'price'], name='clothes_cat_status_price_idx'),
+            models.Index(fields=['category', 'price'], name='clothes_cat_price_idx'),
+            models.Index(fields=['status', 'price'], name='clothes_status_price_idx'),
+            models.Index(fields=['rating'], name='clothes_rating_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -119,26 +146,93 @@ class Clothes(models.Model):
             return None
     _price.short_description = 'Giá'
     
+    @staticmethod
+    def stock_status(quantity):
+        return 'hết hàng' if quantity == 0 else 'còn hàng'
+
+    @staticmethod
+    def stock_status_expression():
+        """Cùng quy tắc với stock_status, dùng trong UPDATE hàng loạt."""
+        return models.Case(
+            models.When(quantity_in_stock=0, then=models.Value('hết hàng')),
+            default=models.Value('còn hàng'),
+        )
+
+    # Chỉ thay đổi qua clothes.ratings; save() thông thường không ghi đè các cột này.
+    protected_fields = ('rating', 'rating_sum', 'rating_count')
+
     def save(self, *args, **kwargs):
-        quantity = self.quantity_in_stock
-        if quantity == 0:
-            self.status = 'hết hàng'
-        else:
-            self.status = 'còn hàng'
+        if self.is_dirty('quantity_in_stock', 'status'):
+            self.status = self.stock_status(self.quantity_in_stock)
         super(Clothes, self).save(*args, **kwargs)
-        ratings = OrderItem.objects.filter(product = self).exclude(rating__isnull=True).values_list('rating', flat=True)
-        if len(ratings):
-            mean_ratings = sum(ratings)/len(ratings)
-        else:
-            mean_ratings = None
-        self.rating = mean_ratings
-        super().save(update_fields=["rating"])
 
-class Cart(models.Model):
+class RatingHistogram(models.Model):
+    """Số lượt đánh giá 1-5 sao của mỗi sản phẩm, cập nhật cùng lúc với Clothes.rating_sum."""
+    product = models.OneToOneField(Clothes, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='rating_histogram')
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    STAR_FIELDS = ['stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5']
+
+    def __str__(self):
+        return f'{self.product_id}: ' + ' '.join(str(getattr(self, name)) for name in self.STAR_FIELDS)
+
+class StockShard(models.Model):
+    """Một phần tồn kho của sản phẩm hot_sku; đơn hàng trừ vào một shard thay vì dòng Clothes."""
+    product = models.ForeignKey(Clothes, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='stock_shard_product_shard_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}#{self.shard}: {self.quantity}'
+
+class CatalogFacetCount(models.Model):
+    """
+    Số sản phẩm theo từng tổ hợp (danh mục, trạng thái, khoảng giá), được cập nhật
+    tăng dần khi Clothes thay đổi để bộ lọc không phải COUNT(*) cả bảng mỗi request.
+    """
+    # 0 nghĩa là sản phẩm không có danh mục.
+    category_id = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Clothes.STATUS_CHOICES)
+    price_bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category_id', 'status', 'price_bucket'],
+                                    name='unique_catalog_facet'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id}/{self.status}/{self.price_bucket}: {self.count}"
+
+class CartQuerySet(models.QuerySet):
+    def with_items(self, items=None):
+        """
+        Prefetch CartItem kèm sản phẩm và danh mục: số truy vấn cố định, không phụ thuộc số dòng
+        hàng. `items` thay queryset mặc định (ví dụ khi chỉ SELECT một số trường sản phẩm).
+        """
+        if items is None:
+            items = CartItem.objects.select_related('product__category').order_by('id')
+        return self.prefetch_related(models.Prefetch('cartitem_set', queryset=items))
+
+
+class Cart(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(UserAccount, on_delete=models.CASCADE, verbose_name='Khách hàng')
     quantity = models.PositiveIntegerField(default=1, verbose_name='Số lượng loại sản phẩm')
     products = models.ManyToManyField(Clothes, blank=True, verbose_name='Sản phẩm') 
     total_value = models.PositiveIntegerField(default=0, verbose_name='Tổng tiền')
+
+    objects = CartQuerySet.as_manager()
     
     def __str__(self):
         return f"Cart of {self.user.username}"
@@ -155,14 +249,13 @@ class Cart(models.Model):
     _total_value.short_description = 'Tổng tiền'
     
     def save(self, *args, **kwargs):
+        # quantity/total_value được CartItem cập nhật bằng số gia (clothes/carts.py), không tính lại ở đây.
+        if self._state.adding:
+            self.quantity, self.total_value = 0, 0
         super().save(*args, **kwargs)
-        items = CartItem.objects.filter(cart=self)
-        self.quantity = items.count()
-        self.total_value = sum(item.price for item in items)
-        super().save(update_fields=["quantity", "total_value"])
     
 
-class CartItem(models.Model):
+class CartItem(DirtyFieldsMixin, models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, verbose_name='Giỏ hàng')
     product = models.ForeignKey(Clothes, on_delete=models.CASCADE, verbose_name='Sản phẩm')
     quantity = models.PositiveBigIntegerField(default=1, verbose_name='Số lượng')
@@ -173,8 +266,18 @@ class CartItem(models.Model):
     
     
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        old_cart_id = None if adding else self.get_loaded_value('cart_id', self.cart_id)
+        old_price = 0 if adding else self.get_loaded_value('price', self.price)
+        # Luôn tính lại theo giá hiện tại của sản phẩm; giá không đổi thì không có gì để UPDATE.
         self.price = self.product.price * self.quantity
-        super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if old_cart_id is not None and old_cart_id != self.cart_id:
+                adjust_cart_totals(old_cart_id, -1, -old_price)
+                adjust_cart_totals(self.cart_id, 1, self.price)
+            else:
+                adjust_cart_totals(self.cart_id, int(adding), self.price - old_price)
         
     def _price(self):
         try:
@@ -198,7 +301,15 @@ class PaymentMethod(models.Model):
     def __str__(self):
         return self.methodname
     
-class Order(models.Model):
+class OrderQuerySet(models.QuerySet):
+    def with_items(self, items=None):
+        """Như CartQuerySet.with_items, cho OrderItem."""
+        if items is None:
+            items = OrderItem.objects.select_related('product__category').order_by('id')
+        return self.prefetch_related(models.Prefetch('orderitem_set', queryset=items))
+
+
+class Order(DirtyFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ("Chờ xác nhận", 'Chờ xác nhận'),
         ("Đang chuẩn bị", 'Đang chuẩn bị'),
@@ -218,6 +329,14 @@ class Order(models.Model):
     products = models.ManyToManyField(Clothes, blank=True)
     user = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
     payment_method = models.ForeignKey(PaymentMethod, on_delete=models.CASCADE)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Lịch sử đơn hàng của một khách: lọc theo user, phân trang keyset theo (created_at, id).
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
     
     def __str__(self):
         return self.tracking_number
@@ -228,10 +347,28 @@ class Order(models.Model):
 
         if not self.tracking_number:
             self.tracking_number = self.generate_tracking_number()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        old_status = None if adding else self.get_loaded_value('status', self.status)
+        # Sự kiện outbox nằm trong cùng transaction với đơn hàng: có cả hai hoặc không có gì.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if adding:
+                publish_event('order.created', self.event_payload())
+            elif old_status != self.status:
+                publish_event('order.status_changed', self.event_payload(old_status=old_status))
+
+    def event_payload(self, **extra):
+        return {'order_id': self.pk, 'tracking_number': self.tracking_number, 'user_id': self.user_id,
+                'status': self.status, 'tongtien': self.tongtien, **extra}
 
     def generate_tracking_number(self):
-        return ''.join(random.choices(string.digits, k=10)) 
+        # Mã của các đơn cũ (sinh ngẫu nhiên trước khi có generator) nằm cùng không gian 10 chữ số:
+        # bỏ qua mã đã tồn tại để không vi phạm ràng buộc unique.
+        generator = get_tracking_number_generator()
+        while True:
+            tracking_number = generator.generate()
+            if not Order.objects.filter(tracking_number=tracking_number).exists():
+                return tracking_number
     
     def _tongtien(self):
         try:
@@ -287,10 +424,6 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         self.total_value = self.product.price * self.quantity
         super().save(*args, **kwargs)
-        if self.order.status == 'Hoàn thành':
-            product = Clothes.objects.get(id=self.product.id)
-            # product.sold = self.quantity
-            product.save()
             
     def get_price(self):
         try:
@@ -306,3 +439,66 @@ class OrderItem(models.Model):
             return None
     _total_value.short_description = 'total_value'
             
+
+class IdempotencyKey(models.Model):
+    """
+    Response đã trả cho một Idempotency-Key (clothes/idempotency.py); yêu cầu lặp lại cùng khóa
+    nhận lại response này thay vì chạy lại view. Xóa định kỳ bằng `purge_idempotency_keys`.
+    """
+    user = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    # sha256 của nội dung yêu cầu: cùng khóa nhưng khác nội dung là lỗi của client.
+    request_hash = models.CharField(max_length=64)
+    # None khi yêu cầu đầu tiên còn đang chạy (chỉ thấy được trong transaction của nó).
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.scope}:{self.key}'
+
+class SequenceCounter(models.Model):
+    """Bộ đếm tăng dần cho database không có sequence (clothes/tracking.py: DatabaseCounter)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+class OutboxEvent(models.Model):
+    """
+    Sự kiện ghi trong cùng transaction với thay đổi dữ liệu (transactional outbox), được
+    `manage.py run_outbox_worker` chuyển cho các handler trong OUTBOX_HANDLERS (clothes/outbox.py).
+    """
+    PENDING, DONE, FAILED = 'pending', 'done', 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Chờ xử lý'),
+        (DONE, 'Đã xử lý'),
+        (FAILED, 'Lỗi'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Thời điểm sớm nhất worker được lấy sự kiện: lùi lại khi đang xử lý (lease) và khi thử lại.
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Chỉ các sự kiện chưa xử lý; sự kiện đã xong không làm phình index worker quét.
+            models.Index(fields=['available_at', 'id'], condition=models.Q(status='pending'),
+                         name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic}#{self.pk}'
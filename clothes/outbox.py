@@ -0,0 +1,207 @@
+import json
+import logging
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+analytics_logger = logging.getLogger('clothes.analytics')
+
+_handlers = {}
+
+
+def publish_event(topic, payload):
+    """
+    Ghi một sự kiện vào outbox. Gọi trong transaction của thay đổi dữ liệu: sự kiện chỉ tồn tại
+    nếu thay đổi được commit và không bao giờ bị mất sau khi commit.
+    """
+    from .models import OutboxEvent
+
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def get_handlers(topic):
+    """Các handler của `topic` trong OUTBOX_HANDLERS, import một lần mỗi tiến trình."""
+    handlers = []
+    for path in settings.OUTBOX_HANDLERS.get(topic, ()):
+        if path not in _handlers:
+            _handlers[path] = import_string(path)
+        handlers.append(_handlers[path])
+    return handlers
+
+
+def log_order_events(events):
+    """Handler mặc định: ghi mỗi sự kiện đơn hàng thành một dòng JSON vào logger `clothes.analytics`."""
+    for event in events:
+        analytics_logger.info(json.dumps({'topic': event.topic, 'event_id': event.pk,
+                                          'created_at': event.created_at.isoformat(), **event.payload},
+                                         default=str, ensure_ascii=False))
+
+
+def claim_events(batch_size, now=None):
+    """
+    Lấy tối đa `batch_size` sự kiện đến hạn bằng SELECT ... FOR UPDATE SKIP LOCKED và lùi
+    available_at thêm OUTBOX_LEASE_SECONDS: nhiều worker chạy song song không lấy trùng sự kiện,
+    còn sự kiện của worker chết giữa chừng được lấy lại khi hết lease. attempts tăng 1.
+    """
+    from .models import OutboxEvent
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        events = list(OutboxEvent.objects.select_for_update(skip_locked=True)
+                      .filter(status=OutboxEvent.PENDING, available_at__lte=now)
+                      .order_by('available_at', 'id')[:batch_size])
+        if events:
+            lease_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+            OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                available_at=lease_until, attempts=F('attempts') + 1)
+            for event in events:
+                event.available_at = lease_until
+                event.attempts += 1
+    return events
+
+
+def _run_handlers(topic, events, close_connection):
+    """Chạy các handler của một topic; trả về {event_id: lỗi} của các sự kiện thất bại."""
+    failures = {}
+    try:
+        for handler in get_handlers(topic):
+            pending = [event for event in events if event.id not in failures]
+            if not pending:
+                break
+            try:
+                # Handler có thể trả về {event_id: lỗi} cho các sự kiện thất bại riêng lẻ.
+                failures.update(handler(pending) or {})
+            except Exception as exc:
+                logger.exception('Handler %s lỗi với %d sự kiện %s', handler, len(pending), topic)
+                failures.update({event.id: repr(exc) for event in pending})
+    finally:
+        if close_connection:
+            connection.close()
+    return failures
+
+
+def retry_delay(attempts):
+    """Số giây chờ trước lần thử tiếp theo: lũy thừa 2 từ OUTBOX_RETRY_BACKOFF, tối đa
+    OUTBOX_RETRY_BACKOFF_MAX, nhân ngẫu nhiên 0.5-1 để các worker không thử lại cùng lúc."""
+    delay = min(settings.OUTBOX_RETRY_BACKOFF * 2 ** max(attempts - 1, 0), settings.OUTBOX_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1)
+
+
+def process_events(events, executor=None):
+    """
+    Chuyển các sự kiện (đã claim) cho handler, mỗi topic một lời gọi với cả nhóm sự kiện; các topic
+    chạy song song trên `executor` (ThreadPoolExecutor) nếu có. Sự kiện thành công được đánh dấu
+    done, sự kiện lỗi được hẹn thử lại với backoff hoặc chuyển sang failed sau OUTBOX_MAX_ATTEMPTS
+    lần. Handler phải idempotent: một sự kiện có thể được giao nhiều lần.
+
+    Trả về {'done', 'retried', 'failed', 'lags'}; lags là độ trễ (giây) từ lúc ghi sự kiện tới
+    lúc xử lý xong của từng sự kiện thành công.
+    """
+    from .models import OutboxEvent
+
+    groups = defaultdict(list)
+    for event in events:
+        groups[event.topic].append(event)
+    if executor is None:
+        results = [_run_handlers(topic, group, False) for topic, group in groups.items()]
+    else:
+        futures = [executor.submit(_run_handlers, topic, group, True) for topic, group in groups.items()]
+        results = [future.result() for future in futures]
+    failures = {event_id: error for result in results for event_id, error in result.items()}
+
+    now = timezone.now()
+    done = [event for event in events if event.id not in failures]
+    retried, failed = [], []
+    for event in events:
+        if event.id not in failures:
+            continue
+        event.last_error = failures[event.id][:2000]
+        if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            event.status = OutboxEvent.FAILED
+            failed.append(event)
+        else:
+            event.available_at = now + timedelta(seconds=retry_delay(event.attempts))
+            retried.append(event)
+    with transaction.atomic():
+        if done:
+            OutboxEvent.objects.filter(id__in=[event.id for event in done]).update(
+                status=OutboxEvent.DONE, processed_at=now, last_error='')
+        if retried or failed:
+            OutboxEvent.objects.bulk_update(retried + failed, ['status', 'available_at', 'last_error'])
+    return {
+        'done': len(done),
+        'retried': len(retried),
+        'failed': len(failed),
+        'lags': [(now - event.created_at).total_seconds() for event in done],
+    }
+
+
+def drain(batch_size, executor=None, max_batches=None):
+    """Xử lý các sự kiện đến hạn tới khi hết (hoặc sau `max_batches` lô); trả về thống kê gộp."""
+    totals = {'batches': 0, 'done': 0, 'retried': 0, 'failed': 0, 'lags': []}
+    while max_batches is None or totals['batches'] < max_batches:
+        events = claim_events(batch_size)
+        if not events:
+            break
+        stats = process_events(events, executor)
+        totals['batches'] += 1
+        for key in ('done', 'retried', 'failed'):
+            totals[key] += stats[key]
+        totals['lags'] += stats['lags']
+    return totals
+
+
+def outbox_stats(now=None):
+    """Số sự kiện theo trạng thái, số sự kiện đến hạn và tuổi (giây) của sự kiện chờ lâu nhất."""
+    from .models import OutboxEvent
+
+    now = now or timezone.now()
+    counts = {status: 0 for status, _ in OutboxEvent.STATUS_CHOICES}
+    counts.update(OutboxEvent.objects.values('status').annotate(count=Count('id')).order_by()
+                  .values_list('status', 'count'))
+    pending = OutboxEvent.objects.filter(status=OutboxEvent.PENDING)
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        **counts,
+        'due': pending.filter(available_at__lte=now).count(),
+        'oldest_pending_age': (now - oldest).total_seconds() if oldest else 0,
+    }
+
+
+def purge_processed_events(batch_size=1000, now=None):
+    """
+    Xóa theo từng lô các sự kiện done cũ hơn OUTBOX_RETENTION giây, và cả các sự kiện failed cũ
+    hơn chừng đó của các topic trong OUTBOX_PURGE_FAILED_TOPICS (payload có dữ liệu nhạy cảm,
+    ví dụ link đặt lại mật khẩu trong `email.send`). Trả về số dòng đã xóa.
+    """
+    from .models import OutboxEvent
+
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.OUTBOX_RETENTION)
+    querysets = [
+        OutboxEvent.objects.filter(status=OutboxEvent.DONE, processed_at__lt=cutoff).order_by('processed_at'),
+        # Sự kiện failed không có processed_at.
+        OutboxEvent.objects.filter(status=OutboxEvent.FAILED, topic__in=settings.OUTBOX_PURGE_FAILED_TOPICS,
+                                   created_at__lt=cutoff).order_by('created_at'),
+    ]
+    deleted = 0
+    for events in querysets:
+        while True:
+            ids = list(events.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
+    return deleted
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
@@ -0,0 +1,136 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.response import Response
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPagination:
+    """
+    Phân trang theo khóa (keyset / cursor).
+
+    Thay vì OFFSET, mỗi trang lọc theo giá trị của bản ghi cuối trang trước
+    trên một thứ tự ổn định (luôn kết thúc bằng khóa chính), nên trang thứ N
+    tốn chi phí như trang đầu nếu thứ tự đó có index.
+
+    `orderings` ánh xạ giá trị của tham số `ordering` sang bộ trường sắp xếp,
+    ví dụ {'price': ('price', 'id'), '-price': ('-price', '-id')}.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    paginate_query_param = 'paginate'
+
+    def __init__(self, orderings, default_ordering, page_size=None, max_page_size=None,
+                 paginate_by_default=None):
+        self.orderings = orderings
+        self.default_ordering = default_ordering
+        self.page_size = page_size or settings.CATALOG_PAGE_SIZE
+        self.max_page_size = max_page_size or settings.CATALOG_MAX_PAGE_SIZE
+        if paginate_by_default is None:
+            paginate_by_default = settings.CATALOG_PAGINATE_BY_DEFAULT
+        self.paginate_by_default = paginate_by_default
+        self.next_cursor = None
+
+    def is_requested(self, request):
+        params = request.query_params
+        flag = params.get(self.paginate_query_param)
+        if flag is not None:
+            return flag.lower() not in ('0', 'false', 'no')
+        if self.cursor_query_param in params or self.page_size_query_param in params:
+            return True
+        return self.paginate_by_default
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, ordering_key, values):
+        payload = json.dumps({'o': ordering_key, 'v': values}, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            ordering_key, values = payload['o'], payload['v']
+            if not isinstance(ordering_key, str) or not isinstance(values, list):
+                raise TypeError(payload)
+            if ordering_key not in self.orderings or len(values) != len(self.orderings[ordering_key]):
+                raise ValueError(payload)
+        except (ValueError, TypeError, KeyError):
+            raise InvalidCursor(cursor)
+        return ordering_key, values
+
+    def _after(self, model, ordering, values):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y); thêm điều kiện a >= x
+        # để planner có thể quét theo khoảng trên index của trường đầu tiên.
+        opts = model._meta
+        parsed = []
+        for name, value in zip(ordering, values):
+            field = opts.get_field(name.lstrip('-'))
+            try:
+                parsed.append((name.lstrip('-'), name.startswith('-'), field.to_python(value)))
+            except Exception:
+                raise InvalidCursor(value)
+
+        condition = Q()
+        equal = Q()
+        for field_name, descending, value in parsed:
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field_name}__{lookup}': value})
+            equal &= Q(**{field_name: value})
+
+        first_name, first_descending, first_value = parsed[0]
+        bound = Q(**{f"{first_name}__{'lte' if first_descending else 'gte'}": first_value})
+        return bound & condition
+
+    def _value(self, row, field_name):
+        if isinstance(row, dict):
+            return row[field_name]
+        return getattr(row, row._meta.get_field(field_name).attname)
+
+    def paginate_queryset(self, queryset, request):
+        params = request.query_params
+        ordering_key = params.get(self.ordering_query_param, self.default_ordering)
+        values = None
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            ordering_key, values = self.decode_cursor(cursor)
+        if ordering_key not in self.orderings:
+            raise InvalidCursor(ordering_key)
+
+        ordering = self.orderings[ordering_key]
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(queryset.model, ordering, values))
+
+        rows = list(queryset[:page_size + 1])
+        self.page_size = page_size
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(
+                ordering_key, [self._value(last, name.lstrip('-')) for name in ordering]
+            )
+        return rows
+
+    def get_paginated_data(self, data):
+        return {
+            'results': data,
+            'next': self.next_cursor,
+            'page_size': self.page_size,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
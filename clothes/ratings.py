@@ -0,0 +1,111 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .cache import bump_category_version, bump_product_version
+
+STARS = range(1, 6)
+
+
+def _rating_expression(sum_expression, count_expression):
+    return Cast(sum_expression, FloatField()) / Cast(count_expression, FloatField())
+
+
+def _add_to_histogram(product_id, rating, count):
+    from .models import RatingHistogram
+
+    column = f'stars_{rating}'
+    rows = RatingHistogram.objects.filter(product_id=product_id)
+    # Gỡ đánh giá mà không có dòng histogram (ví dụ dòng đã bị xóa cùng sản phẩm): không tạo mới.
+    if rows.update(**{column: F(column) + count}) or count < 0:
+        return
+    try:
+        with transaction.atomic():
+            RatingHistogram.objects.create(product_id=product_id, **{column: max(count, 0)})
+    except IntegrityError:
+        rows.update(**{column: F(column) + count})
+
+
+def add_rating(product_id, rating, count=1):
+    """
+    Cộng một đánh giá vào `rating_sum`/`rating_count` của sản phẩm bằng một UPDATE với F(),
+    tính lại `rating` trong cùng câu lệnh và tăng cột tương ứng của RatingHistogram.
+    Dùng `count=-1` (với số sao của dòng đó) để gỡ một đánh giá.
+    """
+    from .models import Clothes
+
+    new_sum = F('rating_sum') + rating * count
+    new_count = F('rating_count') + count
+    with transaction.atomic():
+        Clothes.objects.filter(pk=product_id).update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            # Vế phải của UPDATE đọc giá trị cũ của dòng, nên rating_count = -count nghĩa là về 0.
+            rating=Case(When(rating_count=-count, then=Value(None)),
+                        default=_rating_expression(new_sum, new_count), output_field=FloatField()),
+            # QuerySet.update() bỏ qua auto_now; export theo updated_since cần thấy thay đổi này.
+            updated_at=timezone.now(),
+        )
+        _add_to_histogram(product_id, rating, count)
+    bump_product_version(product_id)
+
+
+def rating_summaries(product_ids):
+    """
+    {id: {'product', 'rating', 'count', 'histogram'}} cho các sản phẩm tồn tại trong
+    `product_ids`, đọc bằng một truy vấn (LEFT JOIN sang RatingHistogram).
+    """
+    from .models import Clothes, RatingHistogram
+
+    columns = [f'rating_histogram__{name}' for name in RatingHistogram.STAR_FIELDS]
+    rows = Clothes.objects.filter(id__in=product_ids).values_list('id', 'rating', 'rating_count', *columns)
+    return {
+        row[0]: {
+            'product': row[0],
+            'rating': row[1],
+            'count': row[2],
+            'histogram': {str(stars): row[2 + stars] or 0 for stars in STARS},
+        }
+        for row in rows
+    }
+
+
+def recompute_ratings(clothes_model=None, order_item_model=None, histogram_model=None, batch_size=2000):
+    """
+    Tính lại tổng đánh giá và histogram của mọi sản phẩm từ OrderItem bằng một truy vấn
+    GROUP BY (product, số sao); dùng để sửa sai lệch.
+    """
+    if clothes_model is None:
+        from .models import Clothes as clothes_model
+    if order_item_model is None:
+        from .models import OrderItem as order_item_model
+    if histogram_model is None:
+        from .models import RatingHistogram as histogram_model
+
+    rows = (order_item_model.objects.filter(rating__isnull=False)
+            .values_list('product_id', 'rating').annotate(count=Count('id')).order_by())
+    histograms = {}
+    for product_id, rating, count in rows:
+        histograms.setdefault(product_id, {})[rating] = count
+
+    now = timezone.now()
+    with transaction.atomic():
+        clothes_model.objects.filter(Q(rating_count__gt=0) | Q(rating__isnull=False)).update(
+            rating_sum=0, rating_count=0, rating=None, updated_at=now)
+        products = []
+        for product_id, counts in histograms.items():
+            total = sum(stars * count for stars, count in counts.items())
+            number = sum(counts.values())
+            products.append(clothes_model(id=product_id, rating_sum=total, rating_count=number,
+                                          rating=total / number, updated_at=now))
+        clothes_model.objects.bulk_update(products, ['rating_sum', 'rating_count', 'rating', 'updated_at'],
+                                          batch_size=batch_size)
+        histogram_model.objects.all().delete()
+        histogram_model.objects.bulk_create([
+            histogram_model(product_id=product_id,
+                            **{f'stars_{stars}': count for stars, count in counts.items()})
+            for product_id, counts in histograms.items()
+        ], batch_size=batch_size)
+    bump_category_version()
+    return len(products)
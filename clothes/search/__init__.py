@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_backends = {}
+
+
+def get_search_backend():
+    """
+    Trả về backend tìm kiếm được cấu hình trong CLOTHES_SEARCH_BACKEND.
+    Mỗi backend chỉ khởi tạo một lần cho mỗi tiến trình.
+    """
+    path = settings.CLOTHES_SEARCH_BACKEND
+    backend = _backends.get(path)
+    if backend is None:
+        backend = _backends[path] = import_string(path)()
+    return backend
@@ -0,0 +1,352 @@
+import math
+import os
+import pickle
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from clothes.models import Clothes
+from .text import tokenize
+
+
+class BaseSearchBackend:
+    """
+    Giao diện chung cho các backend tìm kiếm sản phẩm.
+
+    `search` trả về (danh sách id sản phẩm theo thứ tự liên quan, tổng số kết quả).
+    Các hàm `index_product` / `remove_product` được gọi từ signal khi Clothes thay đổi.
+    """
+
+    def search(self, query, offset=0, limit=None):
+        raise NotImplementedError
+
+    def index_product(self, product):
+        pass
+
+    def index_products(self, products):
+        for product in products:
+            self.index_product(product)
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Tìm kiếm `name__icontains` trực tiếp trên bảng Clothes (hành vi cũ).
+    """
+
+    def search(self, query, offset=0, limit=None):
+        queryset = Clothes.objects.filter(name__icontains=query).order_by('id')
+        ids = queryset.values_list('id', flat=True)
+        if limit is None:
+            ids = list(ids[offset:])
+            return ids, offset + len(ids)
+        return list(ids[offset:offset + limit]), queryset.count()
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    Chỉ mục đảo ngược trong bộ nhớ trên `name` và `description`.
+
+    - Từ được bỏ dấu và tách token, nên "ao thun" khớp "Áo thun".
+    - Mỗi từ trong truy vấn khớp theo tiền tố ("ao th" khớp "áo thun"); mọi từ đều
+      phải khớp (AND), kết quả xếp hạng theo BM25, từ trong tên có trọng số cao hơn.
+    - Chỉ mục được cập nhật tăng dần qua signal của Clothes, sau khi transaction commit (rollback
+      thì chỉ mục không đổi). Id các sản phẩm thay đổi được ghi vào cache dùng chung kèm một
+      phiên bản tăng dần; tiến trình khác thấy phiên bản mới ở lần tìm kiếm kế tiếp và nạp lại
+      đúng các sản phẩm đó (dựng lại toàn bộ nếu danh sách thay đổi đã hết hạn hoặc bị cache
+      loại bỏ).
+    - Lệnh `rebuild_search_index` dựng lại toàn bộ và ghi snapshot ra
+      CLOTHES_SEARCH_INDEX_PATH; các tiến trình khác tự nạp lại khi snapshot đổi.
+    """
+    k1 = 1.2
+    b = 0.75
+    name_weight = 3
+    prefix_weight = 0.8
+    max_expansions = 64
+
+    result_cache_size = 256
+
+    version_key = 'clothes:version:search_index'
+    changes_key = 'clothes:search_index:changes:{}'
+    # Danh sách id thay đổi của mỗi phiên bản được giữ chừng này giây; tiến trình chậm hơn
+    # (hoặc chậm quá max_catch_up phiên bản) thì dựng lại toàn bộ.
+    changes_timeout = 24 * 60 * 60
+    max_catch_up = 1000
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._snapshot_mtime = None
+        self._version = None
+        self._results = OrderedDict()
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.terms = []
+        self._results.clear()
+
+    @property
+    def snapshot_path(self):
+        return settings.CLOTHES_SEARCH_INDEX_PATH
+
+    # Xây dựng chỉ mục
+
+    def _document_terms(self, name, description):
+        weights = {}
+        name_tokens = tokenize(name)
+        description_tokens = tokenize(description)
+        for token in name_tokens:
+            weights[token] = weights.get(token, 0) + self.name_weight
+        for token in description_tokens:
+            weights[token] = weights.get(token, 0) + 1
+        return weights, len(name_tokens) * self.name_weight + len(description_tokens)
+
+    def _add(self, product_id, name, description):
+        self._results.clear()
+        weights, length = self._document_terms(name, description)
+        for term, weight in weights.items():
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = {}
+                insort(self.terms, term)
+            docs[product_id] = weight
+        self.doc_terms[product_id] = tuple(weights)
+        self.doc_lengths[product_id] = length
+        self.total_length += length
+
+    def _remove(self, product_id):
+        terms = self.doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        self._results.clear()
+        self.total_length -= self.doc_lengths.pop(product_id)
+        for term in terms:
+            docs = self.postings[term]
+            docs.pop(product_id, None)
+            if not docs:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuild_from_db()
+            self.save_snapshot()
+
+    def _rebuild_from_db(self):
+        with self._lock:
+            # Đọc phiên bản trước dữ liệu: thay đổi commit trong lúc dựng sẽ được nạp lại sau.
+            self._version = cache.get(self.version_key, 0)
+            self._reset()
+            rows = Clothes.objects.values_list('id', 'name', 'description').iterator(chunk_size=2000)
+            # Nạp hàng loạt rồi sắp xếp một lần, tránh insort cho từng từ mới.
+            terms = set()
+            for product_id, name, description in rows:
+                weights, length = self._document_terms(name, description)
+                for term, weight in weights.items():
+                    self.postings.setdefault(term, {})[product_id] = weight
+                terms.update(weights)
+                self.doc_terms[product_id] = tuple(weights)
+                self.doc_lengths[product_id] = length
+                self.total_length += length
+            self.terms = sorted(terms)
+            self._built = True
+
+    def save_snapshot(self):
+        path = self.snapshot_path
+        if not path:
+            return
+        state = (self.postings, self.doc_terms, self.doc_lengths, self.total_length, self.terms,
+                 self._version)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._snapshot_mtime = os.stat(path).st_mtime
+
+    def _load_snapshot(self, mtime):
+        with open(self.snapshot_path, 'rb') as f:
+            state = pickle.load(f)
+        (self.postings, self.doc_terms, self.doc_lengths, self.total_length, self.terms) = state[:5]
+        # Snapshot cũ không có phiên bản: lần tìm kiếm sau sẽ dựng lại.
+        self._version = state[5] if len(state) > 5 else -1
+        self._results.clear()
+        self._snapshot_mtime = mtime
+        self._built = True
+
+    def _snapshot_mtime_on_disk(self):
+        path = self.snapshot_path
+        if not path:
+            return None
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def ensure_built(self):
+        mtime = self._snapshot_mtime_on_disk()
+        if not self._built or (mtime is not None and mtime != self._snapshot_mtime):
+            with self._lock:
+                if mtime is not None and mtime != self._snapshot_mtime:
+                    self._load_snapshot(mtime)
+                elif not self._built:
+                    self.rebuild()
+        version = cache.get(self.version_key, 0)
+        if version != self._version:
+            self._catch_up(version)
+
+    def _catch_up(self, version):
+        """Nạp lại các sản phẩm do tiến trình khác thay đổi giữa phiên bản đang có và `version`."""
+        with self._lock:
+            if version == self._version:
+                return
+            # Cache bị xóa (phiên bản lùi lại), chưa biết phiên bản hoặc chậm quá xa: dựng lại.
+            if (self._version is None or not self._version < version
+                    or version - self._version > self.max_catch_up):
+                self._rebuild_from_db()
+                return
+            keys = [self.changes_key.format(number) for number in range(self._version + 1, version + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) < len(keys):
+                self._rebuild_from_db()
+                return
+            ids = set().union(*changes.values())
+            rows = {product_id: (name, description) for product_id, name, description
+                    in Clothes.objects.filter(id__in=ids).values_list('id', 'name', 'description')}
+            for product_id in ids:
+                self._remove(product_id)
+                if product_id in rows:
+                    self._add(product_id, *rows[product_id])
+            self._version = version
+
+    def _on_commit(self, product_ids, apply):
+        """
+        Sau commit: áp dụng thay đổi (`apply`) vào chỉ mục của tiến trình này, tăng phiên bản dùng
+        chung và ghi id thay đổi cho các tiến trình khác. Transaction rollback thì không có gì đổi.
+        """
+        ids = sorted(set(product_ids))
+
+        def commit():
+            if self._built:
+                with self._lock:
+                    apply()
+            try:
+                version = cache.incr(self.version_key)
+            except ValueError:
+                cache.add(self.version_key, 0, timeout=None)
+                version = cache.incr(self.version_key)
+            cache.set(self.changes_key.format(version), ids, timeout=self.changes_timeout)
+            with self._lock:
+                # Thay đổi của chính tiến trình này đã có trong chỉ mục.
+                if self._version is not None and version == self._version + 1:
+                    self._version = version
+        transaction.on_commit(commit)
+
+    def index_product(self, product):
+        pk, name, description = product.pk, product.name, product.description
+
+        def apply():
+            self._remove(pk)
+            self._add(pk, name, description)
+        self._on_commit([pk], apply)
+
+    def index_products(self, products):
+        documents = [(product.pk, product.name, product.description) for product in products]
+
+        def apply():
+            for pk, name, description in documents:
+                self._remove(pk)
+                self._add(pk, name, description)
+        self._on_commit([pk for pk, _, _ in documents], apply)
+
+    def remove_product(self, product_id):
+        self._on_commit([product_id], lambda: self._remove(product_id))
+
+    # Truy vấn
+
+    def _expand(self, token):
+        """Các từ trong chỉ mục bắt đầu bằng `token`, kèm trọng số (khớp đúng = 1)."""
+        terms = self.terms
+        start = bisect_left(terms, token)
+        expansions = []
+        for term in terms[start:start + self.max_expansions]:
+            if not term.startswith(token):
+                break
+            expansions.append((term, 1.0 if term == token else self.prefix_weight))
+        return expansions
+
+    def _score(self, tf, idf, length, avg_length):
+        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def _rank(self, tokens):
+        """Danh sách id khớp mọi từ trong `tokens`, sắp theo điểm BM25 giảm dần."""
+        doc_count = len(self.doc_lengths)
+        avg_length = (self.total_length / doc_count) if doc_count else 1
+        expanded = []
+        for token in tokens:
+            terms = self._expand(token)
+            if not terms:
+                return []
+            df = sum(len(self.postings[term]) for term, _ in terms)
+            expanded.append((df, terms))
+        # Từ hiếm nhất trước: các từ sau chỉ cần kiểm tra trên tập ứng viên đã thu hẹp.
+        expanded.sort(key=lambda item: item[0])
+
+        scores = None
+        for _, terms in expanded:
+            token_scores = {}
+            for term, weight in terms:
+                docs = self.postings[term]
+                df = len(docs)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5)) * weight
+                if scores is None:
+                    candidates = docs.items()
+                elif len(docs) <= len(scores):
+                    candidates = ((doc_id, tf) for doc_id, tf in docs.items() if doc_id in scores)
+                else:
+                    candidates = ((doc_id, docs[doc_id]) for doc_id in scores if doc_id in docs)
+                for doc_id, tf in candidates:
+                    score = self._score(tf, idf, self.doc_lengths[doc_id], avg_length)
+                    if score > token_scores.get(doc_id, 0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: scores[doc_id] + score for doc_id, score in token_scores.items()}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [doc_id for doc_id, _ in ranked]
+
+    def search(self, query, offset=0, limit=None):
+        self.ensure_built()
+        tokens = tuple(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not tokens:
+                ranked = sorted(self.doc_lengths)
+            else:
+                # Kết quả xếp hạng được giữ lại cho các trang tiếp theo và truy vấn lặp lại;
+                # mọi thay đổi chỉ mục đều xóa bộ nhớ đệm này.
+                ranked = self._results.get(tokens)
+                if ranked is None:
+                    ranked = self._rank(tokens)
+                    self._results[tokens] = ranked
+                    if len(self._results) > self.result_cache_size:
+                        self._results.popitem(last=False)
+                else:
+                    self._results.move_to_end(tokens)
+        end = None if limit is None else offset + limit
+        return ranked[offset:end], len(ranked)
@@ -0,0 +1,56 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import CharField, F, Func, Q
+from django.db.models.functions import Lower
+
+from clothes.models import Clothes
+from .backends import BaseSearchBackend, DatabaseSearchBackend
+from .text import fold, tokenize
+
+
+class FoldedName(Func):
+    # Phải trùng biểu thức của index clothes_name_trgm_gin để planner dùng được index.
+    function = 'clothes_immutable_unaccent'
+    output_field = CharField()
+
+    def __init__(self):
+        super().__init__(Lower('name'))
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Tìm kiếm bằng PostgreSQL: full-text trên cột `search_vector` (trigger duy trì) kết hợp
+    độ tương đồng trigram trên tên đã bỏ dấu, cả hai đều dùng index GIN.
+
+    Trên database khác PostgreSQL (SQLite khi chạy test) dùng lại `name__icontains`.
+    """
+    fallback_class = DatabaseSearchBackend
+
+    def __init__(self):
+        self.fallback = self.fallback_class()
+
+    def search(self, query, offset=0, limit=None):
+        tokens = tokenize(query)
+        if connection.vendor != 'postgresql' or not tokens:
+            return self.fallback.search(query, offset, limit)
+
+        # Mỗi từ khớp theo tiền tố; token chỉ gồm \w nên ghép thẳng vào tsquery an toàn.
+        ts_query = SearchQuery(' & '.join(f'{token}:*' for token in tokens),
+                               config='simple', search_type='raw')
+        folded = fold(query).strip()
+        queryset = (
+            Clothes.objects
+            .annotate(folded_name=FoldedName())
+            .filter(Q(search_vector=ts_query) | Q(folded_name__trigram_similar=folded))
+        )
+        ranked = (
+            queryset
+            .annotate(rank=SearchRank(F('search_vector'), ts_query)
+                      + TrigramSimilarity('folded_name', folded))
+            .order_by('-rank', 'id')
+            .values_list('id', flat=True)
+        )
+        if limit is None:
+            ids = list(ranked[offset:])
+            return ids, offset + len(ids)
+        return list(ranked[offset:offset + limit]), queryset.count()
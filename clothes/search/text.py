@@ -0,0 +1,19 @@
+import re
+import unicodedata
+
+# Bỏ dấu tiếng Việt: tách dấu bằng NFD rồi xóa các ký tự dấu kết hợp (U+0300–U+036F).
+# 'đ' không tách được bằng NFD nên được thay riêng.
+_FOLD_TABLE = {code: None for code in range(0x0300, 0x0370)}
+_FOLD_TABLE[ord('đ')] = 'd'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    if not text:
+        return ''
+    return unicodedata.normalize('NFD', text.lower()).translate(_FOLD_TABLE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
@@ -56,10 +56,53 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = '__all__'
         
+def fieldset_context(request):
+    """
+    Đọc `?fields=id,name,price` và `?expand=category` thành context cho ClothesSerializer.
+    Tên trường không tồn tại -> ValidationError (400) liệt kê các tên đó.
+    """
+    params = request.query_params
+    fields = {name.strip() for name in params.get('fields', '').split(',') if name.strip()}
+    expand = {name.strip() for name in params.get('expand', '').split(',') if name.strip()}
+    unknown = fields - set(ClothesSerializer().fields)
+    if unknown:
+        raise serializers.ValidationError({'error': f"Trường không hợp lệ: {', '.join(sorted(unknown))}"})
+    return {'fields': fields or None, 'expand': expand}
+
+
+def product_query_plan(context, prefix=''):
+    """
+    Trả về (các trường cho .only(), các quan hệ cho .select_related()) của Clothes ứng với
+    context của fieldset_context; `only` là None khi cần đủ trường.
+    """
+    requested = context.get('fields')
+    expand_category = 'category' in context.get('expand', ()) and (
+        requested is None or 'category' in requested)
+    related = [f'{prefix}category'] if expand_category else []
+    if requested is None:
+        return None, related
+    names = {field.name for field in Clothes._meta.concrete_fields} & requested
+    names -= set(ClothesSerializer.Meta.exclude)
+    only = [f'{prefix}{name}' for name in sorted(names | {'id'})]
+    if expand_category:
+        only += [f'{prefix}category__id', f'{prefix}category__name']
+    return only, related
+
+
 class ClothesSerializer(serializers.ModelSerializer):
     class Meta:
         model = Clothes
-        fields = '__all__'
+        exclude = ['search_vector', 'updated_at', 'rating_sum', 'rating_count', 'hot_sku',
+                   'stock_shard_count']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        if 'category' in self.context.get('expand', ()) and 'category' in fields:
+            fields['category'] = CategorySerializer(read_only=True)
+        return fields
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = ClothesSerializer()  # Serialize thông tin sản phẩm
@@ -92,4 +135,19 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['id', 'tracking_number', 'status', 'created_at', 'updated_at',
-                  'hovaten', 'sdt', 'diachi', 'tongtien', 'products']
\ No newline at end of file
+                  'hovaten', 'sdt', 'diachi', 'tongtien', 'products']
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Đơn hàng không kèm danh sách sản phẩm (lịch sử đơn hàng ở chế độ summary)."""
+
+    class Meta:
+        model = Order
+        fields = ['id', 'tracking_number', 'status', 'created_at', 'updated_at', 'tongtien']
+
+
+class OrderTrackingSerializer(serializers.ModelSerializer):
+    """Thông tin công khai của đơn hàng khi tra cứu theo mã vận đơn."""
+
+    class Meta:
+        model = Order
+        fields = ['tracking_number', 'status', 'created_at', 'updated_at']
@@ -0,0 +1,133 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Clothes, StockShard
+from .signals import products_bulk_changed
+
+
+def split_quantity(total, shards):
+    """Chia `total` thành `shards` phần chênh nhau tối đa 1."""
+    base, extra = divmod(max(total, 0), shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+def _write_shards(totals, shards):
+    StockShard.objects.filter(product_id__in=totals).delete()
+    StockShard.objects.bulk_create([
+        StockShard(product_id=product_id, shard=shard, quantity=quantity)
+        for product_id, total in totals.items()
+        for shard, quantity in enumerate(split_quantity(total, shards))
+    ])
+
+
+def enable_sharding(product_ids, shards=None):
+    """Bật hot_sku: chia quantity_in_stock hiện tại vào `shards` dòng StockShard (mặc định
+    settings.STOCK_SHARD_COUNT). Trả về số sản phẩm được bật."""
+    shards = shards or settings.STOCK_SHARD_COUNT
+    with transaction.atomic():
+        totals = dict(Clothes.objects.select_for_update().filter(id__in=product_ids, hot_sku=False)
+                      .order_by('id').values_list('id', 'quantity_in_stock'))
+        _write_shards({product_id: total or 0 for product_id, total in totals.items()}, shards)
+        Clothes.objects.filter(id__in=totals).update(hot_sku=True, stock_shard_count=shards)
+    return len(totals)
+
+
+def disable_sharding(product_ids):
+    """Gộp các shard về quantity_in_stock rồi tắt hot_sku. Trả về số sản phẩm được tắt."""
+    with transaction.atomic():
+        ids = list(Clothes.objects.select_for_update().filter(id__in=product_ids, hot_sku=True)
+                   .order_by('id').values_list('id', flat=True))
+        rollup_stock(ids)
+        StockShard.objects.filter(product_id__in=ids).delete()
+        Clothes.objects.filter(id__in=ids).update(hot_sku=False, stock_shard_count=0)
+    return len(ids)
+
+
+def redistribute_shards(totals):
+    """
+    Ghi lại tồn kho {product_id: tổng mới} của các sản phẩm hot_sku (ví dụ sau khi nhập hàng),
+    giữ nguyên số shard của từng sản phẩm.
+    """
+    if not totals:
+        return
+    with transaction.atomic():
+        list(StockShard.objects.select_for_update().filter(product_id__in=totals)
+             .order_by('product_id', 'shard'))
+        groups = {}
+        for product_id, shards in Clothes.objects.filter(id__in=totals).values_list('id', 'stock_shard_count'):
+            groups.setdefault(shards or settings.STOCK_SHARD_COUNT, {})[product_id] = totals[product_id]
+        for shards, group in groups.items():
+            _write_shards(group, shards)
+
+
+def take_from_shards(product_id, quantity, shards=None, rng=random):
+    """
+    Trừ `quantity` khỏi tồn kho chia shard của sản phẩm; False nếu không đủ hàng.
+
+    Thường chỉ cần một UPDATE có điều kiện trên một shard chọn ngẫu nhiên trong `shards`
+    (Clothes.stock_shard_count, đọc từ database nếu không truyền), nên các đơn đồng thời khóa
+    các dòng khác nhau. Khi shard đó không đủ, khóa mọi shard của sản phẩm (theo thứ tự shard)
+    và trừ dần từ một vị trí ngẫu nhiên.
+    """
+    if shards is None:
+        shards = Clothes.objects.filter(pk=product_id).values_list('stock_shard_count', flat=True).first()
+    start = rng.randrange(shards) if shards else 0
+    if StockShard.objects.filter(product_id=product_id, shard=start, quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity):
+        return True
+
+    rows = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('shard'))
+    if sum(row.quantity for row in rows) < quantity:
+        return False
+    offset = rng.randrange(len(rows))
+    remaining = quantity
+    changed = []
+    for row in rows[offset:] + rows[:offset]:
+        if not remaining:
+            break
+        taken = min(row.quantity, remaining)
+        if taken:
+            row.quantity -= taken
+            remaining -= taken
+            changed.append(row)
+    StockShard.objects.bulk_update(changed, ['quantity'])
+    return True
+
+
+def rollup_stock(product_ids=None):
+    """
+    Tính lại quantity_in_stock/status của các sản phẩm hot_sku từ tổng các shard (một truy vấn
+    GROUP BY), chỉ ghi các sản phẩm thay đổi, rồi gửi `products_bulk_changed` (facet, cache).
+    Trả về số sản phẩm được cập nhật.
+    """
+    shards = StockShard.objects.filter(product__hot_sku=True)
+    if product_ids is not None:
+        shards = shards.filter(product_id__in=product_ids)
+    totals = dict(shards.values('product_id').annotate(total=Sum('quantity')).order_by()
+                  .values_list('product_id', 'total'))
+    if not totals:
+        return 0
+
+    now = timezone.now()
+    previous, changed = {}, []
+    products = Clothes.objects.filter(id__in=totals).only(
+        'id', 'category_id', 'status', 'price', 'quantity_in_stock', 'updated_at')
+    for product in products:
+        total = totals[product.pk]
+        if product.quantity_in_stock == total:
+            continue
+        previous[product.pk] = {'category_id': product.category_id, 'status': product.status,
+                                'price': product.price}
+        product.quantity_in_stock = total
+        product.status = Clothes.stock_status(total)
+        product.updated_at = now
+        changed.append(product)
+    if changed:
+        Clothes.objects.bulk_update(changed, ['quantity_in_stock', 'status', 'updated_at'])
+        products_bulk_changed.send(sender=Clothes, products=changed, previous=previous,
+                                   fields=['quantity_in_stock', 'status'])
+    return len(changed)
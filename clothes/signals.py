@@ -0,0 +1,124 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .cache import bump_category_version, bump_product_version, bump_products_version, invalidate_order_tracking
+from .carts import adjust_cart_totals
+from .facets import apply_facet_deltas, facet_key, rebuild_facet_counts
+from .models import CartItem, Category, Clothes, Order, OrderItem
+from .ratings import add_rating
+from .search import get_search_backend
+
+SEARCH_FIELDS = {'name', 'description'}
+FACET_FIELDS = {'category', 'category_id', 'status', 'price'}
+
+# Gửi sau khi ghi hàng loạt Clothes bằng bulk_create/bulk_update/update (không có post_save).
+# Tham số: `products` - các instance với giá trị mới, `previous` - {id: {'category_id', 'status',
+# 'price'}} trước khi ghi (sản phẩm mới không có trong `previous`), `fields` - các trường đã ghi.
+products_bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Clothes)
+def index_clothes(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index_product(instance)
+
+
+@receiver(post_delete, sender=Clothes)
+def unindex_clothes(sender, instance, **kwargs):
+    get_search_backend().remove_product(instance.pk)
+
+
+def _current_facet_key(instance):
+    return facet_key(instance.category_id, instance.status, instance.price)
+
+
+@receiver(post_save, sender=Clothes)
+def update_facet_counts(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not FACET_FIELDS.intersection(update_fields):
+        return
+    new_key = _current_facet_key(instance)
+    old_key = None
+    if not created and instance.has_loaded_values('category_id', 'status', 'price'):
+        old_key = facet_key(instance.get_loaded_value('category_id'), instance.get_loaded_value('status'),
+                            instance.get_loaded_value('price'))
+    if not created and old_key is None:
+        # Không biết giá trị cũ (bản ghi nạp với .only()/.defer()): tính lại toàn bộ.
+        rebuild_facet_counts()
+    elif old_key != new_key:
+        deltas = {new_key: 1}
+        if old_key is not None:
+            deltas[old_key] = -1
+        apply_facet_deltas(deltas)
+
+
+@receiver(post_delete, sender=Clothes)
+def remove_facet_count(sender, instance, **kwargs):
+    apply_facet_deltas({_current_facet_key(instance): -1})
+
+
+@receiver(post_delete, sender=Category)
+def rebuild_facets_after_category_delete(sender, instance, **kwargs):
+    # Sản phẩm của danh mục bị xóa được SET_NULL bằng UPDATE hàng loạt, không qua signal.
+    rebuild_facet_counts()
+
+
+@receiver(post_save, sender=Clothes)
+@receiver(post_delete, sender=Clothes)
+def invalidate_product_cache(sender, instance, **kwargs):
+    bump_product_version(instance.pk)
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_order_item_rating(sender, instance, origin=None, **kwargs):
+    # Dòng bị xóa theo sản phẩm (CASCADE): sản phẩm và histogram của nó cũng đang bị xóa.
+    deleting_product = isinstance(origin, Clothes) or getattr(origin, 'model', None) is Clothes
+    if instance.rating is not None and not deleting_product:
+        add_rating(instance.product_id, instance.rating, count=-1)
+
+
+@receiver(post_delete, sender=CartItem)
+def subtract_cart_item_totals(sender, instance, **kwargs):
+    adjust_cart_totals(instance.get_loaded_value('cart_id', instance.cart_id), -1,
+                       -instance.get_loaded_value('price', instance.price))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_tracking_cache(sender, instance, **kwargs):
+    # Cả khi tạo mới: mã vận đơn có thể đã được lưu là "không tồn tại".
+    invalidate_order_tracking(instance.tracking_number)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    bump_category_version()
+
+
+@receiver(products_bulk_changed)
+def bulk_index_clothes(sender, products, fields, **kwargs):
+    if SEARCH_FIELDS.intersection(fields):
+        get_search_backend().index_products(products)
+
+
+@receiver(products_bulk_changed)
+def bulk_update_facet_counts(sender, products, previous, fields, **kwargs):
+    if not FACET_FIELDS.intersection(fields):
+        return
+    deltas = {}
+    for product in products:
+        new_key = _current_facet_key(product)
+        old = previous.get(product.pk)
+        old_key = old and facet_key(old['category_id'], old['status'], old['price'])
+        if old_key == new_key:
+            continue
+        deltas[new_key] = deltas.get(new_key, 0) + 1
+        if old_key is not None:
+            deltas[old_key] = deltas.get(old_key, 0) - 1
+    apply_facet_deltas(deltas)
+
+
+@receiver(products_bulk_changed)
+def bulk_invalidate_product_cache(sender, products, **kwargs):
+    bump_products_version([product.pk for product in products])
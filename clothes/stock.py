@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import Clothes
+from .shards import take_from_shards
+from .signals import products_bulk_changed
+
+STOCK_STRATEGIES = ('locking', 'optimistic')
+
+
+class StockError(Exception):
+    """Không giữ được hàng cho đơn; `message` là thông báo trả cho client."""
+
+    def __init__(self, message, product_id=None):
+        super().__init__(message)
+        self.message = message
+        self.product_id = product_id
+
+
+def lock_products(product_ids, fields=None):
+    """
+    Khóa các sản phẩm bằng một SELECT ... WHERE id IN (...) ORDER BY id FOR UPDATE.
+    Mọi giao dịch khóa theo cùng thứ tự id nên hai đơn chứa cùng sản phẩm không thể deadlock.
+    Phải gọi trong transaction.
+    """
+    products = Clothes.objects.select_for_update().filter(id__in=product_ids).order_by('id')
+    if fields is not None:
+        products = products.only('id', *fields)
+    return {product.pk: product for product in products}
+
+
+def _missing_error(product_id):
+    name = Clothes.objects.filter(pk=product_id).values_list('name', flat=True).first()
+    if name is None:
+        return StockError(f'Sản phẩm với ID {product_id} không tồn tại.', product_id)
+    return StockError(f"Sản phẩm '{name}' không đủ số lượng trong kho.", product_id)
+
+
+def _reserve_locking(quantities, now):
+    products = lock_products(quantities)
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or product.quantity_in_stock < quantity:
+            raise _missing_error(product_id)
+
+    previous = {}
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        previous[product_id] = {'category_id': product.category_id, 'status': product.status,
+                                'price': product.price}
+        product.quantity_in_stock -= quantity
+        product.status = Clothes.stock_status(product.quantity_in_stock)
+        product.updated_at = now
+    Clothes.objects.bulk_update(list(products.values()), ['quantity_in_stock', 'status', 'updated_at'])
+    return products, previous
+
+
+def _reserve_optimistic(quantities, now):
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        updated = Clothes.objects.filter(id=product_id, quantity_in_stock__gte=quantity).update(
+            quantity_in_stock=F('quantity_in_stock') - quantity,
+            # Vế phải đọc giá trị cũ: tồn kho cũ bằng đúng `quantity` nghĩa là về 0.
+            status=Case(When(quantity_in_stock=quantity, then=Value('hết hàng')), default=Value('còn hàng')),
+            updated_at=now,
+        )
+        if not updated:
+            raise _missing_error(product_id)
+
+    # Các dòng đã bị UPDATE khóa tới cuối transaction nên đọc lại là giá trị vừa ghi.
+    products = Clothes.objects.in_bulk(quantities)
+    previous = {
+        product_id: {'category_id': product.category_id, 'price': product.price,
+                     'status': Clothes.stock_status(product.quantity_in_stock + quantities[product_id])}
+        for product_id, product in products.items()
+    }
+    return products, previous
+
+
+def reserve_stock(quantities, strategy=None):
+    """
+    Trừ tồn kho cho {product_id: số lượng} trong transaction hiện tại; ném StockError (sản phẩm
+    không tồn tại hoặc không đủ hàng) và transaction của người gọi phải rollback.
+
+    - 'locking': SELECT ... FOR UPDATE cả lô theo thứ tự id, kiểm tra rồi một bulk_update.
+    - 'optimistic': với từng sản phẩm (theo thứ tự id) một câu
+      UPDATE ... SET quantity_in_stock = quantity_in_stock - q WHERE id = ? AND quantity_in_stock >= q
+      cập nhật luôn status; không giữ khóa trong lúc chạy code Python giữa SELECT và UPDATE.
+
+    Sản phẩm hot_sku luôn trừ vào StockShard (clothes/shards.py), không ghi dòng Clothes;
+    quantity_in_stock/status của chúng được tính lại bởi `rollup_stock`.
+
+    `strategy` mặc định lấy từ settings.CHECKOUT_STOCK_STRATEGY. Facet, chỉ mục tìm kiếm và
+    cache được cập nhật bằng một lần `products_bulk_changed`. Trả về {product_id: Clothes}.
+    """
+    strategy = strategy or settings.CHECKOUT_STOCK_STRATEGY
+    if strategy not in STOCK_STRATEGIES:
+        raise ImproperlyConfigured(f'CHECKOUT_STOCK_STRATEGY phải là một trong {STOCK_STRATEGIES}.')
+
+    hot = dict(Clothes.objects.filter(id__in=quantities, hot_sku=True).values_list('id', 'stock_shard_count'))
+    for product_id in sorted(hot):
+        if not take_from_shards(product_id, quantities[product_id], shards=hot[product_id]):
+            raise _missing_error(product_id)
+    products = Clothes.objects.in_bulk(hot) if hot else {}
+
+    rest = {product_id: quantity for product_id, quantity in quantities.items() if product_id not in hot}
+    if rest:
+        reserve = _reserve_locking if strategy == 'locking' else _reserve_optimistic
+        reserved, previous = reserve(rest, timezone.now())
+        products.update(reserved)
+        products_bulk_changed.send(sender=Clothes, products=list(reserved.values()), previous=previous,
+                                   fields=['quantity_in_stock', 'status'])
+    return products
@@ -0,0 +1,132 @@
+import tempfile
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from django.urls import reverse
+from clothes.models import *
+
+
+class CatalogCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Áo")
+        self.tee = Clothes.objects.create(name="Áo thun", price=100000, image="http://img.com/1.jpg",
+                                          category=self.category)
+        self.jeans = Clothes.objects.create(name="Quần jeans", price=300000, image="http://img.com/2.jpg")
+        self.list_url = reverse('get_clothes')
+        self.detail_url = reverse('clothes_detail', kwargs={'pk': self.tee.id})
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.list_url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get(self.list_url, {'ordering': 'price', 'page_size': 1})
+        response = self.client.get(self.list_url, {'ordering': '-price', 'page_size': 1})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['name'], "Quần jeans")
+
+    def test_product_save_invalidates_list_and_detail(self):
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+        self.tee.name = "Áo thun trơn"
+        self.tee.save()
+        listing = self.client.get(self.list_url)
+        detail = self.client.get(self.detail_url)
+        self.assertEqual(listing['X-Cache'], 'MISS')
+        self.assertEqual(detail.json()['name'], "Áo thun trơn")
+
+    def test_read_during_write_transaction_is_not_served_after_commit(self):
+        # Response được lưu trong lúc transaction ghi chưa commit (một GET song song dưới READ
+        # COMMITTED sẽ thấy dữ liệu cũ) không được dùng lại sau commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.tee.name = "Áo thun trơn"
+                self.tee.save()
+                self.client.get(self.detail_url)
+                self.client.get(self.list_url)
+                self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.list_url)['X-Cache'], 'MISS')
+
+    def test_rating_in_transaction_bumps_again_on_commit(self):
+        from clothes.ratings import add_rating
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                add_rating(self.tee.id, 5)
+                self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['rating'], 5.0)
+
+    def test_other_product_write_keeps_detail_cached(self):
+        self.client.get(self.detail_url)
+        self.jeans.price = 350000
+        self.jeans.save()
+        self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(self.list_url)['X-Cache'], 'MISS')
+
+    def test_category_write_invalidates_categories(self):
+        self.client.get(reverse('category'))
+        self.category.name = "Áo nam"
+        self.category.save()
+        response = self.client.get(reverse('category'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['name'], "Áo nam")
+
+    def test_delete_view_invalidates(self):
+        admin = UserAccount.objects.create_user(username='admin', email='admin@gmail.com',
+                                                password='admin123', role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        self.client.get(self.list_url)
+        client.delete(reverse('delete_clothes', kwargs={'pk': self.jeans.id}))
+        response = self.client.get(self.list_url)
+        self.assertEqual([item['name'] for item in response.json()], ["Áo thun"])
+
+    def test_errors_are_not_cached(self):
+        url = reverse('clothes_detail', kwargs={'pk': 9999})
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_stats(self):
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+        admin = UserAccount.objects.create_user(username='admin', email='admin@gmail.com',
+                                                password='admin123', role='admin')
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse('catalog_cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['scopes']['product_list'], {'hits': 1, 'misses': 1})
+        self.assertEqual(response.data['scopes']['product_detail'], {'hits': 0, 'misses': 1})
+        self.assertEqual(response.data['hits'], 1)
+
+    def test_stats_requires_admin(self):
+        response = self.client.get(reverse('catalog_cache_stats'))
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(CATALOG_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        self.client.get(self.list_url)
+        self.assertFalse(self.client.get(self.list_url).has_header('X-Cache'))
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                   'LOCATION': tmp}}
+            with self.settings(CACHES=backend):
+                self.client.get(self.detail_url)
+                self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'HIT')
+                self.tee.price = 120000
+                self.tee.save()
+                response = self.client.get(self.detail_url)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertEqual(response.json()['price'], 120000)
@@ -1,5 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase, APIClient
 from django.urls import reverse
+from clothes.carts import reconcile_carts
 from clothes.models import *
 
 class UserCartViewTest(APITestCase):
@@ -204,4 +211,134 @@ class UserCartViewTest(APITestCase):
         }
         response = self.client.post(url, payload, format='json')
 
-        self.assertEqual(response.status_code, 401)
\ No newline at end of file
+        self.assertEqual(response.status_code, 401)
+
+class CartTotalsTest(APITestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='buyer', email='buyer@example.com',
+                                                    password='buyer123', role='user')
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.get(user=self.user)
+        self.products = [Clothes.objects.create(name=f'Áo {i}', price=1000 * (i + 1), quantity_in_stock=50)
+                         for i in range(12)]
+
+    def add(self, product, quantity=1):
+        return self.client.post(reverse('add_to_cart'), {'clothes_id': product.id, 'quantity': quantity},
+                                format='json')
+
+    def totals(self):
+        return Cart.objects.values_list('quantity', 'total_value').get(pk=self.cart.pk)
+
+    def test_totals_follow_add_change_and_remove(self):
+        first, second = self.products[:2]
+        self.add(first, 2)
+        self.add(second)
+        self.add(first)
+        self.assertEqual(self.totals(), (2, 3 * 1000 + 2000))
+
+        self.client.post(reverse('change_product_quantity'), {'clothes_id': second.id, 'quantity': 4},
+                         format='json')
+        self.assertEqual(self.totals(), (2, 3000 + 4 * 2000))
+
+        self.client.post(reverse('remove_from_cart'), {'clothes_id': first.id}, format='json')
+        self.assertEqual(self.totals(), (1, 8000))
+        self.assertEqual(reconcile_carts(), [])
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.add(self.products[0])
+        with CaptureQueriesContext(connection) as small:
+            self.add(self.products[0])
+        for product in self.products[1:]:
+            self.add(product)
+        with CaptureQueriesContext(connection) as large:
+            self.add(self.products[0])
+        self.assertEqual(len(small), len(large))
+
+        with CaptureQueriesContext(connection) as removal:
+            self.client.post(reverse('remove_from_cart'), {'clothes_id': self.products[0].id}, format='json')
+        self.assertLessEqual(len(removal), len(large) + 2)
+
+    def test_cart_view_query_count_does_not_grow_with_items(self):
+        self.add(self.products[0])
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(CATALOG_FAST_SERIALIZATION=fast):
+                with self.assertNumQueries(2):
+                    self.client.get(reverse('user_cart'))
+        for product in self.products[1:]:
+            self.add(product)
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(CATALOG_FAST_SERIALIZATION=fast):
+                with self.assertNumQueries(2):
+                    response = self.client.get(reverse('user_cart'), {'expand': 'category'})
+                self.assertEqual(len(response.data['carts'][0]['products']), 12)
+
+    def test_reconcile_fixes_drift(self):
+        self.add(self.products[0], 3)
+        Cart.objects.filter(pk=self.cart.pk).update(quantity=7, total_value=1)
+        self.assertEqual(reconcile_carts(fix=False), [(self.cart.pk, (7, 1), (1, 3000))])
+        self.assertEqual(self.totals(), (7, 1))
+        call_command('reconcile_carts', stdout=StringIO())
+        self.assertEqual(self.totals(), (1, 3000))
+
+
+class CartBatchTest(APITestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='batch', email='batch@example.com',
+                                                    password='batch123', role='user')
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.get(user=self.user)
+        self.products = [Clothes.objects.create(name=f'Quần {i}', price=1000 * (i + 1), quantity_in_stock=5)
+                         for i in range(10)]
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        self.cart.products.add(self.products[0])
+
+    def batch(self, operations, **extra):
+        return self.client.post(reverse('batch_cart'), {'operations': operations, **extra}, format='json')
+
+    def test_applies_operations_in_order_and_reports_errors(self):
+        first, second, third = self.products[:3]
+        response = self.batch([
+            {'op': 'add', 'clothes_id': second.id, 'quantity': 2},
+            {'op': 'set', 'clothes_id': second.id, 'quantity': 4},
+            {'op': 'add', 'clothes_id': first.id, 'quantity': 10},
+            {'op': 'remove', 'clothes_id': first.id},
+            {'op': 'remove', 'clothes_id': third.id},
+            {'op': 'set', 'clothes_id': 999999, 'quantity': 1},
+            {'op': 'drop', 'clothes_id': first.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['applied'], 3)
+        self.assertEqual([result['result'] for result in response.data['results']],
+                         ['ok', 'ok', 'error', 'ok', 'error', 'error', 'error'])
+        self.assertEqual(response.data['results'][2]['error'], 'Sản phẩm trong kho không đủ')
+
+        cart = response.data['cart']
+        self.assertEqual((cart['quantity'], cart['total_value']), (1, 4 * 2000))
+        self.assertEqual([(item['product']['id'], item['quantity']) for item in cart['products']],
+                         [(second.id, 4)])
+        self.assertEqual(list(self.cart.products.values_list('id', flat=True)), [second.id])
+        self.assertEqual(reconcile_carts(fix=False), [])
+
+    def test_atomic_mode_rejects_whole_batch(self):
+        response = self.batch([
+            {'op': 'add', 'clothes_id': self.products[1].id},
+            {'op': 'add', 'clothes_id': self.products[2].id, 'quantity': 99},
+        ], atomic=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['result'] for result in response.data['results']], ['ok', 'error'])
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 1)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def operations(products):
+            return [{'op': 'add', 'clothes_id': product.id} for product in products]
+
+        with CaptureQueriesContext(connection) as small:
+            self.batch(operations(self.products[1:2]))
+        with CaptureQueriesContext(connection) as large:
+            self.batch(operations(self.products[2:]))
+        self.assertEqual(len(small), len(large))
+
+    @override_settings(CART_BATCH_MAX_OPERATIONS=1)
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'op': 'remove', 'clothes_id': 1}] * 2).status_code, 400)
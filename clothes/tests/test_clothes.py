@@ -1,3 +1,11 @@
+import base64
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase, APIClient
 from django.urls import reverse
 from clothes.models import *
@@ -171,4 +179,190 @@ class ClothesPermissionUserTest(APITestCase):
         url = reverse('get_clothes')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertGreaterEqual(len(response.data), 1)
\ No newline at end of file
+        self.assertGreaterEqual(len(response.data), 1)
+
+class ClothesPaginationTest(APITestCase):
+    def setUp(self):
+        self.url = reverse('get_clothes')
+        prices = [300000, 100000, 200000, 100000, 300000, 100000, 200000]
+        self.products = [
+            Clothes.objects.create(name=f"Áo {i}", price=price, image="http://img.com/1.jpg")
+            for i, price in enumerate(prices)
+        ]
+
+    def collect(self, params):
+        ids, cursor = [], None
+        while True:
+            query = dict(params)
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get(self.url, query)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            cursor = response.data['next']
+            if not cursor:
+                return ids
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), len(self.products))
+
+    def test_walk_pages_by_id(self):
+        ids = self.collect({'page_size': 3})
+        self.assertEqual(ids, sorted(p.id for p in self.products))
+
+    def test_walk_pages_by_price_is_stable(self):
+        ids = self.collect({'page_size': 2, 'ordering': 'price'})
+        expected = [p.id for p in sorted(self.products, key=lambda p: (p.price, p.id))]
+        self.assertEqual(ids, expected)
+
+    def test_walk_pages_by_price_descending(self):
+        ids = self.collect({'page_size': 2, 'ordering': '-price'})
+        expected = [p.id for p in sorted(self.products, key=lambda p: (-p.price, -p.id))]
+        self.assertEqual(ids, expected)
+
+    def test_page_size_is_capped(self):
+        with self.settings(CATALOG_MAX_PAGE_SIZE=4):
+            response = self.client.get(self.url, {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(response.data['page_size'], 4)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'không-hợp-lệ'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Cursor không hợp lệ.')
+
+    def test_cursor_with_wrong_types(self):
+        for payload in ({'o': 'id', 'v': 5}, {'o': ['x'], 'v': []}, {'o': 'id', 'v': None}, [1, 2]):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_paginate_false_keeps_full_list(self):
+        with self.settings(CATALOG_PAGINATE_BY_DEFAULT=True):
+            paginated = self.client.get(self.url)
+            full = self.client.get(self.url, {'paginate': 'false'})
+        self.assertIn('results', paginated.data)
+        self.assertEqual(len(full.data), len(self.products))
+
+
+class ClothesFacetTest(APITestCase):
+    def setUp(self):
+        self.url = reverse('get_clothes')
+        self.shirts = Category.objects.create(name="Áo")
+        self.pants = Category.objects.create(name="Quần")
+        self.tee = Clothes.objects.create(name="Áo thun", price=90000, image="http://img.com/1.jpg",
+                                          category=self.shirts, quantity_in_stock=5)
+        self.shirt = Clothes.objects.create(name="Áo sơ mi", price=250000, image="http://img.com/2.jpg",
+                                            category=self.shirts, quantity_in_stock=0)
+        self.jeans = Clothes.objects.create(name="Quần jeans", price=450000, image="http://img.com/3.jpg",
+                                            category=self.pants, quantity_in_stock=3)
+
+    def facet_counts(self, group, key, **params):
+        response = self.client.get(self.url, {'facets': 'true', **params})
+        self.assertEqual(response.status_code, 200)
+        return {item[key]: item['count'] for item in response.json()['facets'][group]}
+
+    def test_filters(self):
+        response = self.client.get(self.url, {'category': self.shirts.id, 'status': 'còn hàng'})
+        self.assertEqual([item['name'] for item in response.data], ["Áo thun"])
+        response = self.client.get(self.url, {'min_price': 100000, 'max_price': 500000})
+        self.assertEqual({item['name'] for item in response.data}, {"Áo sơ mi", "Quần jeans"})
+
+    def test_invalid_filter(self):
+        response = self.client.get(self.url, {'min_price': 'rẻ'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Bộ lọc không hợp lệ.')
+
+    def test_facet_counts(self):
+        self.assertEqual(self.facet_counts('category', 'name'), {"Áo": 2, "Quần": 1})
+        self.assertEqual(self.facet_counts('status', 'value'), {'còn hàng': 2, 'hết hàng': 1})
+        self.assertEqual(self.facet_counts('price', 'min'), {0: 1, 200000: 2})
+
+    def test_facets_apply_other_dimensions(self):
+        self.assertEqual(self.facet_counts('status', 'value', category=self.shirts.id),
+                         {'còn hàng': 1, 'hết hàng': 1})
+        self.assertEqual(self.facet_counts('category', 'name', status='hết hàng'), {"Áo": 1})
+
+    def test_facet_counts_follow_writes(self):
+        self.shirt.quantity_in_stock = 7
+        self.shirt.category = self.pants
+        self.shirt.save()
+        self.jeans.delete()
+        self.assertEqual(self.facet_counts('category', 'name'), {"Áo": 1, "Quần": 1})
+        self.assertEqual(self.facet_counts('status', 'value'), {'còn hàng': 2})
+
+    def test_facets_are_read_from_maintained_table(self):
+        self.assertEqual(CatalogFacetCount.objects.filter(count__gt=0).count(), 3)
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'facets': 'true', 'category': self.pants.id})
+
+    def test_rebuild_matches_incremental_counts(self):
+        before = set(CatalogFacetCount.objects.filter(count__gt=0)
+                     .values_list('category_id', 'status', 'price_bucket', 'count'))
+        call_command('rebuild_facet_counts', stdout=StringIO())
+        after = set(CatalogFacetCount.objects.values_list('category_id', 'status', 'price_bucket', 'count'))
+        self.assertEqual(before, after)
+
+
+class ClothesFieldsetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Áo")
+        self.product = Clothes.objects.create(
+            name="Áo khoác", price=200000, image="http://img.com/1.jpg",
+            description="Áo khoác mùa đông " * 50, category=self.category
+        )
+
+    def test_fields_narrow_response_and_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get_clothes'), {'fields': 'id,name,price,image'})
+        self.assertEqual(list(response.data[0]), ['id', 'name', 'price', 'image'])
+        select = [q['sql'] for q in queries if 'clothes_clothes' in q['sql']][0]
+        self.assertNotIn('description', select)
+
+    def test_unknown_fields_are_rejected(self):
+        url = reverse('clothes_detail', kwargs={'pk': self.product.id})
+        response = self.client.get(url, {'fields': 'name,khong_ton_tai'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Trường không hợp lệ: khong_ton_tai'})
+
+        response = self.client.get(reverse('get_clothes'), {'fields': 'sai,khong_ton_tai'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Trường không hợp lệ: khong_ton_tai, sai'})
+
+    def test_expand_category(self):
+        url = reverse('clothes_detail', kwargs={'pk': self.product.id})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'id,category', 'expand': 'category'})
+        self.assertEqual(response.data['category'], {'id': self.category.id, 'name': "Áo"})
+
+    def test_default_response_is_unchanged(self):
+        response = self.client.get(reverse('clothes_detail', kwargs={'pk': self.product.id}))
+        self.assertEqual(response.data['category'], self.category.id)
+        self.assertIn('description', response.data)
+
+    def test_search_fields(self):
+        response = self.client.get(reverse('search_clothes'), {'q': 'khoác', 'fields': 'id,name'})
+        self.assertEqual(response.data, [{'id': self.product.id, 'name': "Áo khoác"}])
+
+    def test_fields_on_cart_and_orders(self):
+        user = UserAccount.objects.create_user(username='user', email='user@gmail.com',
+                                               password='user123', role='user')
+        cart = Cart.objects.get(user=user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        payment = PaymentMethod.objects.create(methodname='COD')
+        order = Order.objects.create(user=user, payment_method=payment, tongtien=400000)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        self.client.force_authenticate(user)
+        params = {'fields': 'id,name,category', 'expand': 'category'}
+
+        cart_data = self.client.get(reverse('user_cart'), params).data['carts'][0]
+        self.assertEqual(cart_data['products'][0]['product'],
+                         {'id': self.product.id, 'name': "Áo khoác",
+                          'category': {'id': self.category.id, 'name': "Áo"}})
+        self.assertEqual(cart_data['products'][0]['quantity'], 2)
+
+        order_data = self.client.get(reverse('user_orders'), params).data['orders'][0]
+        self.assertEqual(list(order_data['products'][0]['product']), ['id', 'name', 'category'])
@@ -0,0 +1,99 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from clothes.models import *
+
+
+class DirtyFieldsSaveTest(TestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='user', email='user@gmail.com',
+                                                    password='user123', role='user')
+        self.category = Category.objects.create(name="Áo")
+        self.product = Clothes.objects.create(name="Áo thun", price=100000, image="http://img.com/1.jpg",
+                                              category=self.category, quantity_in_stock=5)
+
+    def test_unchanged_save_runs_no_query(self):
+        product = Clothes.objects.get(pk=self.product.pk)
+        with self.assertNumQueries(0):
+            product.save()
+
+    def test_stock_change_writes_only_changed_columns(self):
+        product = Clothes.objects.get(pk=self.product.pk)
+        product.quantity_in_stock = 0
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "clothes_clothes"')]
+        self.assertEqual(len(updates), 1)
+        columns = updates[0].split(' SET ')[1].split(' WHERE ')[0]
+        self.assertEqual(sorted(part.split(' = ')[0] for part in columns.split(', ')),
+                         ['"quantity_in_stock"', '"status"', '"updated_at"'])
+        product.refresh_from_db()
+        self.assertEqual(product.status, 'hết hàng')
+
+    def test_name_change_skips_status_and_rating_columns(self):
+        product = Clothes.objects.get(pk=self.product.pk)
+        Clothes.objects.filter(pk=product.pk).update(rating=4.5, rating_sum=9, rating_count=2)
+        product.name = "Áo thun mới"
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        sql = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE "clothes_clothes"'))
+        self.assertNotIn('"status"', sql)
+        self.assertNotIn('"rating', sql)
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.rating, product.rating_count), ("Áo thun mới", 4.5, 2))
+
+    def test_cart_save_does_not_recompute_totals(self):
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        cart = Cart.objects.get(pk=cart.pk)
+        with self.assertNumQueries(0):
+            cart.save()
+        self.assertEqual((cart.quantity, cart.total_value), (1, 200000))
+
+    def test_cart_item_unchanged_save_runs_no_query(self):
+        cart = Cart.objects.get(user=self.user)
+        item = CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        item = CartItem.objects.select_related('product').get(pk=item.pk)
+        with self.assertNumQueries(0):
+            item.save()
+        item.quantity = 3
+        item.save()
+        self.assertEqual(CartItem.objects.get(pk=item.pk).price, 300000)
+
+    def test_cart_item_save_picks_up_product_price_change(self):
+        cart = Cart.objects.get(user=self.user)
+        item = CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        Clothes.objects.filter(pk=self.product.pk).update(price=150000)
+        item = CartItem.objects.get(pk=item.pk)
+        item.save()
+        self.assertEqual(CartItem.objects.get(pk=item.pk).price, 300000)
+        cart = Cart.objects.get(pk=cart.pk)
+        self.assertEqual((cart.quantity, cart.total_value), (1, 300000))
+
+    def test_user_save_without_role_change_skips_cart(self):
+        user = UserAccount.objects.get(pk=self.user.pk)
+        user.email = 'new@gmail.com'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"email"', queries[0]['sql'])
+
+        user.role = 'admin'
+        user.save()
+        self.assertTrue(UserAccount.objects.get(pk=user.pk).is_staff)
+
+    def test_user_save_keeps_is_staff_in_sync_with_role(self):
+        UserAccount.objects.filter(pk=self.user.pk).update(is_staff=True)
+        user = UserAccount.objects.get(pk=self.user.pk)
+        user.email = 'new@gmail.com'
+        user.save()
+        self.assertFalse(UserAccount.objects.get(pk=user.pk).is_staff)
+
+        user.is_staff = True
+        user.save(update_fields=['email'])
+        self.assertFalse(UserAccount.objects.get(pk=user.pk).is_staff)
+
+        UserAccount.objects.filter(pk=user.pk).update(is_staff=True)
+        user = UserAccount.objects.get(pk=user.pk)
+        user.save(update_fields=['email'])
+        self.assertFalse(UserAccount.objects.get(pk=user.pk).is_staff)
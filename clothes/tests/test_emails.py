@@ -0,0 +1,155 @@
+import socketserver
+import threading
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.template.loader import get_template
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from clothes import emails
+from clothes.emails import queue_email
+from clothes.models import *
+from clothes.outbox import drain
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """Máy chủ SMTP tối giản (EHLO/MAIL/RCPT/DATA/QUIT) cho test, thay cho aiosmtpd."""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost SMTP stand-in')
+        recipients = []
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip().strip('<>')
+                if address in server.rejected:
+                    self.reply('550 Mailbox unavailable')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for line in self.rfile:
+                    if line.rstrip(b'\r\n') == b'.':
+                        break
+                    lines.append(line)
+                server.messages.append((recipients, b''.join(lines)))
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rejected=()):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.connections = 0
+        self.messages = []
+        self.rejected = set(rejected)
+
+
+class PasswordResetEmailTest(APITestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='khach', email='khach@example.com',
+                                                    password='khach123', role='user')
+        self.url = reverse('password-reset')
+
+    def test_reset_request_is_queued_then_sent_by_worker(self):
+        response = self.client.post(self.url, {'email': 'khach@example.com', 'username': 'khach'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEvent.objects.filter(topic='email.send').count(), 1)
+
+        stats = drain(batch_size=10)
+        self.assertEqual(stats['done'], 1)
+        message, = mail.outbox
+        self.assertEqual((message.to, message.subject), (['khach@example.com'], 'Yêu cầu đặt lại mật khẩu'))
+        html, mimetype = message.alternatives[0]
+        self.assertEqual(mimetype, 'text/html')
+        self.assertIn('/clothes/password-confirm/', html)
+        self.assertIn('khach', html)
+
+    @override_settings(EMAIL_USE_QUEUE=False)
+    def test_synchronous_mode_sends_inline(self):
+        self.client.post(self.url, {'email': 'khach@example.com', 'username': 'khach'}, format='json')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class QueuedEmailWorkerTest(APITestCase):
+    def queue(self, *addresses):
+        for address in addresses:
+            queue_email([address], 'Thông báo', 'Nội dung', html_template='email_template.html',
+                        context={'username': address, 'reset_link': 'http://example.com/'})
+
+    @override_settings(EMAIL_BACKEND='clothes.tests.test_emails.CountingBackend')
+    def test_batch_uses_one_connection_and_cached_template(self):
+        CountingBackend.opened = 0
+        emails._templates.clear()
+        self.queue('a@example.com', 'b@example.com', 'c@example.com')
+        with mock.patch('clothes.emails.get_template', wraps=get_template) as loader:
+            drain(batch_size=10)
+            self.queue('d@example.com')
+            drain(batch_size=10)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(CountingBackend.opened, 2)
+        self.assertEqual(loader.call_count, 1)
+
+    def smtp_settings(self, server):
+        return override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                 EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+                                 EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_USE_TLS=False,
+                                 EMAIL_TIMEOUT=5)
+
+    def test_smtp_batch_over_single_connection_retries_rejected(self):
+        server = SMTPStandIn(rejected={'bad@example.com'})
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.queue('a@example.com', 'bad@example.com', 'c@example.com')
+        with self.smtp_settings(server):
+            stats = drain(batch_size=10)
+        self.assertEqual((stats['done'], stats['retried']), (2, 1))
+        self.assertEqual(server.connections, 1)
+        self.assertEqual([recipients for recipients, _ in server.messages], [['a@example.com'], ['c@example.com']])
+        self.assertIn(b'text/html', server.messages[0][1])
+        failed = OutboxEvent.objects.get(payload__to=['bad@example.com'])
+        self.assertEqual(failed.status, OutboxEvent.PENDING)
+        self.assertIn('SMTPRecipientsRefused', failed.last_error)
+
+    def test_unreachable_smtp_server_retries_all(self):
+        server = SMTPStandIn()
+        server.server_close()
+        self.queue('a@example.com', 'b@example.com')
+        with self.smtp_settings(server):
+            stats = drain(batch_size=10)
+        self.assertEqual((stats['done'], stats['retried']), (0, 2))
@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from clothes.fast_serializers import FastSerializer
+from clothes.models import *
+from clothes.serializers import *
+
+
+class FastSerializerParityTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Áo")
+        self.tee = Clothes.objects.create(name="Áo thun", price=100000, image="http://img.com/1.jpg",
+                                          description="Cotton", category=self.category, rating=4.5)
+        self.jeans = Clothes.objects.create(name="Quần jeans", price=300000, image="http://img.com/2.jpg",
+                                            quantity_in_stock=0)
+        self.user = UserAccount.objects.create_user(username='user', email='user@gmail.com',
+                                                    password='user123', role='user')
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.tee, quantity=2)
+        CartItem.objects.create(cart=cart, product=self.jeans, quantity=1)
+        payment = PaymentMethod.objects.create(methodname='COD')
+        for total in (100000, 300000):
+            order = Order.objects.create(user=self.user, payment_method=payment, tongtien=total,
+                                         hovaten='Nguyen Van A', sdt='0123456789')
+            OrderItem.objects.create(order=order, product=self.tee, quantity=1, total_value=100000)
+        OrderItem.objects.create(order=order, product=self.jeans, quantity=1, total_value=300000)
+        Order.objects.create(user=self.user, payment_method=payment, tongtien=0)
+
+    def assertSameBytes(self, serializer_class, queryset, context, prefetch=None):
+        fast = FastSerializer(serializer_class, context).serialize(queryset)
+        if prefetch:
+            queryset = queryset.prefetch_related(prefetch)
+        slow = serializer_class(queryset, many=True, context=context).data
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(slow))
+
+    def test_clothes(self):
+        for context in ({'fields': None, 'expand': set()},
+                        {'fields': None, 'expand': {'category'}},
+                        {'fields': {'id', 'name', 'rating', 'category'}, 'expand': {'category'}},
+                        {'fields': {'name', 'status'}, 'expand': set()}):
+            self.assertSameBytes(ClothesSerializer, Clothes.objects.order_by('id'), context)
+
+    def test_cart(self):
+        for context in ({'fields': None, 'expand': set()},
+                        {'fields': {'id', 'price', 'category'}, 'expand': {'category'}}):
+            self.assertSameBytes(CartSerializer, Cart.objects.order_by('id'), context,
+                                 Prefetch('cartitem_set', CartItem.objects.order_by('id')))
+
+    def test_order(self):
+        for context in ({'fields': None, 'expand': set()},
+                        {'fields': {'name'}, 'expand': {'category'}}):
+            self.assertSameBytes(OrderSerializer, Order.objects.order_by('-created_at', 'id'),
+                                 context,
+                                 Prefetch('orderitem_set', OrderItem.objects.order_by('id')))
+
+    def test_endpoints(self):
+        self.client.force_authenticate(self.user)
+        requests = [
+            (reverse('get_clothes'), {}),
+            (reverse('get_clothes'), {'ordering': '-price', 'page_size': 1}),
+            (reverse('get_clothes'), {'fields': 'name', 'expand': 'category', 'facets': 'true'}),
+            (reverse('user_cart'), {}),
+            (reverse('user_orders'), {'expand': 'category'}),
+        ]
+        for url, params in requests:
+            cache.clear()
+            slow = self.client.get(url, params)
+            cache.clear()
+            with override_settings(CATALOG_FAST_SERIALIZATION=True):
+                fast = self.client.get(url, params)
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, slow.content)
+
+    @override_settings(CATALOG_FAST_SERIALIZATION=True)
+    def test_cursor_pages(self):
+        first = self.client.get(reverse('get_clothes'), {'ordering': 'price', 'page_size': 1}).json()
+        second = self.client.get(reverse('get_clothes'), {'cursor': first['next']}).json()
+        self.assertEqual([item['name'] for item in first['results'] + second['results']],
+                         ["Áo thun", "Quần jeans"])
+
+    def test_children_in_one_query(self):
+        context = {'fields': None, 'expand': {'category'}}
+        with self.assertNumQueries(2):
+            FastSerializer(OrderSerializer, context).serialize(Order.objects.all())
+
@@ -0,0 +1,126 @@
+from datetime import timedelta
+from io import StringIO
+import threading
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from django.urls import reverse
+from clothes.models import *
+
+
+class CreateOrderIdempotencyTest(APITestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='mobile', email='mobile@example.com',
+                                                    password='mobile123', role='user')
+        self.client.force_authenticate(self.user)
+        self.payment = PaymentMethod.objects.create(methodname='COD')
+        self.product = Clothes.objects.create(name='Áo', price=1000, quantity_in_stock=5)
+        self.url = reverse('create_order')
+
+    def order(self, key=None, quantity=1):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key is not None else {}
+        return self.client.post(self.url, {
+            'source': 'detail',
+            'payment_method': self.payment.id,
+            'products': [{'id': self.product.id, 'quantity': quantity}],
+        }, format='json', **headers)
+
+    def stock(self):
+        return Clothes.objects.values_list('quantity_in_stock', flat=True).get(pk=self.product.pk)
+
+    def test_retry_replays_stored_response_without_checkout(self):
+        first = self.order('retry-1')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.order('retry-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse(any('"clothes_clothes"' in query['sql'] for query in queries))
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(), 4)
+
+        self.assertEqual(self.order('retry-2').status_code, 201)
+        self.assertEqual(self.order().status_code, 201)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self.order('reuse')
+        response = self.order('reuse', quantity=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.stock(), 4)
+
+    def test_keys_are_scoped_per_user(self):
+        self.order('shared')
+        other = UserAccount.objects.create_user(username='other', email='other@example.com',
+                                                password='other123', role='user')
+        self.client.force_authenticate(other)
+        self.assertNotIn('Idempotent-Replayed', self.order('shared'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_client_errors_are_replayed_and_server_errors_are_not_stored(self):
+        self.assertEqual(self.order('too-many', quantity=50).status_code, 400)
+        self.assertEqual(self.order('too-many', quantity=50)['Idempotent-Replayed'], 'true')
+
+        Cart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.order('broken').status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.filter(key='broken').exists())
+
+    def test_invalid_key(self):
+        self.assertEqual(self.order('x' * 256).status_code, 400)
+        self.assertEqual(self.order('').status_code, 400)
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_expired_keys_run_again_and_are_purged_in_batches(self):
+        self.order('old')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertNotIn('Idempotent-Replayed', self.order('old'))
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.bulk_create([
+            IdempotencyKey(user=self.user, scope='create_order', key=f'k{i}', request_hash='x',
+                           status_code=201, created_at=timezone.now() - timedelta(hours=1))
+            for i in range(5)
+        ])
+        out = StringIO()
+        call_command('purge_idempotency_keys', batch_size=2, stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['old'])
+
+
+class ConcurrentIdempotencyTest(TransactionTestCase):
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_duplicates_wait_for_first_request(self):
+        user = UserAccount.objects.create_user(username='mobile', email='mobile@example.com',
+                                               password='mobile123', role='user')
+        payment = PaymentMethod.objects.create(methodname='COD')
+        product = Clothes.objects.create(name='Áo', price=1000, quantity_in_stock=50)
+        barrier = threading.Barrier(6)
+        responses = []
+
+        def retry():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                responses.append(client.post(reverse('create_order'), {
+                    'source': 'detail', 'payment_method': payment.id,
+                    'products': [{'id': product.id, 'quantity': 1}],
+                }, format='json', HTTP_IDEMPOTENCY_KEY='same'))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=retry) for _ in range(6)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual([response.status_code for response in responses], [201] * 6)
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 5)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Clothes.objects.get(pk=product.pk).quantity_in_stock, 49)
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from clothes.facets import rebuild_facet_counts
+from clothes.models import *
+from clothes.search import get_search_backend
+
+
+CSV_HEADER = 'id,name,price,image,description,quantity_in_stock,category\n'
+
+
+class ProductImportTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name="Áo")
+        self.existing = Clothes.objects.create(name="Áo cũ", price=100000, image="http://img.com/0.jpg",
+                                               category=self.shirts)
+        Clothes.objects.filter(pk=self.existing.pk).update(rating=4.0)
+        self.admin = UserAccount.objects.create_user(username='admin', email='admin@gmail.com',
+                                                     password='admin123', role='admin')
+
+    def write_file(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_file(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_products', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def facet_table(self):
+        return set(CatalogFacetCount.objects.filter(count__gt=0)
+                   .values_list('category_id', 'status', 'price_bucket', 'count'))
+
+    def test_csv_upsert(self):
+        path = self.write_file('.csv', CSV_HEADER + (
+            f'{self.existing.id},Áo mới,150000,http://img.com/0.jpg,Cotton,0,áo\n'
+            ',Quần jeans,300000,http://img.com/1.jpg,,5,\n'
+            ',"Áo khoác, dày",500000,http://img.com/2.jpg,,,Áo\n'
+        ))
+        out, err = self.import_file(path)
+        self.assertIn('2 tạo mới, 1 cập nhật, 0 lỗi', out)
+        self.assertIn('dòng/s', out)
+
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.price, self.existing.status),
+                         ("Áo mới", 150000, 'hết hàng'))
+        self.assertEqual(self.existing.rating, 4.0)
+        jacket = Clothes.objects.get(name="Áo khoác, dày")
+        self.assertEqual((jacket.category, jacket.quantity_in_stock, jacket.status),
+                         (self.shirts, 10, 'còn hàng'))
+        self.assertIsNone(Clothes.objects.get(name="Quần jeans").category)
+
+    def test_row_errors_are_reported(self):
+        path = self.write_file('.csv', CSV_HEADER + (
+            ',,100000,http://img.com/1.jpg,,1,\n'
+            ',Áo,-5,không-phải-url,,x,\n'
+            ',Quần,200000,http://img.com/2.jpg,,1,Không có\n'
+            ',Váy,200000,http://img.com/3.jpg,,1,\n'
+        ))
+        out, err = self.import_file(path)
+        self.assertIn('1 tạo mới, 0 cập nhật, 3 lỗi', out)
+        self.assertIn('Dòng 2: name:', err)
+        self.assertIn('Dòng 3: price:', err)
+        self.assertIn('quantity_in_stock', err)
+        self.assertIn('Dòng 4: category: Danh mục "Không có" không tồn tại.', err)
+
+        self.import_file(path, '--create-categories')
+        self.assertTrue(Category.objects.filter(name="Không có").exists())
+
+    def test_side_tables_follow_import(self):
+        path = self.write_file('.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'id': self.existing.id, 'name': "Áo len", 'price': 600000, 'image': 'http://img.com/0.jpg',
+             'quantity_in_stock': 3, 'category': "Áo"},
+            {'name': "Quần kaki", 'price': 250000, 'image': 'http://img.com/1.jpg', 'quantity_in_stock': 0},
+        ]))
+        detail_url = reverse('clothes_detail', kwargs={'pk': self.existing.id})
+        self.client.get(detail_url)
+        self.import_file(path, '--batch-size', '1')
+
+        counts = self.facet_table()
+        rebuild_facet_counts()
+        self.assertEqual(counts, self.facet_table())
+        self.assertEqual(self.client.get(detail_url).json()['name'], "Áo len")
+
+    @override_settings(CLOTHES_SEARCH_BACKEND='clothes.search.backends.InvertedIndexSearchBackend',
+                       CLOTHES_SEARCH_INDEX_PATH=None)
+    def test_search_index_follows_import(self):
+        backend = get_search_backend()
+        backend.rebuild()
+        path = self.write_file('.csv', CSV_HEADER + f'{self.existing.id},Hoodie,1,http://img.com/0.jpg,,1,\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_file(path)
+        self.assertEqual(backend.search('hoodie')[0], [self.existing.id])
+        self.assertEqual(backend.search('cũ')[0], [])
+
+    def test_explicit_new_ids_advance_sequence(self):
+        path = self.write_file('.csv', CSV_HEADER + '500,Áo,1,http://img.com/1.jpg,,1,\n')
+        self.import_file(path)
+        product = Clothes.objects.create(name="Sau khi nhập", price=1, image="http://img.com/2.jpg")
+        self.assertGreater(product.id, 500)
+
+    def test_rows_without_id_never_overwrite_explicit_ids(self):
+        next_id = self.existing.id + 1
+        path = self.write_file('.csv', CSV_HEADER + f'{next_id},Áo nhập,1,http://img.com/1.jpg,,1,\n'
+                                             ',Áo mới,2,http://img.com/2.jpg,,1,\n')
+        out, _ = self.import_file(path)
+        self.assertIn('2 tạo mới, 0 cập nhật', out)
+        self.assertEqual(Clothes.objects.get(pk=next_id).name, "Áo nhập")
+        self.assertTrue(Clothes.objects.filter(name="Áo mới").exclude(pk=next_id).exists())
+
+    def test_api(self):
+        url = reverse('import_clothes')
+        lines = '{"name": "Áo polo", "price": 200000, "image": "http://img.com/1.jpg"}\n{hỏng\n'
+        upload = SimpleUploadedFile('products.jsonl', lines.encode())
+
+        self.assertEqual(self.client.post(url, {'file': upload}).status_code, 401)
+        self.client.force_authenticate(self.admin)
+        upload.seek(0)
+        response = self.client.post(url, {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['error_count']),
+                         (2, 1, 1))
+        self.assertEqual(response.data['errors'], [{'line': 2, 'errors': {'row': 'Dòng không đọc được.'}}])
+
+        upload = SimpleUploadedFile('products.xml', b'<xml/>')
+        self.assertEqual(self.client.post(url, {'file': upload}).status_code, 400)
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from clothes import cache as catalog_cache
+from clothes.facets import rebuild_facet_counts
+from clothes.models import *
+
+
+class BulkInventoryUpdateTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('bulk_update_inventory')
+        self.admin = UserAccount.objects.create_user(username='admin', email='admin@gmail.com',
+                                                     password='admin123', role='admin')
+        self.client.force_authenticate(self.admin)
+        category = Category.objects.create(name="Áo")
+        self.products = [
+            Clothes.objects.create(name=f"Áo {i}", price=100000 * (i + 1), image=f"http://img.com/{i}.jpg",
+                                   category=category)
+            for i in range(3)
+        ]
+
+    def post(self, items):
+        return self.client.post(self.url, {'items': items}, format='json')
+
+    def test_updates_and_per_id_results(self):
+        first, second, third = self.products
+        response = self.post([
+            {'id': first.id, 'price': 90000},
+            {'id': second.id, 'quantity_in_stock': 0},
+            {'id': 999999, 'price': 1},
+            {'id': third.id, 'price': -1},
+            {'id': third.id},
+            {'price': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual([(item['id'], item['result']) for item in response.data['results']], [
+            (first.id, 'updated'), (second.id, 'updated'), (999999, 'not_found'),
+            (third.id, 'invalid'), (third.id, 'invalid'), (None, 'invalid'),
+        ])
+        self.assertIn('price', response.data['results'][3]['errors'])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.price, first.status), (90000, 'còn hàng'))
+        self.assertEqual((second.quantity_in_stock, second.status), (0, 'hết hàng'))
+
+        self.post([{'id': second.id, 'quantity_in_stock': 4}])
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'còn hàng')
+
+    def test_query_count_does_not_grow_with_batch(self):
+        items = [{'id': product.id, 'quantity_in_stock': 5} for product in self.products]
+        with CaptureQueriesContext(connection) as small:
+            self.post(items[:1])
+        with CaptureQueriesContext(connection) as large:
+            self.post(items)
+        self.assertEqual(len(small), len(large))
+
+    def test_facets_and_cache_follow_batch(self):
+        detail_url = reverse('clothes_detail', kwargs={'pk': self.products[0].id})
+        self.client.get(detail_url)
+        with mock.patch.object(catalog_cache, 'bump_version', wraps=catalog_cache.bump_version) as bump:
+            self.post([{'id': product.id, 'price': 600000, 'quantity_in_stock': 0}
+                       for product in self.products])
+        self.assertEqual(bump.call_count, 1)
+        detail = self.client.get(detail_url)
+        self.assertEqual(detail['X-Cache'], 'MISS')
+        self.assertEqual(detail.json()['price'], 600000)
+
+        counts = set(CatalogFacetCount.objects.filter(count__gt=0).values_list(
+            'category_id', 'status', 'price_bucket', 'count'))
+        rebuild_facet_counts()
+        self.assertEqual(counts, set(CatalogFacetCount.objects.filter(count__gt=0).values_list(
+            'category_id', 'status', 'price_bucket', 'count')))
+
+    @override_settings(CATALOG_BULK_UPDATE_MAX_ITEMS=2)
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.post([{'id': 1, 'price': 1}] * 3).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        user = UserAccount.objects.create_user(username='user', email='user@gmail.com',
+                                               password='user123', role='user')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.post([{'id': 1, 'price': 1}]).status_code, 403)
@@ -1,3 +1,12 @@
+from datetime import timedelta
+from io import StringIO
+import threading
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from django.urls import reverse
 from clothes.models import *
@@ -53,6 +62,98 @@ class UserOrdersViewTest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 401)
 
+    def add_orders(self, orders, items_per_order):
+        category = Category.objects.get_or_create(name='Áo')[0]
+        for i in range(orders):
+            order = Order.objects.create(user=self.user, payment_method=self.payment_method)
+            for j in range(items_per_order):
+                product = Clothes.objects.create(name=f'Áo {i}-{j}', price=1000, category=category)
+                OrderItem.objects.create(order=order, product=product, quantity=1)
+
+    def test_query_count_does_not_grow_with_orders_and_items(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('user_orders')
+        self.add_orders(1, 1)
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(CATALOG_FAST_SERIALIZATION=fast):
+                with self.assertNumQueries(2):
+                    self.client.get(url)
+        self.add_orders(50, 5)
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(CATALOG_FAST_SERIALIZATION=fast):
+                with self.assertNumQueries(2):
+                    response = self.client.get(url)
+                self.assertEqual(sum(len(order['products']) for order in response.data['orders']), 251)
+        with self.assertNumQueries(2):
+            self.client.get(url, {'expand': 'category'})
+
+
+class OrderHistoryTest(APITestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='b2b', email='b2b@example.com',
+                                                    password='b2b12345', role='user')
+        self.client.force_authenticate(self.user)
+        payment = PaymentMethod.objects.create(methodname='COD')
+        product = Clothes.objects.create(name='Áo', price=1000)
+        start = timezone.make_aware(timezone.datetime(2026, 1, 1))
+        self.orders = []
+        for i in range(7):
+            order = Order.objects.create(user=self.user, payment_method=payment, tongtien=1000,
+                                         status='Hủy' if i % 3 == 0 else 'Hoàn thành')
+            OrderItem.objects.create(order=order, product=product, quantity=1)
+            # Hai đơn cùng thời điểm để kiểm tra thứ tự phụ theo id.
+            Order.objects.filter(pk=order.pk).update(created_at=start + timedelta(days=i // 2 * 2))
+            self.orders.append(order)
+        other = UserAccount.objects.create_user(username='other', email='other@example.com',
+                                                password='other123', role='user')
+        Order.objects.create(user=other, payment_method=payment)
+
+    def fetch_all(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = {**params, 'page_size': 3, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get(reverse('user_orders'), query)
+            self.assertEqual(response.status_code, 200)
+            ids += [order['id'] for order in response.data['results']]
+            cursor = response.data['next']
+            if cursor is None:
+                return ids, response
+
+    def test_pages_newest_first_with_id_tiebreak(self):
+        ids, _ = self.fetch_all()
+        self.assertEqual(ids, [order.id for order in reversed(self.orders)])
+        ids, _ = self.fetch_all(ordering='created_at')
+        self.assertEqual(ids, [order.id for order in self.orders])
+
+    def test_status_and_date_filters(self):
+        ids, _ = self.fetch_all(status='Hủy')
+        self.assertEqual(ids, [self.orders[6].id, self.orders[3].id, self.orders[0].id])
+        ids, _ = self.fetch_all(created_after='2026-01-03', created_before='2026-01-05')
+        self.assertEqual(ids, [self.orders[3].id, self.orders[2].id])
+        response = self.client.get(reverse('user_orders'), {'status': 'Không có'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('user_orders'), {'created_after': 'hôm qua'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_summary_mode_skips_items(self):
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(CATALOG_FAST_SERIALIZATION=fast):
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse('user_orders'), {'summary': 'true', 'page_size': 5})
+                self.assertEqual(len(response.data['results']), 5)
+                self.assertNotIn('products', response.data['results'][0])
+                with self.assertNumQueries(2):
+                    response = self.client.get(reverse('user_orders'), {'page_size': 5})
+                self.assertEqual(len(response.data['results'][0]['products']), 1)
+
+    def test_order_detail(self):
+        response = self.client.get(reverse('user_order_detail', kwargs={'pk': self.orders[0].id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['products'][0]['product']['name'], 'Áo')
+        other_order = Order.objects.exclude(user=self.user).get()
+        response = self.client.get(reverse('user_order_detail', kwargs={'pk': other_order.id}))
+        self.assertEqual(response.status_code, 404)
+
 
 class CreateOrderViewTest(APITestCase):
     def setUp(self):
@@ -162,6 +263,129 @@ class CreateOrderViewTest(APITestCase):
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, 400)
         self.assertIn('không đủ số lượng trong kho', response.data.get('error', '').lower())
+
+    def test_rejected_order_changes_nothing(self):
+        data = {
+            "source": "cart",
+            "payment_method": self.payment_method.id,
+            "products": [{"id": self.product1.id, "quantity": 1}, {"id": self.product2.id, "quantity": 50}],
+        }
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.product1.refresh_from_db()
+        self.assertEqual(self.product1.quantity_in_stock, 10)
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+        self.assertFalse(Order.objects.exists())
+
+    def order_from_cart(self, products):
+        for product in products:
+            CartItem.objects.get_or_create(cart=self.cart, product=product)
+        data = {
+            "source": "cart",
+            "payment_method": self.payment_method.id,
+            "products": [{"id": product.id, "quantity": 1} for product in reversed(products)],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['products']), len(products))
+        # Ngoài các UPDATE số gia tổng giỏ hàng (post_delete của từng CartItem), số truy vấn cố định.
+        return [query['sql'] for query in queries if not query['sql'].startswith('UPDATE "clothes_cart"')]
+
+    def test_query_count_does_not_grow_with_items(self):
+        # Dòng bộ đếm mã vận đơn có thể đã bị flush bởi TransactionTestCase chạy trước.
+        SequenceCounter.objects.get_or_create(name='order_tracking')
+        small = self.order_from_cart([self.product1, self.product2])
+        products = [Clothes.objects.create(name=f'Mũ {i}', price=1000, quantity_in_stock=5) for i in range(6)]
+        large = self.order_from_cart(products)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(sum(sql.startswith('DELETE FROM "clothes_cartitem"') for sql in large), 1)
+        self.assertEqual(OrderItem.objects.count(), 8)
+        self.assertEqual(Order.products.through.objects.count(), 8)
+        self.assertEqual(Cart.objects.values_list('quantity', 'total_value').get(pk=self.cart.pk), (0, 0))
+
+
+class CheckoutConcurrencyTest(TransactionTestCase):
+    """Nhiều luồng đặt cùng hai sản phẩm theo thứ tự ngược nhau: không deadlock, không bán quá tồn kho."""
+    threads = 8
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_orders_do_not_deadlock_or_oversell(self):
+        payment = PaymentMethod.objects.create(methodname='COD')
+        first = Clothes.objects.create(name='Áo', price=1000, quantity_in_stock=5)
+        second = Clothes.objects.create(name='Quần', price=1000, quantity_in_stock=5)
+        users = [UserAccount.objects.create_user(username=f'buyer{i}', email=f'buyer{i}@example.com',
+                                                 password='buyer123', role='user')
+                 for i in range(self.threads)]
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+
+        def checkout(index):
+            client = APIClient()
+            client.force_authenticate(users[index])
+            products = [{"id": first.id, "quantity": 1}, {"id": second.id, "quantity": 1}]
+            if index % 2:
+                products.reverse()
+            try:
+                barrier.wait()
+                response = client.post(reverse('create_order'), {
+                    "source": "cart",
+                    "payment_method": payment.id,
+                    "products": products,
+                }, format='json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        for user in users:
+            cart = Cart.objects.get(user=user)
+            CartItem.objects.create(cart=cart, product=first)
+            CartItem.objects.create(cart=cart, product=second)
+        workers = [threading.Thread(target=checkout, args=(i,)) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(statuses), [201] * 5 + [400] * (self.threads - 5))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.quantity_in_stock, second.quantity_in_stock), (0, 0))
+        self.assertEqual(OrderItem.objects.filter(product=first).count(), 5)
+
+
+@override_settings(CHECKOUT_STOCK_STRATEGY='optimistic')
+class OptimisticCreateOrderViewTest(CreateOrderViewTest):
+    """Chạy lại các test đặt hàng với UPDATE có điều kiện thay cho SELECT ... FOR UPDATE."""
+
+    def test_query_count_does_not_grow_with_items(self):
+        # Dòng bộ đếm mã vận đơn có thể đã bị flush bởi TransactionTestCase chạy trước.
+        SequenceCounter.objects.get_or_create(name='order_tracking')
+        small = self.order_from_cart([self.product1, self.product2])
+        products = [Clothes.objects.create(name=f'Mũ {i}', price=1000, quantity_in_stock=5) for i in range(6)]
+        large = self.order_from_cart(products)
+        # Mỗi sản phẩm đúng một UPDATE có điều kiện, không có SELECT ... FOR UPDATE.
+        stock_updates = [sql for sql in large if sql.startswith('UPDATE "clothes_clothes"')]
+        self.assertEqual(len(stock_updates), 6)
+        self.assertIn('"quantity_in_stock" >=', stock_updates[0])
+        self.assertEqual(len(large) - len(small), 6 - 2)
+
+    def test_last_unit_flips_status_in_same_statement(self):
+        product = Clothes.objects.create(name='Váy', price=1000, quantity_in_stock=2)
+        data = {"source": "detail", "payment_method": self.payment_method.id,
+                "products": [{"id": product.id, "quantity": 2}]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "clothes_clothes"') for query in queries), 1)
+        product.refresh_from_db()
+        self.assertEqual((product.quantity_in_stock, product.status), (0, 'hết hàng'))
+        self.assertEqual(self.client.post(self.url, data, format='json').status_code, 400)
+
+
+@override_settings(CHECKOUT_STOCK_STRATEGY='optimistic')
+class OptimisticCheckoutConcurrencyTest(CheckoutConcurrencyTest):
+    pass
         
         
 class CancelOrderViewTest(APITestCase):
@@ -343,4 +567,98 @@ class RateProductTest(APITestCase):
             'rating': 5
         })
         self.assertEqual(response.status_code, 401)
-        self.assertIn('credentials', response.data.get('detail', '').lower())
\ No newline at end of file
+        self.assertIn('credentials', response.data.get('detail', '').lower())
+
+    def rate(self, order, rating):
+        return self.client.post(reverse('rate_product', kwargs={'pk': order.pk}), data={
+            'product_id': self.product.id,
+            'rating': rating
+        })
+
+    def test_rating_aggregates(self):
+        second_order = Order.objects.create(user=self.user, tongtien=200000, status="Hoàn thành",
+                                            payment_method=self.payment)
+        second_item = OrderItem.objects.create(order=second_order, product=self.product, quantity=1)
+        self.rate(self.order, 4)
+        self.rate(second_order, 5)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count, self.product.rating),
+                         (9, 2, 4.5))
+
+        OrderItem.objects.get(pk=second_item.pk).delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count, self.product.rating),
+                         (4, 1, 4.0))
+        OrderItem.objects.get(pk=self.order_item.pk).delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_count, self.product.rating), (0, None))
+
+    def test_product_save_keeps_rating_and_skips_order_items(self):
+        stale = Clothes.objects.get(pk=self.product.pk)
+        self.rate(self.order, 3)
+        stale.quantity_in_stock = 9
+        with self.assertNumQueries(1):
+            stale.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity_in_stock, self.product.rating), (9, 3.0))
+
+    def test_recompute_ratings(self):
+        self.rate(self.order, 2)
+        Clothes.objects.filter(pk=self.product.pk).update(rating_sum=40, rating_count=7, rating=1.0)
+        out = StringIO()
+        call_command('recompute_ratings', stdout=out)
+        self.assertIn('1 sản phẩm', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count, self.product.rating),
+                         (2, 1, 2.0))
+
+    def test_rating_histogram_endpoints(self):
+        second_order = Order.objects.create(user=self.user, tongtien=200000, status="Hoàn thành",
+                                            payment_method=self.payment)
+        second_item = OrderItem.objects.create(order=second_order, product=self.product, quantity=1)
+        other = Clothes.objects.create(name="Quần jeans", price=300000, quantity_in_stock=40)
+        url = reverse('product_ratings', kwargs={'pk': self.product.pk})
+        self.assertEqual(self.client.get(url).json()['histogram'],
+                         {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
+
+        self.rate(self.order, 5)
+        self.rate(second_order, 3)
+        data = self.client.get(url).json()
+        self.assertEqual((data['rating'], data['count']), (4.0, 2))
+        self.assertEqual(data['histogram'], {'1': 0, '2': 0, '3': 1, '4': 0, '5': 1})
+
+        OrderItem.objects.get(pk=second_item.pk).delete()
+        self.assertEqual(self.client.get(url).json()['histogram']['3'], 0)
+
+        self.client.credentials()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('bulk_product_ratings'),
+                                       {'ids': f'{other.pk},{self.product.pk},999'})
+        self.assertEqual([item['product'] for item in response.json()['results']],
+                         [other.pk, self.product.pk])
+        self.assertEqual(response.json()['results'][1]['histogram']['5'], 1)
+        self.assertEqual(self.client.get(reverse('bulk_product_ratings'), {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('product_ratings', kwargs={'pk': 999})).status_code, 404)
+
+    def test_recompute_rebuilds_histogram(self):
+        self.rate(self.order, 4)
+        RatingHistogram.objects.filter(product=self.product).update(stars_4=0, stars_1=9)
+        call_command('recompute_ratings', stdout=StringIO())
+        histogram = RatingHistogram.objects.get(product=self.product)
+        self.assertEqual([histogram.stars_1, histogram.stars_4], [0, 1])
+
+    def test_delete_rated_product(self):
+        self.rate(self.order, 4)
+        admin = UserAccount.objects.create_user(username='admin', email='admin@gmail.com',
+                                                password='admin123', role='admin')
+        self.client.force_authenticate(admin)
+        response = self.client.delete(reverse('delete_clothes', kwargs={'pk': self.product.pk}))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Clothes.objects.filter(pk=self.product.pk).exists())
+        self.assertFalse(RatingHistogram.objects.filter(product_id=self.product.pk).exists())
+
+    def test_removing_rating_without_histogram_row_creates_none(self):
+        self.rate(self.order, 4)
+        RatingHistogram.objects.filter(product=self.product).delete()
+        OrderItem.objects.get(pk=self.order_item.pk).delete()
+        self.assertFalse(RatingHistogram.objects.filter(product=self.product).exists())
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from clothes.models import *
+
+
+class TrackOrderViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserAccount.objects.create_user(username='buyer', email='buyer@example.com',
+                                                    password='buyer123', role='user')
+        self.payment = PaymentMethod.objects.create(methodname='COD')
+        self.order = Order.objects.create(user=self.user, payment_method=self.payment, tongtien=150000,
+                                          sdt='0123456789', diachi='Hanoi')
+        self.url = reverse('track_order', args=[self.order.tracking_number])
+
+    def test_returns_only_status_and_timestamps_without_login(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'tracking_number', 'status', 'created_at', 'updated_at'})
+        self.assertEqual(response.data['status'], 'Chờ xác nhận')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_repeated_lookup_is_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_status_change_invalidates_cache(self):
+        self.client.get(self.url)
+        self.order.status = 'Đang giao'
+        self.order.save()
+        response = self.client.get(self.url)
+        self.assertEqual((response.data['status'], response['X-Cache']), ('Đang giao', 'MISS'))
+
+    def test_cancel_order_invalidates_cache(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(self.user)
+        self.client.put(reverse('cancel_order', args=[self.order.pk]))
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).data['status'], 'Hủy')
+
+    def test_unknown_and_malformed_numbers(self):
+        unknown = reverse('track_order', args=['0000000000'])
+        self.assertEqual(self.client.get(unknown).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(unknown).status_code, 404)
+            self.assertEqual(self.client.get(reverse('track_order', args=['abc'])).status_code, 404)
+            self.assertEqual(self.client.get(reverse('track_order', args=['1' * 11])).status_code, 404)
+
+    def test_rate_limited_per_ip(self):
+        for _ in range(60):
+            self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.1').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.1').status_code, 429)
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_admin_search_by_tracking_number(self):
+        other = Order.objects.create(user=self.user, payment_method=self.payment, tongtien=0)
+        admin = UserAccount.objects.create_superuser(username='root', email='root@example.com',
+                                                     password='root123')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:clothes_order_changelist'), {'q': self.order.tracking_number})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order.pk for order in response.context['cl'].result_list], [self.order.pk])
+        response = self.client.get(reverse('admin:clothes_order_changelist'), {'q': 'buyer'})
+        self.assertEqual({order.pk for order in response.context['cl'].result_list}, {self.order.pk, other.pk})
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from clothes.models import *
+from clothes.outbox import claim_events, drain, outbox_stats, process_events, purge_processed_events
+
+handled = []
+
+
+def record_handler(events):
+    handled.extend((event.topic, event.id) for event in events)
+
+
+def failing_handler(events):
+    raise ConnectionError('smtp down')
+
+
+def partial_handler(events):
+    return {event.id: 'bad payload' for event in events if event.payload.get('bad')}
+
+
+class OutboxPublishTest(APITestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='buyer', email='buyer@example.com',
+                                                    password='buyer123', role='user')
+        self.payment = PaymentMethod.objects.create(methodname='COD')
+
+    def create_order(self):
+        return Order.objects.create(user=self.user, payment_method=self.payment, tongtien=1000)
+
+    def test_order_creation_and_status_changes_write_events(self):
+        order = self.create_order()
+        order.sdt = '0123456789'
+        order.save()
+        order.status = 'Đang giao'
+        order.save()
+        events = list(OutboxEvent.objects.order_by('id').values_list('topic', 'payload'))
+        self.assertEqual([topic for topic, _ in events], ['order.created', 'order.status_changed'])
+        self.assertEqual(events[0][1]['tracking_number'], order.tracking_number)
+        self.assertEqual((events[1][1]['old_status'], events[1][1]['status']), ('Chờ xác nhận', 'Đang giao'))
+
+    def test_rolled_back_order_leaves_no_event(self):
+        with transaction.atomic():
+            self.create_order()
+            transaction.set_rollback(True)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_cancel_order_writes_status_event(self):
+        order = self.create_order()
+        self.client.force_authenticate(self.user)
+        self.client.put(reverse('cancel_order', args=[order.pk]))
+        event = OutboxEvent.objects.get(topic='order.status_changed')
+        self.assertEqual((event.payload['order_id'], event.payload['status']), (order.pk, 'Hủy'))
+
+
+@override_settings(OUTBOX_HANDLERS={'order.created': ['clothes.tests.test_outbox.record_handler'],
+                                    'test.partial': ['clothes.tests.test_outbox.partial_handler'],
+                                    'test.failing': ['clothes.tests.test_outbox.failing_handler']},
+                   OUTBOX_MAX_ATTEMPTS=2)
+class OutboxWorkerTest(APITestCase):
+    def setUp(self):
+        handled.clear()
+
+    def publish(self, topic, count=1, **payload):
+        return [OutboxEvent.objects.create(topic=topic, payload=payload) for _ in range(count)]
+
+    def test_claim_leases_events(self):
+        events = self.publish('order.created', 3)
+        claimed = claim_events(2)
+        self.assertEqual([event.id for event in claimed], [event.id for event in events[:2]])
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual([event.id for event in claim_events(10)], [events[2].id])
+        self.assertEqual(claim_events(10), [])
+
+    def test_drain_dispatches_by_topic_and_marks_done(self):
+        events = self.publish('order.created', 5) + self.publish('unhandled.topic')
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stats = drain(batch_size=2, executor=executor)
+        self.assertEqual((stats['batches'], stats['done'], len(stats['lags'])), (3, 6, 6))
+        self.assertEqual(sorted(event_id for _, event_id in handled), [event.id for event in events[:5]])
+        self.assertFalse(OutboxEvent.objects.exclude(status=OutboxEvent.DONE).exists())
+        self.assertEqual(OutboxEvent.objects.filter(processed_at__isnull=False).count(), 6)
+
+    def test_failures_back_off_then_fail(self):
+        event, = self.publish('test.failing')
+        before = timezone.now()
+        with self.assertLogs('clothes.outbox', 'ERROR'):
+            stats = process_events(claim_events(10))
+        event.refresh_from_db()
+        self.assertEqual((stats['retried'], event.status, event.attempts), (1, OutboxEvent.PENDING, 1))
+        self.assertIn('smtp down', event.last_error)
+        self.assertGreater(event.available_at, before)
+        self.assertEqual(claim_events(10), [])
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=before)
+        with self.assertLogs('clothes.outbox', 'ERROR'):
+            stats = process_events(claim_events(10))
+        event.refresh_from_db()
+        self.assertEqual((stats['failed'], event.status, event.attempts), (1, OutboxEvent.FAILED, 2))
+        self.assertEqual(outbox_stats()['failed'], 1)
+
+    def test_handler_can_fail_single_events(self):
+        good, = self.publish('test.partial')
+        bad, = self.publish('test.partial', bad=True)
+        stats = process_events(claim_events(10))
+        self.assertEqual((stats['done'], stats['retried']), (1, 1))
+        self.assertEqual(OutboxEvent.objects.get(pk=good.pk).status, OutboxEvent.DONE)
+        self.assertEqual(OutboxEvent.objects.get(pk=bad.pk).last_error, 'bad payload')
+
+    def test_stats_and_purge(self):
+        self.publish('order.created', 2)
+        self.assertEqual((outbox_stats()['pending'], outbox_stats()['due']), (2, 2))
+        drain(batch_size=10)
+        self.assertEqual(outbox_stats()['done'], 2)
+        self.assertEqual(purge_processed_events(), 0)
+        self.assertEqual(purge_processed_events(now=timezone.now() + timedelta(days=8)), 2)
+
+    def test_purge_removes_failed_email_events(self):
+        email, = self.publish('email.send', body='https://example.com/reset/abc/token/')
+        other, = self.publish('test.failing')
+        OutboxEvent.objects.update(status=OutboxEvent.FAILED)
+        self.assertEqual(purge_processed_events(), 0)
+        self.assertEqual(purge_processed_events(now=timezone.now() + timedelta(days=8)), 1)
+        self.assertEqual(list(OutboxEvent.objects.values_list('id', flat=True)), [other.id])
+
+    def test_command_once(self):
+        self.publish('order.created', 3)
+        out = StringIO()
+        call_command('run_outbox_worker', '--once', '--workers', '1', stdout=out)
+        self.assertIn('Đã xử lý 3 sự kiện', out.getvalue())
+        self.assertEqual(len(handled), 3)
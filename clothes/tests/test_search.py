@@ -0,0 +1,152 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from clothes import search
+from clothes.models import *
+from clothes.search.backends import InvertedIndexSearchBackend
+from clothes.search.text import fold, tokenize
+
+INVERTED_INDEX = 'clothes.search.backends.InvertedIndexSearchBackend'
+
+
+class FoldTest(APITestCase):
+    def test_fold_removes_vietnamese_diacritics(self):
+        self.assertEqual(fold('Áo thun Đỏ'), 'ao thun do')
+        self.assertEqual(tokenize('Quần jeans, ống rộng!'), ['quan', 'jeans', 'ong', 'rong'])
+
+
+class DatabaseSearchTest(APITestCase):
+    def setUp(self):
+        self.url = reverse('search_clothes')
+        Clothes.objects.create(name="Áo thun", price=100000, image="http://img.com/1.jpg")
+        Clothes.objects.create(name="Quần jeans", price=300000, image="http://img.com/2.jpg")
+
+    def test_icontains_search(self):
+        response = self.client.get(self.url, {'q': 'thun'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data], ["Áo thun"])
+
+    def test_paginated_search(self):
+        response = self.client.get(self.url, {'q': '', 'page_size': 1, 'page': 2})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([item['name'] for item in response.data['results']], ["Quần jeans"])
+
+
+@override_settings(CLOTHES_SEARCH_BACKEND=INVERTED_INDEX, CLOTHES_SEARCH_INDEX_PATH=None)
+class InvertedIndexSearchTest(APITestCase):
+    def setUp(self):
+        search._backends.clear()
+        self.url = reverse('search_clothes')
+        self.tee = Clothes.objects.create(
+            name="Áo thun cổ tròn", price=100000, image="http://img.com/1.jpg",
+            description="Chất liệu cotton"
+        )
+        self.shirt = Clothes.objects.create(
+            name="Áo sơ mi", price=250000, image="http://img.com/2.jpg",
+            description="Mặc cùng áo thun bên trong"
+        )
+        self.jeans = Clothes.objects.create(
+            name="Quần jeans", price=300000, image="http://img.com/3.jpg"
+        )
+
+    def names(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        data = response.data['results'] if 'results' in response.data else response.data
+        return [item['name'] for item in data]
+
+    def test_matches_without_diacritics_and_ranks_name_first(self):
+        self.assertEqual(self.names('ao thun'), ["Áo thun cổ tròn", "Áo sơ mi"])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.names('qua je'), ["Quần jeans"])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.names('thun jeans'), [])
+
+    def test_pagination(self):
+        response = self.client.get(self.url, {'q': 'ao', 'page_size': 1, 'page': 2})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.names('hoodie'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jeans.name = "Áo hoodie"
+            self.jeans.save()
+        self.assertEqual(self.names('hoodie'), ["Áo hoodie"])
+        self.assertEqual(self.names('jeans'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jeans.delete()
+        self.assertEqual(self.names('hoodie'), [])
+
+    def test_rolled_back_changes_never_reach_the_index(self):
+        self.names('jeans')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.jeans.name = "Áo hoodie"
+                    self.jeans.save()
+                    self.tee.delete()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(self.names('hoodie'), [])
+        self.assertEqual(self.names('jeans'), ["Quần jeans"])
+
+    def test_changes_reach_other_workers_after_commit(self):
+        other = InvertedIndexSearchBackend()  # chỉ mục của một worker khác
+        self.assertEqual(other.search('jeans')[0], [self.jeans.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jeans.name = "Áo hoodie"
+            self.jeans.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tee.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(other.search('hoodie')[0], [self.jeans.id])
+        self.assertEqual(other.search('jeans')[0], [])
+        self.assertEqual(other.search('cotton')[0], [])
+
+    def test_missing_change_list_falls_back_to_rebuild(self):
+        other = InvertedIndexSearchBackend()
+        other.search('jeans')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jeans.name = "Áo hoodie"
+            self.jeans.save()
+        version = cache.get(InvertedIndexSearchBackend.version_key)
+        cache.delete(InvertedIndexSearchBackend.changes_key.format(version))
+        self.assertEqual(other.search('hoodie')[0], [self.jeans.id])
+        cache.clear()
+        self.assertEqual(other.search('hoodie')[0], [self.jeans.id])
+
+    def test_rebuild_command_writes_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.pickle')
+            with self.settings(CLOTHES_SEARCH_INDEX_PATH=path):
+                call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+                self.assertTrue(os.path.exists(path))
+                search._backends.clear()
+                self.assertEqual(self.names('so mi'), ["Áo sơ mi"])
+
+
+@override_settings(CLOTHES_SEARCH_BACKEND='clothes.search.postgres.PostgresSearchBackend')
+class PostgresSearchTest(APITestCase):
+    def setUp(self):
+        self.url = reverse('search_clothes')
+        Clothes.objects.create(name="Áo thun", price=100000, image="http://img.com/1.jpg")
+        Clothes.objects.create(name="Quần jeans", price=300000, image="http://img.com/2.jpg")
+
+    def test_search(self):
+        response = self.client.get(self.url, {'q': 'jeans'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data], ["Quần jeans"])
+
+    def test_search_vector_is_not_serialized(self):
+        response = self.client.get(self.url, {'q': 'thun'})
+        self.assertNotIn('search_vector', response.data[0])
@@ -0,0 +1,174 @@
+import io
+from io import StringIO
+import random
+import threading
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+from django.urls import reverse
+from clothes.facets import rebuild_facet_counts
+from clothes.importer import import_products
+from clothes.inventory import apply_inventory_updates
+from clothes.models import *
+from clothes.shards import (disable_sharding, enable_sharding, redistribute_shards, rollup_stock,
+                            take_from_shards)
+
+
+@override_settings(STOCK_SHARD_COUNT=4)
+class StockShardTest(APITestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='buyer', email='buyer@example.com',
+                                                    password='buyer123', role='user')
+        self.client.force_authenticate(self.user)
+        self.payment = PaymentMethod.objects.create(methodname='COD')
+        self.category = Category.objects.create(name='Áo')
+        self.product = Clothes.objects.create(name='Áo flash sale', price=1000, quantity_in_stock=10,
+                                              category=self.category)
+        enable_sharding([self.product.id])
+
+    def shard_quantities(self):
+        return list(StockShard.objects.filter(product=self.product).order_by('shard')
+                    .values_list('quantity', flat=True))
+
+    def order(self, quantity):
+        return self.client.post(reverse('create_order'), {
+            'source': 'detail',
+            'payment_method': self.payment.id,
+            'products': [{'id': self.product.id, 'quantity': quantity}],
+        }, format='json')
+
+    def test_enable_and_disable_split_and_merge_stock(self):
+        self.assertEqual(self.shard_quantities(), [3, 3, 2, 2])
+        self.assertTrue(Clothes.objects.get(pk=self.product.pk).hot_sku)
+        self.assertEqual(enable_sharding([self.product.id]), 0)
+
+        StockShard.objects.filter(product=self.product, shard=0).update(quantity=0)
+        self.assertEqual(disable_sharding([self.product.id]), 1)
+        product = Clothes.objects.get(pk=self.product.pk)
+        self.assertEqual((product.hot_sku, product.quantity_in_stock), (False, 7))
+        self.assertFalse(StockShard.objects.exists())
+
+    def test_checkout_decrements_one_shard_without_touching_product_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.order(2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['tongtien'], 2000)
+        # Ngoài bộ đếm mã vận đơn (SequenceCounter, chỉ khi không có sequence PostgreSQL).
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')
+                   and not query['sql'].startswith('UPDATE "clothes_sequencecounter"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"clothes_stockshard"', updates[0])
+        self.assertEqual(sum(self.shard_quantities()), 8)
+        self.assertEqual(Clothes.objects.get(pk=self.product.pk).quantity_in_stock, 10)
+
+    def test_falls_back_across_shards_and_never_oversells(self):
+        self.assertTrue(take_from_shards(self.product.id, 5, rng=random.Random(1)))
+        self.assertEqual(sum(self.shard_quantities()), 5)
+        self.assertEqual(self.order(6).status_code, 400)
+        self.assertEqual(self.order(5).status_code, 201)
+        self.assertEqual(self.shard_quantities(), [0, 0, 0, 0])
+        self.assertEqual(self.order(1).status_code, 400)
+
+    def test_shard_count_survives_setting_change(self):
+        self.assertEqual(Clothes.objects.get(pk=self.product.pk).stock_shard_count, 4)
+        with self.settings(STOCK_SHARD_COUNT=16):
+            for seed in range(2):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertTrue(take_from_shards(self.product.id, 1, rng=random.Random(seed)))
+                # Không rơi vào nhánh khóa và đọc mọi shard.
+                self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')
+                                  and 'FROM "clothes_stockshard"' in query['sql']])
+            self.assertEqual(sum(self.shard_quantities()), 8)
+            redistribute_shards({self.product.id: 12})
+        self.assertEqual(self.shard_quantities(), [3, 3, 3, 3])
+
+    def test_rollup_updates_stock_status_and_facets(self):
+        self.order(10)
+        self.assertEqual(rollup_stock(), 1)
+        product = Clothes.objects.get(pk=self.product.pk)
+        self.assertEqual((product.quantity_in_stock, product.status), (0, 'hết hàng'))
+        facets = CatalogFacetCount.objects.filter(count__gt=0).values_list('status', 'count')
+        counts = set(facets)
+        rebuild_facet_counts()
+        self.assertEqual(counts, set(facets.all()))
+        self.assertEqual(rollup_stock(), 0)
+
+        apply_inventory_updates([{'id': self.product.id, 'quantity_in_stock': 6}])
+        self.assertEqual(self.shard_quantities(), [2, 2, 1, 1])
+        call_command('rollup_stock_shards', stdout=StringIO())
+        self.assertEqual(Clothes.objects.get(pk=self.product.pk).status, 'còn hàng')
+
+    def test_update_view_restock_survives_rollup(self):
+        admin = UserAccount.objects.create_user(username='shop', email='shop@example.com',
+                                                password='shop123', role='admin')
+        self.client.force_authenticate(admin)
+        response = self.client.put(reverse('update_clothes', args=[self.product.id]),
+                                   {'quantity_in_stock': 20}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shard_quantities(), [5, 5, 5, 5])
+        rollup_stock()
+        self.assertEqual(Clothes.objects.get(pk=self.product.pk).quantity_in_stock, 20)
+
+    def test_import_restock_survives_rollup(self):
+        content = ('id,name,price,image,quantity_in_stock\n'
+                   f'{self.product.id},Áo flash sale,1000,http://img.example.com/a.jpg,6\n')
+        result = import_products(io.BytesIO(content.encode()), 'csv')
+        self.assertEqual((result.updated, result.error_count), (1, 0))
+        self.assertEqual(self.shard_quantities(), [2, 2, 1, 1])
+        rollup_stock()
+        self.assertEqual(Clothes.objects.get(pk=self.product.pk).quantity_in_stock, 6)
+
+    def test_admin_actions_toggle_sharding(self):
+        admin = UserAccount.objects.create_superuser(username='root', email='root@example.com',
+                                                     password='root123')
+        self.client.force_login(admin)
+        url = reverse('admin:clothes_clothes_changelist')
+        self.client.post(url, {'action': 'disable_hot_sku', ACTION_CHECKBOX_NAME: [self.product.id]})
+        self.assertFalse(Clothes.objects.get(pk=self.product.pk).hot_sku)
+        self.client.post(url, {'action': 'enable_hot_sku', ACTION_CHECKBOX_NAME: [self.product.id]})
+        self.assertTrue(Clothes.objects.get(pk=self.product.pk).hot_sku)
+        self.assertEqual(len(self.shard_quantities()), 4)
+
+
+@override_settings(STOCK_SHARD_COUNT=8)
+class StockShardConcurrencyTest(TransactionTestCase):
+    """Nhiều luồng cùng mua một sản phẩm chia kho: không bán quá tồn kho, không mất đơn."""
+    threads = 16
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_checkouts_on_hot_sku(self):
+        payment = PaymentMethod.objects.create(methodname='COD')
+        product = Clothes.objects.create(name='Áo', price=1000, quantity_in_stock=40)
+        enable_sharding([product.id])
+        users = [UserAccount.objects.create_user(username=f'buyer{i}', email=f'buyer{i}@example.com',
+                                                 password='buyer123', role='user')
+                 for i in range(self.threads)]
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+
+        def checkout(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                for _ in range(3):
+                    statuses.append(client.post(reverse('create_order'), {
+                        'source': 'detail', 'payment_method': payment.id,
+                        'products': [{'id': product.id, 'quantity': 1}],
+                    }, format='json').status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=checkout, args=(user,)) for user in users]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(statuses), [201] * 40 + [400] * (self.threads * 3 - 40))
+        rollup_stock()
+        self.assertEqual(Clothes.objects.get(pk=product.pk).quantity_in_stock, 0)
@@ -0,0 +1,97 @@
+import itertools
+import threading
+
+from django.test import TestCase, override_settings
+from clothes.models import *
+from clothes.tracking import DatabaseCounter, FeistelTrackingNumberGenerator, get_tracking_number_generator
+
+
+class MemoryCounter:
+    def __init__(self):
+        self._values = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_value(self):
+        with self._lock:
+            return next(self._values)
+
+
+class FeistelTrackingNumberGeneratorTest(TestCase):
+    def test_encode_is_ten_digit_bijection(self):
+        generator = FeistelTrackingNumberGenerator(counter=MemoryCounter(), key='test')
+        for number in (0, 1, 2, 99999, 10 ** 5, 123456789, 10 ** 10 - 1):
+            tracking_number = generator.encode(number)
+            self.assertRegex(tracking_number, r'^\d{10}$')
+            self.assertEqual(generator.decode(tracking_number), number)
+        with self.assertRaises(ValueError):
+            generator.encode(10 ** 10)
+
+    def test_consecutive_numbers_do_not_look_sequential(self):
+        generator = FeistelTrackingNumberGenerator(counter=MemoryCounter(), key='test')
+        numbers = [int(generator.generate()) for _ in range(100)]
+        self.assertNotEqual(numbers, sorted(numbers))
+        self.assertFalse(any(abs(b - a) < 1000 for a, b in zip(numbers, numbers[1:])))
+
+    def test_key_changes_the_permutation(self):
+        first = FeistelTrackingNumberGenerator(counter=MemoryCounter(), key='a')
+        second = FeistelTrackingNumberGenerator(counter=MemoryCounter(), key='b')
+        self.assertNotEqual([first.encode(n) for n in range(10)], [second.encode(n) for n in range(10)])
+
+    def test_million_numbers_across_threads_are_unique(self):
+        generator = FeistelTrackingNumberGenerator(counter=MemoryCounter(), key='test')
+        per_thread, threads = 125000, 8
+        results = [None] * threads
+
+        def worker(index):
+            results[index] = [generator.generate() for _ in range(per_thread)]
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        numbers = set().union(*results)
+        self.assertEqual(len(numbers), per_thread * threads)
+
+
+class OrderTrackingNumberTest(TestCase):
+    def setUp(self):
+        self.user = UserAccount.objects.create_user(username='buyer', email='buyer@example.com',
+                                                    password='buyer123', role='user')
+        self.payment = PaymentMethod.objects.create(methodname='COD')
+
+    def test_orders_get_unique_tracking_numbers_from_database_counter(self):
+        orders = [Order.objects.create(user=self.user, payment_method=self.payment, tongtien=0)
+                  for _ in range(20)]
+        tracking_numbers = [order.tracking_number for order in orders]
+        self.assertEqual(len(set(tracking_numbers)), 20)
+        self.assertTrue(all(len(number) == 10 and number.isdigit() for number in tracking_numbers))
+
+        generator = get_tracking_number_generator()
+        sequence = [generator.decode(number) for number in tracking_numbers]
+        self.assertEqual(sequence, list(range(sequence[0], sequence[0] + 20)))
+        self.assertEqual(SequenceCounter.objects.get(name='order_tracking').value, sequence[-1])
+
+    def test_skips_tracking_numbers_of_legacy_orders(self):
+        generator = get_tracking_number_generator()
+        counter = SequenceCounter.objects.get_or_create(name='order_tracking')[0].value
+        legacy = [generator.encode(counter + 1), generator.encode(counter + 2)]
+        for tracking_number in legacy:
+            Order.objects.create(user=self.user, payment_method=self.payment, tongtien=0,
+                                 tracking_number=tracking_number)
+        order = Order.objects.create(user=self.user, payment_method=self.payment, tongtien=0)
+        self.assertEqual(order.tracking_number, generator.encode(counter + 3))
+
+    def test_database_counter_is_monotonic(self):
+        counter = DatabaseCounter(name='test')
+        self.assertEqual([counter.next_value() for _ in range(3)], [1, 2, 3])
+
+    @override_settings(ORDER_TRACKING_NUMBER_GENERATOR='clothes.tests.test_tracking.FixedGenerator')
+    def test_generator_is_pluggable(self):
+        order = Order.objects.create(user=self.user, payment_method=self.payment, tongtien=0)
+        self.assertEqual(order.tracking_number, '0000000042')
+
+
+class FixedGenerator:
+    def generate(self):
+        return '0000000042'
@@ -0,0 +1,13 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class OrderTrackingRateThrottle(SimpleRateThrottle):
+    """
+    Giới hạn số lần tra cứu mã vận đơn theo IP client (kể cả khi đã đăng nhập), tốc độ lấy từ
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['order_tracking']. Bộ đếm nằm trong cache nên
+    request bị chặn không chạm tới database.
+    """
+    scope = 'order_tracking'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
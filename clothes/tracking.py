@@ -0,0 +1,99 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+TRACKING_NUMBER_DIGITS = 10
+SEQUENCE_NAME = 'clothes_order_tracking_seq'
+
+_HALF = 10 ** (TRACKING_NUMBER_DIGITS // 2)
+_generators = {}
+
+
+class DatabaseCounter:
+    """
+    Nguồn số nguyên tăng dần, không trùng giữa các tiến trình:
+    - PostgreSQL: nextval() của sequence `clothes_order_tracking_seq` (migration 0023), không khóa
+      dòng nào và không bị rollback theo transaction.
+    - Database khác: UPDATE dòng `name` của bảng SequenceCounter trong transaction hiện tại; dòng
+      bị khóa tới khi transaction kết thúc nên số bị rollback cũng không cấp cho ai khác.
+    """
+
+    def __init__(self, name='order_tracking'):
+        self.name = name
+
+    def next_value(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT nextval(%s)', [SEQUENCE_NAME])
+                return cursor.fetchone()[0]
+
+        from .models import SequenceCounter
+
+        counters = SequenceCounter.objects.filter(name=self.name)
+        with transaction.atomic():
+            if not counters.update(value=F('value') + 1):
+                SequenceCounter.objects.get_or_create(name=self.name)
+                counters.update(value=F('value') + 1)
+            return counters.values_list('value', flat=True).get()
+
+
+class FeistelTrackingNumberGenerator:
+    """
+    Mã vận đơn 10 chữ số = hoán vị Feistel (có khóa) của số thứ tự lấy từ `counter`.
+
+    Hoán vị là song ánh trên [0, 10^10) nên hai số thứ tự khác nhau luôn cho hai mã khác nhau,
+    trong khi mã liên tiếp trông ngẫu nhiên với khách hàng. Mã có thể trùng mã ngẫu nhiên của
+    đơn cũ; Order.generate_tracking_number bỏ qua các mã đó.
+    ORDER_TRACKING_NUMBER_KEY không được đổi sau khi đã phát hành mã, nếu không mã mới có thể
+    trùng mã cũ.
+    """
+    rounds = 4
+
+    def __init__(self, counter=None, key=None):
+        self.counter = counter or DatabaseCounter()
+        self.key = (key or settings.ORDER_TRACKING_NUMBER_KEY).encode()
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def _round_tables(self):
+        # Hàm vòng được tính sẵn cho mọi nửa khối (10^5 giá trị mỗi vòng): mã hóa chỉ còn tra bảng.
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._tables = [
+                        [int.from_bytes(hashlib.blake2b(f'{round_}:{value}'.encode(), key=self.key,
+                                                        digest_size=8).digest(), 'big') % _HALF
+                         for value in range(_HALF)]
+                        for round_ in range(self.rounds)
+                    ]
+        return self._tables
+
+    def encode(self, number):
+        if not 0 <= number < _HALF * _HALF:
+            raise ValueError(f'Số thứ tự {number} vượt quá {TRACKING_NUMBER_DIGITS} chữ số.')
+        left, right = divmod(number, _HALF)
+        for table in self._round_tables():
+            left, right = right, (left + table[right]) % _HALF
+        return f'{left * _HALF + right:0{TRACKING_NUMBER_DIGITS}d}'
+
+    def decode(self, tracking_number):
+        left, right = divmod(int(tracking_number), _HALF)
+        for table in reversed(self._round_tables()):
+            left, right = (right - table[left]) % _HALF, left
+        return left * _HALF + right
+
+    def generate(self):
+        return self.encode(self.counter.next_value())
+
+
+def get_tracking_number_generator():
+    """Generator cấu hình trong ORDER_TRACKING_NUMBER_GENERATOR, khởi tạo một lần mỗi tiến trình."""
+    path = settings.ORDER_TRACKING_NUMBER_GENERATOR
+    generator = _generators.get(path)
+    if generator is None:
+        generator = _generators[path] = import_string(path)()
+    return generator
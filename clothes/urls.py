@@ -11,17 +11,26 @@ urlpatterns = [
     path('category/<int:pk>/update/', update_category, name='update_category'),
     path('category/<int:pk>/delete/', delete_category, name='delete_category'),
     path('product/', get_clothes, name='get_clothes'),
+    path('product/export/', export_clothes, name='export_clothes'),
     path('product/<int:pk>/', clothes_detail, name='clothes_detail'),
+    path('product/ratings/', bulk_product_ratings, name='bulk_product_ratings'),
+    path('product/<int:pk>/ratings/', product_ratings, name='product_ratings'),
     path('product/create/', create_clothes, name='create_clothes'),
+    path('product/import/', import_clothes, name='import_clothes'),
+    path('product/bulk-update/', bulk_update_inventory, name='bulk_update_inventory'),
     path('product/<int:pk>/update/', update_clothes, name='update_clothes'),
     path('product/<int:pk>/delete/', delete_clothes, name='delete_clothes'),
     path('search/', search_clothes, name='search_clothes'),
+    path('cache/stats/', catalog_cache_stats, name='catalog_cache_stats'),
     path('cart/', user_cart, name='user_cart'),
+    path('cart/batch/', batch_cart, name='batch_cart'),
     path('add_to_cart/', add_to_cart, name='add_to_cart'),
     path('remove_from_cart/', remove_from_cart, name='remove_from_cart'),
     path('change_product_quantity/', change_product_quantity, name='change_product_quantity'),
     path('user_orders/', user_orders, name='user_orders'),
+    path('user_orders/<int:pk>/', user_order_detail, name='user_order_detail'),
     path('create_order/', create_order, name='create_order'),
     path('cancel_order/<int:pk>/', cancel_order, name='cancel_order'),
+    path('track/<str:tracking_number>/', track_order, name='track_order'),
     path('rate_product/<int:pk>/', rate_product, name='rate_product'),
 ]
@@ -1,5 +1,5 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from .permissions import IsAdmin, IsUser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -7,14 +7,29 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.shortcuts import render, get_object_or_404
+from django.http import StreamingHttpResponse
 from .models import *
 from .serializers import *
+from .pagination import KeysetPagination, InvalidCursor
+from .fast_serializers import FastSerializer
+from .search import get_search_backend
+from .cache import CACHED_SCOPES, cache_catalog_response, cache_stats, get_order_tracking, get_versions, CATALOG_VERSION_KEY
+from .facets import InvalidFilter, filter_clothes, get_facets, parse_catalog_filters
+from .inventory import apply_inventory_updates
+from .carts import apply_cart_operations
+from .stock import StockError, reserve_stock
+from .shards import redistribute_shards
+from .idempotency import idempotent
+from .emails import queue_email
+from .throttles import OrderTrackingRateThrottle
+from .ratings import add_rating, rating_summaries
+from .importer import IMPORT_FORMATS, detect_format, import_products
+from .export import CONTENT_TYPES, accepts_gzip, gzip_stream, iter_csv, iter_ndjson, parse_updated_since
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
 from django.conf import settings
-from django.template.loader import render_to_string
 from django.db import transaction
+import re
 
 
 # Create your views here.
@@ -78,17 +93,14 @@ def request_password_reset(request):
 
         reset_link = f"http://localhost:8001/clothes/password-confirm/{uid}/{token}/"
 
-        html = render_to_string('email_template.html', {'username': user.username,
-                                                        'reset_link': reset_link})
-        send_mail(
+        queue_email(
+            to=[email],
             subject='Yêu cầu đặt lại mật khẩu',
-            message=f'Xin chào {user.username},\n\n'
-                    f'Vui lòng nhấn vào liên kết sau để đặt lại mật khẩu:\n{reset_link}\n\n'
-                    'Nếu bạn không yêu cầu điều này, hãy bỏ qua email này.',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
-            html_message=html
+            body=f'Xin chào {user.username},\n\n'
+                 f'Vui lòng nhấn vào liên kết sau để đặt lại mật khẩu:\n{reset_link}\n\n'
+                 'Nếu bạn không yêu cầu điều này, hãy bỏ qua email này.',
+            html_template='email_template.html',
+            context={'username': user.username, 'reset_link': reset_link},
         )
 
         return Response({"message": "Email đặt lại mật khẩu đã được gửi."}, status=200)
@@ -116,6 +128,7 @@ def reset_password_confirm(request, uid, token):
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@cache_catalog_response('categories')
 @api_view(['GET'])
 def get_categories(request):
     try: 
@@ -158,24 +171,141 @@ def delete_category(request, pk):
     except Category.DoesNotExist:
         return Response({'error': 'Danh mục không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
     
+def _clothes_queryset(context):
+    only, related = product_query_plan(context)
+    clothes = Clothes.objects.all()
+    if related:
+        clothes = clothes.select_related(*related)
+    if only is not None:
+        clothes = clothes.only(*only)
+    return clothes
+
+CLOTHES_ORDERINGS = {
+    'id': ('id',),
+    '-id': ('-id',),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+}
+
+def _serialize_many(serializer_class, queryset, context):
+    if settings.CATALOG_FAST_SERIALIZATION:
+        return FastSerializer.for_context(serializer_class, context).serialize(queryset)
+    return serializer_class(queryset, many=True, context=context).data
+
+def _paginate_many(paginator, serializer_class, queryset, request, context, extra_columns=()):
+    if settings.CATALOG_FAST_SERIALIZATION:
+        # Cursor cần giá trị các trường sắp xếp của dòng cuối trang.
+        fast = FastSerializer.for_context(serializer_class, context)
+        page = paginator.paginate_queryset(fast.prepare(queryset, extra_columns=extra_columns), request)
+        return fast.serialize_rows(page)
+    page = paginator.paginate_queryset(queryset, request)
+    return serializer_class(page, many=True, context=context).data
+
+@cache_catalog_response('product_list')
 @api_view(['GET'])
 def get_clothes(request):
     try: 
-        clothes = Clothes.objects.all()
-        serializer = ClothesSerializer(clothes, many=True)
-        return Response(serializer.data)
+        try:
+            filters = parse_catalog_filters(request.query_params)
+        except InvalidFilter:
+            return Response({'error': 'Bộ lọc không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+        context = fieldset_context(request)
+        clothes = filter_clothes(_clothes_queryset(context), filters)
+        with_facets = request.query_params.get('facets', '').lower() in ('1', 'true', 'yes')
+        paginator = KeysetPagination(CLOTHES_ORDERINGS, 'id')
+        if paginator.is_requested(request):
+            try:
+                results = _paginate_many(paginator, ClothesSerializer, clothes, request, context,
+                                         extra_columns=['price'])
+            except InvalidCursor:
+                return Response({'error': 'Cursor không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+            data = paginator.get_paginated_data(results)
+            if with_facets:
+                data['facets'] = get_facets(filters)
+            return Response(data)
+        results = _serialize_many(ClothesSerializer, clothes, context)
+        if with_facets:
+            return Response({'results': results, 'facets': get_facets(filters)})
+        return Response(results)
     except Category.DoesNotExist:
         return Response({'error': 'Không tìm thấy sản phẩm.'}, status=status.HTTP_404_NOT_FOUND)
 
+@cache_catalog_response('product_detail')
 @api_view(['GET'])
 def clothes_detail(request, pk):
     try:
-        product = Clothes.objects.get(pk = pk)
-        serializers = ClothesSerializer(product)
+        context = fieldset_context(request)
+        product = _clothes_queryset(context).get(pk = pk)
+        serializers = ClothesSerializer(product, context=context)
         return Response(serializers.data)
     except Clothes.DoesNotExist:
         return Response({'error': 'Sản phẩm không tồn tại'}, status=404)
     
+# GET /clothes/product/export/?output=ndjson|csv&category=1&updated_since=2026-01-31T00:00:00Z
+# Dùng `output` thay cho `format` vì DRF dành tham số `format` cho chọn renderer.
+@api_view(['GET'])
+def export_clothes(request):
+    output = request.query_params.get('output', 'ndjson')
+    if output not in CONTENT_TYPES:
+        return Response({'error': 'Định dạng xuất không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        filters = parse_catalog_filters(request.query_params)
+    except InvalidFilter:
+        return Response({'error': 'Bộ lọc không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+    clothes = filter_clothes(Clothes.objects.all(), filters)
+    if request.query_params.get('updated_since'):
+        try:
+            since = parse_updated_since(request.query_params['updated_since'])
+        except ValueError:
+            return Response({'error': 'Tham số updated_since không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+        clothes = clothes.filter(updated_at__gte=since)
+
+    chunks = iter_ndjson(clothes) if output == 'ndjson' else iter_csv(clothes)
+    use_gzip = accepts_gzip(request)
+    response = StreamingHttpResponse(gzip_stream(chunks) if use_gzip else chunks,
+                                     content_type=CONTENT_TYPES[output])
+    response['Content-Disposition'] = f'attachment; filename="clothes.{output}"'
+    response['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    return response
+
+@cache_catalog_response('product_ratings')
+@api_view(['GET'])
+def product_ratings(request, pk):
+    summary = rating_summaries([pk]).get(pk)
+    if summary is None:
+        return Response({'error': 'Sản phẩm không tồn tại'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(summary)
+
+# GET /clothes/product/ratings/?ids=1,2,3
+@cache_catalog_response('product_ratings_bulk')
+@api_view(['GET'])
+def bulk_product_ratings(request):
+    try:
+        ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return Response({'error': 'Danh sách ids không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not ids or len(ids) > settings.CATALOG_MAX_PAGE_SIZE:
+        return Response({'error': f'Cần từ 1 đến {settings.CATALOG_MAX_PAGE_SIZE} id.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    summaries = rating_summaries(ids)
+    return Response({'results': [summaries[pk] for pk in dict.fromkeys(ids) if pk in summaries]})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def catalog_cache_stats(request):
+    stats = cache_stats(CACHED_SCOPES)
+    hits = sum(item['hits'] for item in stats.values())
+    misses = sum(item['misses'] for item in stats.values())
+    return Response({
+        'catalog_version': get_versions(CATALOG_VERSION_KEY)[0],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        'scopes': stats,
+    })
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdmin])
 def create_clothes(request):
@@ -185,6 +315,40 @@ def create_clothes(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# multipart: file=<products.csv|products.jsonl>, create_categories=true (tùy chọn)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def import_clothes(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Chưa chọn file để nhập.'}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = request.data.get('input') or detect_format(upload.name)
+    if fmt not in IMPORT_FORMATS:
+        return Response({'error': 'Chỉ hỗ trợ file CSV hoặc JSONL.'}, status=status.HTTP_400_BAD_REQUEST)
+    create_categories = str(request.data.get('create_categories', '')).lower() in ('1', 'true', 'yes')
+    try:
+        upload.seek(0)
+        result = import_products(upload.file, fmt, create_categories=create_categories)
+    except UnicodeDecodeError:
+        return Response({'error': 'File phải được mã hóa UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+# {"items": [{"id": 1, "price": 150000}, {"id": 2, "quantity_in_stock": 0}]}
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def bulk_update_inventory(request):
+    items = request.data.get('items') if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Danh sách items không được để trống.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.CATALOG_BULK_UPDATE_MAX_ITEMS:
+        return Response({'error': f'Tối đa {settings.CATALOG_BULK_UPDATE_MAX_ITEMS} sản phẩm mỗi lần.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    results = apply_inventory_updates(items)
+    return Response({
+        'updated': sum(result['result'] == 'updated' for result in results),
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated, IsAdmin])
 def update_clothes(request, pk):
@@ -195,7 +359,11 @@ def update_clothes(request, pk):
     
     serializer = ClothesSerializer(clothes, data=request.data, partial=True)
     if serializer.is_valid():
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            if clothes.hot_sku and 'quantity_in_stock' in serializer.validated_data:
+                # Tồn kho của sản phẩm chia kho nằm ở StockShard, không thì rollup_stock ghi đè.
+                redistribute_shards({clothes.pk: clothes.quantity_in_stock})
         return Response(serializer.data, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -209,23 +377,62 @@ def delete_clothes(request, pk):
     except Category.DoesNotExist:
         return Response({'error': 'Sản phẩm không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
         
+def _products_in_order(ids, context):
+    products = _clothes_queryset(context).in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
+
+@cache_catalog_response('search')
 @api_view(['GET'])
 def search_clothes(request):
     keyword = request.query_params.get('q', '')
-    clothes = Clothes.objects.filter(name__icontains=keyword)
-    serializer = ClothesSerializer(clothes, many=True)
-    return Response(serializer.data)
+    context = fieldset_context(request)
+    backend = get_search_backend()
+    params = request.query_params
+    if 'page' not in params and 'page_size' not in params:
+        ids, total = backend.search(keyword)
+        serializer = ClothesSerializer(_products_in_order(ids, context), many=True, context=context)
+        return Response(serializer.data)
+
+    try:
+        page = max(1, int(params.get('page', 1)))
+        page_size = max(1, min(int(params.get('page_size', settings.CATALOG_PAGE_SIZE)),
+                               settings.CATALOG_MAX_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'Tham số phân trang không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+    ids, total = backend.search(keyword, offset=(page - 1) * page_size, limit=page_size)
+    serializer = ClothesSerializer(_products_in_order(ids, context), many=True, context=context)
+    return Response({
+        'count': total,
+        'page': page,
+        'page_size': page_size,
+        'results': serializer.data,
+    })
+
+def _item_queryset(model, context, item_fields):
+    """
+    CartItem/OrderItem cho `with_items()` khi client chọn fieldset: chỉ SELECT các trường sản
+    phẩm được yêu cầu. None khi cần đủ trường (dùng queryset mặc định của with_items).
+    """
+    only, related = product_query_plan(context, prefix='product__')
+    if only is None:
+        return None
+    return model.objects.select_related('product', *related).order_by('id').only(
+        *item_fields, 'product', *only)
+
+def _cart_queryset(carts, context):
+    items = _item_queryset(CartItem, context, ['id', 'quantity', 'price', 'cart'])
+    return carts.order_by('id').with_items(items)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsUser])
 def user_cart(request):
     try:
         
-        cart = Cart.objects.filter(user=request.user).order_by('id')
+        context = fieldset_context(request)
+        cart = _cart_queryset(Cart.objects.filter(user=request.user), context)
 
-        serializer = CartSerializer(cart, many=True)
-        
-        return Response({"carts": serializer.data}, status=status.HTTP_200_OK)
+        return Response({"carts": _serialize_many(CartSerializer, cart, context)},
+                        status=status.HTTP_200_OK)
     except UserAccount.DoesNotExist:
         return Response({'error': f'Người dùng {request.user} không có giỏ hàng'}, 
                         status=status.HTTP_400_BAD_REQUEST)
@@ -258,25 +465,17 @@ def add_to_cart(request):
         if product.quantity_in_stock < quantity:
             return Response({'error': 'Sản phẩm trong kho không đủ'}, status=status.HTTP_400_BAD_REQUEST)
         
-        cart_item, item_created = CartItem.objects.get_or_create(cart=cart, product=product)
-        
-        if not item_created:
-            cart_item.quantity += int(quantity)
-        else:
-            cart_item.quantity = int(quantity)
-        cart_item.save()
-        
-        
-        cart.save()
-        
-        if product not in cart.products.all():
-            cart.products.add(product)
-        
-        cart.total_value = sum(item.quantity * item.product.price for item in CartItem.objects.filter(cart=cart))
-        cart.quantity = cart.total_product_type()
-        cart.save()
+        # Tổng của giỏ được CartItem.save cộng dồn bằng F() trong cùng transaction.
+        with transaction.atomic():
+            cart_item = CartItem.objects.select_for_update().filter(cart=cart, product=product).first()
+            if cart_item:
+                cart_item.product = product
+                cart_item.quantity += int(quantity)
+                cart_item.save()
+            else:
+                cart_item = CartItem.objects.create(cart=cart, product=product, quantity=int(quantity))
+                cart.products.add(product)
 
-        
         return Response({
             'message': 'Thêm sản phẩm vào giỏ hàng thành công',
             'product': {
@@ -309,15 +508,10 @@ def remove_from_cart(request):
         if not cart_item:
             return Response({'error': 'Không có sản phẩm nào trong giỏ hàng'}, status=status.HTTP_404_NOT_FOUND)
 
-        cart_item.delete()
-
-        if product in cart.products.all():
+        with transaction.atomic():
+            cart_item.delete()
             cart.products.remove(product)
 
-        cart.total_value = sum(item.quantity * item.product.price for item in CartItem.objects.filter(cart=cart))
-        cart.quantity = cart.total_product_type()
-        cart.save()
-
         return Response({
             'message': 'Xóa sản phẩm khỏi giỏ hàng thành công',
             'product': {
@@ -353,11 +547,11 @@ def change_product_quantity(request):
             return Response({'error': 'Không có sản phẩm nào trong giỏ hàng'}, status=status.HTTP_404_NOT_FOUND)
 
         if cart_item:
+            cart_item.product = product
             cart_item.quantity = int(new_quantity)
             cart_item.save()
-            cart.save()
-            
-            total_product_type = cart.total_product_type()
+
+            total_product_type = Cart.objects.values_list('quantity', flat=True).get(pk=cart.pk)
 
             return Response({
                 'message': 'Số lượng sản phẩm đã được thay đổi thành công',
@@ -375,22 +569,135 @@ def change_product_quantity(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+# {
+#     "operations": [
+#         {"op": "add", "clothes_id": 1, "quantity": 2},
+#         {"op": "set", "clothes_id": 1, "quantity": 5},
+#         {"op": "remove", "clothes_id": 2}
+#     ],
+#     "atomic": false
+# }
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsUser])
+def batch_cart(request):
+    operations = request.data.get('operations') if isinstance(request.data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return Response({'error': 'Danh sách thao tác không được để trống.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(operations) > settings.CART_BATCH_MAX_OPERATIONS:
+        return Response({'error': f'Tối đa {settings.CART_BATCH_MAX_OPERATIONS} thao tác mỗi lần.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    atomic = request.data.get('atomic', False) is True
+    context = fieldset_context(request)
+
+    cart, created = Cart.objects.get_or_create(user=request.user)
+    results, applied = apply_cart_operations(cart, operations, atomic=atomic)
+    if not applied:
+        return Response({'error': 'Có thao tác không hợp lệ, giỏ hàng không thay đổi.', 'results': results},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    carts = _serialize_many(CartSerializer, _cart_queryset(Cart.objects.filter(pk=cart.pk), context), context)
+    return Response({
+        'applied': sum(result['result'] == 'ok' for result in results),
+        'results': results,
+        'cart': carts[0],
+    }, status=status.HTTP_200_OK)
+
+ORDER_ORDERINGS = {
+    '-created_at': ('-created_at', '-id'),
+    'created_at': ('created_at', 'id'),
+}
+
+def _filter_orders(orders, params):
+    """Lọc theo `status` (có thể nhiều giá trị, cách nhau bởi dấu phẩy), `created_after` (>=) và
+    `created_before` (<); ValueError khi tham số không hợp lệ."""
+    statuses = [value.strip() for value in params.get('status', '').split(',') if value.strip()]
+    if statuses:
+        valid = {choice for choice, _ in Order.STATUS_CHOICES}
+        if not valid.issuperset(statuses):
+            raise ValueError(statuses)
+        orders = orders.filter(status__in=statuses)
+    if params.get('created_after'):
+        orders = orders.filter(created_at__gte=parse_updated_since(params['created_after']))
+    if params.get('created_before'):
+        orders = orders.filter(created_at__lt=parse_updated_since(params['created_before']))
+    return orders
+
+# Query params: status, created_after, created_before, summary=true (không kèm sản phẩm),
+# cursor / page_size / ordering (-created_at | created_at) / paginate.
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_orders(request):
     try:
-        orders = Order.objects.filter(user=request.user).order_by('-created_at')
-
-        serializer = OrderSerializer(orders, many=True)
-        return Response({"orders": serializer.data}, status=status.HTTP_200_OK)
+        context = fieldset_context(request)
+        try:
+            orders = _filter_orders(Order.objects.filter(user=request.user), request.query_params)
+        except ValueError:
+            return Response({'error': 'Bộ lọc không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('summary', '').lower() in ('1', 'true', 'yes'):
+            serializer_class = OrderSummarySerializer
+        else:
+            serializer_class = OrderSerializer
+            items = _item_queryset(OrderItem, context, ['id', 'quantity', 'total_value', 'order'])
+            orders = orders.with_items(items)
+
+        paginator = KeysetPagination(ORDER_ORDERINGS, '-created_at', page_size=settings.ORDER_PAGE_SIZE,
+                                     max_page_size=settings.ORDER_MAX_PAGE_SIZE,
+                                     paginate_by_default=settings.ORDER_PAGINATE_BY_DEFAULT)
+        if paginator.is_requested(request):
+            try:
+                results = _paginate_many(paginator, serializer_class, orders, request, context,
+                                         extra_columns=['created_at'])
+            except InvalidCursor:
+                return Response({'error': 'Cursor không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+            return paginator.get_paginated_response(results)
+
+        orders = orders.order_by(*ORDER_ORDERINGS['-created_at'])
+        return Response({"orders": _serialize_many(serializer_class, orders, context)},
+                        status=status.HTTP_200_OK)
     except AttributeError:
         return Response(
             {"detail": "Không tìm thấy thông tin khách hàng."},
             status=status.HTTP_400_BAD_REQUEST
         )
         
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_order_detail(request, pk):
+    context = fieldset_context(request)
+    items = _item_queryset(OrderItem, context, ['id', 'quantity', 'total_value', 'order'])
+    order = Order.objects.filter(pk=pk, user=request.user).with_items(items).first()
+    if order is None:
+        return Response({'error': 'Đơn hàng không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(OrderSerializer(order, context=context).data, status=status.HTTP_200_OK)
+
+TRACKING_NUMBER_RE = re.compile(r'[0-9]{10}')
+
+# Tra cứu công khai (không cần đăng nhập) trạng thái đơn theo mã vận đơn: một truy vấn trên
+# unique index của tracking_number, kết quả lưu cache và bị xóa khi đơn hàng thay đổi.
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@throttle_classes([OrderTrackingRateThrottle])
+def track_order(request, tracking_number):
+    if not TRACKING_NUMBER_RE.fullmatch(tracking_number):
+        return Response({'error': 'Mã vận đơn không hợp lệ.'}, status=status.HTTP_404_NOT_FOUND)
+
+    def load():
+        order = Order.objects.filter(tracking_number=tracking_number).only(
+            'tracking_number', 'status', 'created_at', 'updated_at').first()
+        return None if order is None else dict(OrderTrackingSerializer(order).data)
+
+    data, hit = get_order_tracking(tracking_number, load)
+    if data is None:
+        response = Response({'error': 'Đơn hàng không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsUser])
+@idempotent('create_order')
 @transaction.atomic
 def create_order(request):
     try:
@@ -418,42 +725,38 @@ def create_order(request):
             return Response({'error': 'Chỉ được mua 1 sản phẩm khi đặt hàng từ trang chi tiết.'}, 
                             status=status.HTTP_400_BAD_REQUEST)
 
-        total_price = 0.0
-        order_items = []
-
+        quantities = {}
         for item_data in products_data:
-
             product_id = item_data.get('id')
             quantity = item_data.get('quantity', 1)
 
+            try:
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                product_id = None
             if not product_id:
                 return Response({'error': 'Sản phẩm không có ID.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                product = Clothes.objects.select_for_update().get(id=product_id)
-                
-                if product.quantity_in_stock < quantity:
-                    return Response({'error': f"Sản phẩm '{product.name}' không đủ số lượng trong kho."},
+            if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+                return Response({'error': 'Số lượng sản phẩm không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        if source == 'cart':
+            in_cart = set(CartItem.objects.filter(cart=cart, product_id__in=quantities)
+                          .values_list('product_id', flat=True))
+            missing = [product_id for product_id in quantities if product_id not in in_cart]
+            if missing:
+                name = Clothes.objects.filter(pk=missing[0]).values_list('name', flat=True).first()
+                if name is None:
+                    return Response({'error': f'Sản phẩm với ID {missing[0]} không tồn tại.'},
                                     status=status.HTTP_400_BAD_REQUEST)
-                
-                if source == 'cart':
-                    if not CartItem.objects.filter(cart__user=user, product=product).exists():
-                        return Response({'error': f"Sản phẩm '{product.name}' không có trong giỏ hàng."},
-                                        status=status.HTTP_400_BAD_REQUEST)
-                product.quantity_in_stock -= quantity
-                product.save()
-                item_total = product.price * quantity
-                total_price += item_total
-                
-                order_items.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'total_value': product.price * quantity
-                })
-                
-            except Clothes.DoesNotExist:
-                return Response({'error': f'Sản phẩm với ID {product_id} không tồn tại.'}, 
+                return Response({'error': f"Sản phẩm '{name}' không có trong giỏ hàng."},
                                 status=status.HTTP_400_BAD_REQUEST)
+        # Trừ tồn kho theo CHECKOUT_STOCK_STRATEGY (clothes/stock.py); lỗi thì rollback cả đơn.
+        try:
+            products = reserve_stock(quantities)
+        except StockError as e:
+            transaction.set_rollback(True)
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
         hoVaTen = user_info.get('hovaten')
         SDT = user_info.get('sdt')
@@ -461,29 +764,26 @@ def create_order(request):
 
         order_new = Order.objects.create(
             user=user,
-            tongtien=total_price,
+            tongtien=sum(products[product_id].price * quantity for product_id, quantity in quantities.items()),
             hovaten = hoVaTen,
             sdt = SDT,
             diachi = diaChi,
             status='Chờ xác nhận',
             payment_method=payment
         )
-        
-        for item in order_items:
-            OrderItem.objects.create(
-                order=order_new,
-                product=item['product'],
-                quantity=item['quantity'],
-                total_value=item['total_value']
-            )
-            if item['product'] not in order_new.products.all():
-                order_new.products.add(item['product'])
-
-            if source == 'cart':
-                CartItem.objects.filter(cart__user=user, product=item['product']).delete()
-                cart.save()
-        
-        serializer = OrderSerializer(order_new)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order_new, product=products[product_id], quantity=quantity,
+                      total_value=products[product_id].price * quantity)
+            for product_id, quantity in quantities.items()
+        ])
+        Order.products.through.objects.bulk_create([
+            Order.products.through(order_id=order_new.pk, clothes_id=product_id) for product_id in quantities
+        ])
+        if source == 'cart':
+            CartItem.objects.filter(cart=cart, product_id__in=quantities).delete()
+
+        serializer = OrderSerializer(Order.objects.with_items().get(pk=order_new.pk))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -525,8 +825,11 @@ def rate_product(request, pk):
         orderitem = OrderItem.objects.get(order=order, product=product)
         if orderitem.rating is not None:
             return Response({'error': 'Bạn đã đánh giá sản phẩm này rồi.'}, status=status.HTTP_400_BAD_REQUEST)
-        orderitem.rating = rating
-        orderitem.save()
+        with transaction.atomic():
+            # UPDATE có điều kiện: hai request đồng thời không thể cùng cộng vào tổng đánh giá.
+            if not OrderItem.objects.filter(pk=orderitem.pk, rating__isnull=True).update(rating=int(rating)):
+                return Response({'error': 'Bạn đã đánh giá sản phẩm này rồi.'}, status=status.HTTP_400_BAD_REQUEST)
+            add_rating(product.id, int(rating))
         
         return Response({
                     'message': 'Đánh giá đơn hàng thành công',